@@ -0,0 +1,12 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.modules.github_org_repositories import GHOrgRepositoriesModule
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.plugin_utils.controller import GitHubActionBase
+
+
+class ActionModule(GitHubActionBase):
+    module_class = GHOrgRepositoriesModule
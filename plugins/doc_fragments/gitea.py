@@ -17,6 +17,27 @@ options:
     description: URL of the Gitiea API
     type: str
     required: True
+  connection_pool:
+    description: |
+      Reuse persistent HTTP connections (and TLS sessions) to the API host
+      instead of opening a new connection for every request. Requests going
+      through a proxy are always sent using the Ansible `fetch_url`.
+    type: bool
+    default: True
+  collect_metrics:
+    description: |
+      Return statistics of the API requests per endpoint template (count,
+      status codes, bytes sent and received, latency min/p50/p95/max) under
+      the C(metrics) key of the module result.
+    type: bool
+    default: False
+  trace_file:
+    description: |
+      Write spans of the run (reconciliation phases and API requests) into
+      the file in the Chrome trace event format to be inspected with
+      Perfetto or chrome://tracing. Tracing is disabled when not set.
+    type: path
+    required: False
 requirements:
   - python >= 3.6
   - requests
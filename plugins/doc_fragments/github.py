@@ -17,6 +17,66 @@ options:
     description: URL of the GitHub API
     type: str
     default: https://api.github.com
+  connection_pool:
+    description: |
+      Reuse persistent HTTP connections (and TLS sessions) to the API host
+      instead of opening a new connection for every request. Requests going
+      through a proxy are always sent using the Ansible `fetch_url`.
+    type: bool
+    default: True
+  collect_metrics:
+    description: |
+      Return statistics of the API requests per endpoint template (count,
+      status codes, bytes sent and received, latency min/p50/p95/max) under
+      the C(metrics) key of the module result.
+    type: bool
+    default: False
+  trace_file:
+    description: |
+      Write spans of the run (configuration loading, organizations,
+      repositories, reconciliation phases and API requests with their
+      `X-GitHub-Request-Id`) into the file in the Chrome trace event format
+      to be inspected with Perfetto or chrome://tracing. Tracing is disabled
+      when not set.
+    type: path
+    required: False
+  cache_dir:
+    description: |
+      Directory for the persistent HTTP cache of GET requests. Cached
+      responses are served without a request while they are fresh according
+      to the `Cache-Control` header and are revalidated using `ETag`
+      afterwards (`304 Not Modified` responses do not count against the rate
+      limit). Writes drop cached responses of the modified resource. Cache is
+      disabled when not set.
+    type: path
+    required: False
+  max_retries:
+    description: |
+      How many times a request throttled by the primary or secondary rate
+      limit or failed with a server error is retried. Throttled requests are
+      retried after the time given by `Retry-After` or the rate limit reset,
+      failures using exponential backoff with jitter. Failed POST and PATCH
+      requests, which are not safe to repeat, are not retried. Requests are delayed
+      while the rate limit budget is exhausted.
+    type: int
+    default: 5
+  write_interval:
+    description: |
+      Minimal interval in seconds between content modifying (POST, PATCH,
+      PUT, DELETE) requests. GitHub recommends at least one second to avoid
+      hitting the secondary rate limit when many changes are applied.
+      Reading requests are not affected. Writes are not paced by default.
+    type: float
+    default: 0.0
+  max_rate_limit_wait:
+    description: |
+      Maximal time in seconds a request is delayed while the rate limit
+      budget of its resource (REST or GraphQL) is exhausted or is waiting
+      before being retried after being throttled. Requests which would need
+      to wait longer fail with an error instead. Without I(max_retries)
+      requests are never delayed.
+    type: float
+    default: 300.0
 requirements:
   - python >= 3.6
   - requests
@@ -0,0 +1,249 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.trace import span
+
+try:
+    import yaml
+    HAS_YAML = True
+    try:
+        # libyaml based loader is an order of magnitude faster
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+except ImportError:
+    HAS_YAML = False
+
+
+CACHE_FILE = 'config_cache.json'
+
+
+class ConfigLoader:
+    """Loader of the YAML configuration files
+
+    Files are parsed with the libyaml loader when available. With the cache
+    directory given parsed content is cached on disk keyed by the file path
+    and the hash of its content, so that unchanged files are not parsed again
+    by the following runs.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_file = None
+        if cache_dir:
+            self.cache_file = os.path.join(
+                os.path.expanduser(cache_dir), CACHE_FILE)
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _get_entries(self):
+        if self._entries is None:
+            try:
+                with open(self.cache_file, 'r') as fp:
+                    self._entries = json.load(fp)
+            except (OSError, ValueError):
+                self._entries = dict()
+        return self._entries
+
+    def load(self, path):
+        """Return parsed content of the YAML file"""
+        with open(path, 'rb') as fp:
+            content = fp.read()
+        if not self.cache_file:
+            return yaml.load(content, Loader=SafeLoader)
+
+        key = os.path.abspath(path)
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            entry = self._get_entries().get(key)
+            if entry and entry['sha256'] == digest:
+                self.hits += 1
+                return json.loads(entry['data'])
+            self.misses += 1
+
+        data = yaml.load(content, Loader=SafeLoader)
+        try:
+            serialized = json.dumps(data)
+            # Only content surviving JSON round trip (i.e. no dates or
+            # non-string keys) can be cached
+            if json.loads(serialized) != data:
+                return data
+        except (TypeError, ValueError):
+            return data
+        with self._lock:
+            self._get_entries()[key] = dict(sha256=digest, data=serialized)
+            self._dirty = True
+        return data
+
+    def save(self):
+        """Persist the cache when it was modified"""
+        if not self.cache_file or not self._dirty:
+            return
+        with self._lock:
+            # Drop entries of files which do not exist anymore
+            entries = {k: v for k, v in self._entries.items()
+                       if os.path.exists(k)}
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.cache_file)
+            os.makedirs(directory, exist_ok=True)
+            (fd, tmp) = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(entries, fp)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            # Cache is best effort only
+            pass
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses)
+
+
+class ConfigIndex:
+    """Lazily populated index of the organizations configuration
+
+    Organizations are discovered from the `orgs` directory layout of the
+    configuration root. Sections of the organization (`people`, `teams`,
+    `repositories`, ...) and templates are only read when first requested
+    and every file is parsed at most once.
+    """
+
+    def __init__(self, root, loader=None, tracer=None):
+        self.root = root
+        self.loader = loader or ConfigLoader()
+        self.tracer = tracer
+        self._orgs = None
+        self._files = dict()
+        self._sections = dict()
+        self._lock = threading.RLock()
+
+    def orgs(self):
+        """Return names of the configured organizations"""
+        if self._orgs is None:
+            path = os.path.join(self.root, 'orgs')
+            try:
+                self._orgs = sorted(
+                    x for x in os.listdir(path)
+                    if os.path.isdir(os.path.join(path, x)))
+            except FileNotFoundError:
+                self._orgs = []
+        return self._orgs
+
+    def sections(self, org):
+        """Return names of the configuration sections of the organization"""
+        path = os.path.join(self.root, 'orgs', org)
+        return sorted(
+            x for x in os.listdir(path)
+            if os.path.isdir(os.path.join(path, x)))
+
+    def file(self, path):
+        """Return parsed content of the file, parsing it only once"""
+        key = os.path.abspath(path)
+        with self._lock:
+            if key not in self._files:
+                with span(self.tracer, 'load file', 'config', path=key):
+                    self._files[key] = self.loader.load(key)
+            return self._files[key]
+
+    def org_file(self, org, section, name):
+        """Return parsed content of the organization section file"""
+        return self.file(os.path.join(self.root, 'orgs', org, section, name))
+
+    def template(self, name):
+        """Return parsed content of the template"""
+        return self.file(os.path.join(self.root, 'templates', f"{name}.yml"))
+
+    def section(self, org, section):
+        """Return content of all files of the organization section merged
+        together
+        """
+        with self._lock:
+            if (org, section) not in self._sections:
+                path = os.path.join(self.root, 'orgs', org, section)
+                data = dict()
+                with span(self.tracer, f"{org}/{section}", 'config'):
+                    if os.path.isdir(path):
+                        for name in sorted(os.listdir(path)):
+                            if name.endswith(('.yml', '.yaml')):
+                                data.update(
+                                    self.file(os.path.join(path, name)) or {})
+                self._sections[(org, section)] = data
+            return self._sections[(org, section)]
+
+
+class ConfigChanges:
+    """Changes of the configuration since the git reference
+
+    Built from the previous content of the configuration files changed since
+    the reference (`files` maps paths relative to the configuration root to
+    their content at the reference, None for files added since). Items of the
+    sections are compared with the current content of the files, so that only
+    entries actually modified (repositories, teams, users) are reported
+    instead of all entries of the changed file.
+    """
+
+    def __init__(self, index, ref, files):
+        self.index = index
+        self.ref = ref
+        self.files = files
+
+    def _old(self, path):
+        content = self.files[path]
+        if not content:
+            return None
+        return yaml.load(content, Loader=SafeLoader)
+
+    def _new(self, path):
+        full_path = os.path.join(self.index.root, path)
+        if not os.path.exists(full_path):
+            return None
+        return self.index.file(full_path)
+
+    @staticmethod
+    def _items(data, attr, key):
+        data = (data or {}).get(attr) if attr else data
+        if isinstance(data, list):
+            # Lists of entries are keyed by the identifying attribute
+            return {
+                str(x[key]).lower(): x for x in data
+                if isinstance(x, dict) and key in x
+            }
+        return data or {}
+
+    def changes(self, org, section, attr=None, key='login'):
+        """Return `{name: (old, new)}` of the section entries changed since
+        the reference
+
+        With attr given entries of that attribute of the files are compared
+        (i.e. `teams` of the teams file). Entries given as list are keyed by
+        the lower case value of the `key` attribute.
+        """
+        prefix = f"orgs/{org}/{section}/"
+        result = dict()
+        for path in self.files:
+            if not path.startswith(prefix):
+                continue
+            old = self._items(self._old(path), attr, key)
+            new = self._items(self._new(path), attr, key)
+            for name in set(old) | set(new):
+                if old.get(name) != new.get(name):
+                    result[name] = (old.get(name), new.get(name))
+        return result
+
+    def templates(self):
+        """Return names of the templates changed since the reference"""
+        return set(
+            os.path.splitext(os.path.basename(path))[0]
+            for path in self.files if path.startswith('templates/')
+        )
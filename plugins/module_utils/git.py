@@ -5,10 +5,31 @@ __metaclass__ = type
 
 
 import abc
+import json
 import re
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.common.arg_spec import ArgumentSpecValidator
+from ansible.module_utils.common.text.converters import to_bytes
 from ansible.module_utils.urls import fetch_url
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.metrics import (
+    Metrics,
+    endpoint_template
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.trace import (
+    Tracer,
+    span
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.transport import (
+    ConnectionPool,
+    RateLimitExceeded,
+    RequestScheduler
+)
 
 
 def base_argument_spec(**kwargs):
@@ -65,11 +86,32 @@ def get_links(headers):
     return res
 
 
+def update_query(url, **params):
+    """Return url with query parameters replaced by params"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({k: str(v) for k, v in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def get_query_param(url, name):
+    """Return value of the url query parameter"""
+    return dict(parse_qsl(urlsplit(url).query)).get(name)
+
+
+class RequestError(Exception):
+    """API request failed"""
+
+
 class GitBase:
 
     argument_spec = {}
     module_kwargs = {}
     _bp_templates = {}
+    # Amount of pages of the paginated listing fetched in parallel
+    page_concurrency = 4
+    # Repository attributes sent by `update_repo`
+    repository_updatable_attributes = []
 
     def __init__(self):
 
@@ -80,8 +122,11 @@ class GitBase:
         self.module_name = self.ansible._name
         self.results = {'changed': False}
         self.errors = []
-        self.exit = self.exit_json = self.ansible.exit_json
-        self.fail = self.fail_json = self.ansible.fail_json
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.exit = self.exit_json = self._exit_json
+        self.fail = self.fail_json = self._fail_json
+        self._setup_transport()
 
     @abc.abstractmethod
     def run(self):
@@ -93,17 +138,178 @@ class GitBase:
         try:
             results = self.run()
             if results and isinstance(results, dict):
-                self.ansible.exit_json(**results)
+                self.exit_json(**results)
         except Exception as ex:
-            self.ansible.fail_json(
+            self.fail_json(
                 msg='Unhandled exception during execution',
                 errors=self.errors,
                 exception=ex
             )
 
+    def _setup_transport(self):
+        self._pool = None
+        if self.params.get('connection_pool', True):
+            self._pool = ConnectionPool(
+                validate_certs=self.params.get('validate_certs', True),
+                ca_path=self.params.get('ca_path'))
+        self._scheduler = RequestScheduler(
+            max_retries=self.params.get('max_retries') or 0,
+            write_interval=self.params.get('write_interval') or 0.0,
+            max_wait=self.params.get('max_rate_limit_wait') or 0.0)
+        self._metrics = None
+        if self.params.get('collect_metrics'):
+            self._metrics = Metrics()
+        self._tracer = None
+        if self.params.get('trace_file'):
+            self._tracer = Tracer(self.params['trace_file'], self.module_name)
+
+    def _get_run_stats(self):
+        """Return additional statistics to be reported in the module result
+        """
+        stats = dict()
+        if self._pool:
+            stats['connection_pool'] = self._pool.stats()
+        stats['rate_limit'] = self._scheduler.stats()
+        if self._metrics:
+            stats['metrics'] = self._metrics.stats()
+        if self._tracer:
+            stats['trace'] = self._tracer.stats()
+        return stats
+
+    def _save_trace(self):
+        if self._tracer:
+            try:
+                self._tracer.save()
+            except OSError as ex:
+                self.ansible.warn(f"Cannot write trace file: {ex}")
+
+    def _exit_json(self, **kwargs):
+        self._save_trace()
+        kwargs.update(self._get_run_stats())
+        self.ansible.exit_json(**kwargs)
+
+    def _fail_json(self, **kwargs):
+        self._save_trace()
+        kwargs.update(self._get_run_stats())
+        self.ansible.fail_json(**kwargs)
+
+    def trace(self, name, cat, **args):
+        """Return span of the run section (no-op unless tracing is enabled)
+        """
+        return span(self._tracer, name, cat, **args)
+
     def save_error(self, msg):
         self.ansible.log(msg)
-        self.errors.append(msg)
+        # Errors of concurrently executed tasks are buffered per task
+        errors = self._task_errors()
+        with self._lock:
+            errors.append(msg)
+
+    def _task_errors(self):
+        """Return list collecting errors of the current task"""
+        errors = getattr(self._local, 'errors', None)
+        if errors is None:
+            errors = self.errors
+        return errors
+
+    def _run_task(self, func, args):
+        self._local.errors = []
+        try:
+            return (func(*args), self._local.errors)
+        finally:
+            self._local.errors = None
+
+    def _run_concurrently(self, func, tasks, concurrency=1):
+        """Execute `func(*args)` for every args tuple in tasks using a bounded
+        thread pool.
+
+        Results are returned in the order of tasks. Errors saved by every task
+        are added to `self.errors` in the same order, so that the output does
+        not depend on the completion order.
+        """
+        if concurrency > 1 and len(tasks) > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                futures = [executor.submit(self._run_task, func, args)
+                           for args in tasks]
+                outcomes = [x.result() for x in futures]
+        else:
+            outcomes = [self._run_task(func, args) for args in tasks]
+
+        results = []
+        for (result, errors) in outcomes:
+            self.errors.extend(errors)
+            results.append(result)
+        return results
+
+    def _iter_concurrently(self, func, tasks, concurrency):
+        """Yield `func(*args)` for every args tuple in tasks in order while
+        executing up to concurrency calls in parallel
+
+        Errors saved by the calls are added to the errors of the calling task
+        in the order of tasks.
+        """
+        if concurrency <= 1 or len(tasks) <= 1:
+            for args in tasks:
+                yield func(*args)
+            return
+        errors = self._task_errors()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(self._run_task, func, args)
+                       for args in tasks]
+            for future in futures:
+                (result, task_errors) = future.result()
+                with self._lock:
+                    errors.extend(task_errors)
+                yield result
+
+    def _validate_repositories(self, spec):
+        """Return `repositories` parameter items validated against the spec
+        of the single repository module
+        """
+        spec = dict(spec)
+        spec.pop('owner', None)
+        validator = ArgumentSpecValidator(spec)
+        repositories = []
+        errors = []
+        for item in self.params['repositories']:
+            result = validator.validate(item)
+            if result.error_messages:
+                errors.append(
+                    f"Repository {item.get('name')}: "
+                    f"{'; '.join(result.error_messages)}")
+                continue
+            repositories.append(result.validated_parameters)
+        if errors:
+            self.fail_json(msg='Invalid repositories', errors=errors)
+        return repositories
+
+    def _is_repo_update_needed(self, current, target):
+        for attr in self.repository_updatable_attributes:
+            # Options not given are not sent by `update_repo` either
+            if (
+                target.get(attr) is not None
+                and target[attr] != current.get(attr)
+            ):
+                return True
+
+    def _get_page(self, url, headers=None, timeout=15, error_msg=None):
+        """Fetch single page of the listing
+
+        Returns `(items, response)` or None when the resource is missing.
+        """
+        content, response, info = self._request(
+            method='GET',
+            url=url,
+            headers=dict(headers or {}),
+            timeout=timeout,
+        )
+        if info['status'] == 404:
+            return None
+        if info['status'] >= 400 or not response:
+            raise RequestError(
+                f"{error_msg or 'API returned error'} on {url}: "
+                f"{info.get('msg')}")
+        return (json.loads(content), response)
 
     def _prepare_graphql_query(self, query, variables):
         data = {
@@ -120,13 +326,63 @@ class GitBase:
         if json_data:
             kwargs['data'] = self.ansible.jsonify(json_data)
 
-        response, info = fetch_url(
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                self._scheduler.before_request(method, url)
+            except RateLimitExceeded as ex:
+                return (None, None, dict(url=url, status=-1, msg=str(ex)))
+            if self._tracer and time.perf_counter() - start > 0.001:
+                # Rate limit and pacing of writes serialize the workers
+                self._tracer.add(
+                    'scheduler', 'wait', start, time.perf_counter())
+            start = time.monotonic()
+            with self.trace(
+                f"{method} {endpoint_template(url)}", 'http',
+                url=url, attempt=attempt
+            ) as request_span:
+                response, info = self._send_request(
+                    method, url, headers, **kwargs)
+                content = ""
+                if response:
+                    content = response.read()
+                request_span.set(
+                    status=info['status'],
+                    request_id=info.get('x-github-request-id'))
+            if self._metrics:
+                self._metrics.record(
+                    method, url, info['status'],
+                    len(to_bytes(kwargs.get('data') or b'')),
+                    len(content or info.get('body') or b''),
+                    time.monotonic() - start)
+            delay = self._scheduler.after_response(
+                method, url, info, content or info.get('body'), attempt)
+            if delay is None:
+                break
+            attempt += 1
+            self.ansible.log(
+                f"Retrying {method} {url} in {delay:.1f}s "
+                f"(status {info['status']}, attempt {attempt})")
+            with self.trace('retry backoff', 'wait', delay=delay):
+                self._scheduler.wait(delay)
+        return (content, response, info)
+
+    def _send_request(self, method, url, headers, **kwargs):
+        # Pool serves plain requests, anything exotic (proxies, unix sockets,
+        # etc) goes through fetch_url
+        if (
+            self._pool
+            and set(kwargs).issubset({'data', 'timeout'})
+            and self._pool.is_usable(url)
+        ):
+            return self._pool.request(
+                method=method, url=url, headers=headers, **kwargs)
+        if self._pool:
+            self._pool.count_fallback()
+        return fetch_url(
             module=self.ansible,
             headers=headers,
             method=method, url=url,
             **kwargs
         )
-        content = ""
-        if response:
-            content = response.read()
-        return (content, response, info)
@@ -5,11 +5,19 @@ __metaclass__ = type
 
 
 import json
+import math
+import threading
 
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.git import GitBase
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.git import (
+    GitBase,
+    update_query
+)
 
 
+# Maximal page size of the API listings (default MAX_RESPONSE_ITEMS)
+PAGE_SIZE = 50
+
 REPOSITORY_UPDATABLE_ATTRIBUTES = [
     'allow_manual_merge',
     'allow_merge_commits',
@@ -39,16 +47,103 @@ def base_argument_spec(**kwargs):
     spec = dict(
         token=dict(type='str', required=True, no_log=True),
         api_url=dict(type='str', required=True),
+        connection_pool=dict(type='bool', default=True),
+        collect_metrics=dict(type='bool', default=False),
+        trace_file=dict(type='path', required=False),
     )
     spec.update(kwargs)
     return spec
 
 
+# Permissions accepted by the modules which the API reports differently
+PERMISSION_ALIASES = {'administrator': 'admin'}
+
+
+def repository_argument_spec():
+    """Return argument spec of the organization repository"""
+    return dict(
+        owner=dict(type='str', required=True),
+        name=dict(type='str', required=True),
+        state=dict(type='str', default='present',
+                   choices=['present', 'absent']),
+        allow_manual_merge=dict(type='bool'),
+        allow_merge_commits=dict(type='bool'),
+        allow_rebase=dict(type='bool'),
+        allow_rebase_explicit=dict(type='bool'),
+        allow_rebase_update=dict(type='bool'),
+        allow_squash_merge=dict(type='bool'),
+        auto_init=dict(type='bool'),
+        archived=dict(type='bool', default=False),
+        autodetect_manual_merge=dict(type='bool'),
+        default_branch=dict(type='str'),
+        default_delete_branch_after_merge=dict(type='bool'),
+        default_merge_style=dict(
+            type='str',
+            choices=['merge', 'rebase', 'rebase-merge', 'squash']),
+        description=dict(type='str', required=False),
+        enable_prune=dict(type='bool'),
+        gitignores=dict(type='str'),
+        has_issues=dict(type='bool'),
+        has_projects=dict(type='bool'),
+        has_pull_requests=dict(type='bool'),
+        has_wiki=dict(type='bool'),
+        ignore_whitespace_conflicts=dict(type='bool'),
+        issue_labels=dict(type='str'),
+        license=dict(type='str'),
+        private=dict(type='bool'),
+        readme=dict(type='str'),
+        template=dict(type='bool'),
+        trust_model=dict(
+            type='str',
+            choices=['default', 'collaborator', 'commiter', 'collaboratorcommiter']
+        ),
+        website=dict(type='str'),
+        branch_protections=dict(
+            type='list', elements='dict', options=dict(
+                approvals_whitelist_teams=dict(type='list', elements='str'),
+                approvals_whitelist_username=dict(type='list', elements='str'),
+                block_on_official_review_requests=dict(type='bool'),
+                block_on_outdated_branch=dict(type='bool'),
+                block_on_rejected_reviews=dict(type='bool'),
+                branch_name=dict(type='str', required=True),
+                dismiss_stale_approvals=dict(type='bool'),
+                enable_approvals_whitelist=dict(type='bool'),
+                enable_merge_whitelist=dict(type='bool'),
+                enable_push=dict(type='bool'),
+                enable_push_whitelist=dict(type='bool'),
+                enable_status_check=dict(type='bool'),
+                merge_whitelist_teams=dict(type='list', elements='str'),
+                merge_whitelist_usernames=dict(type='list', elements='str'),
+                protected_file_patterns=dict(type='str'),
+                push_whitelist_deploy_keys=dict(type='bool'),
+                push_whitelist_teams=dict(type='list', elements='str'),
+                push_whitelist_usernames=dict(type='list', elements='str'),
+                require_signed_commits=dict(type='bool'),
+                required_approvals=dict(type='int'),
+                status_check_contexts=dict(type='list', elements='str'),
+                unprotected_file_patterns=dict(type='str')
+            )
+        ),
+        collaborators=dict(
+            type='list', elements='dict', options=dict(
+                username=dict(type='str', required=True),
+                permission=dict(
+                    type='str', default='read',
+                    choices=['administrator', 'write', 'read']
+                )
+            )
+        ),
+        teams=dict(type='list', elements='str'),
+        verify_teams=dict(type='bool', default=False),
+    )
+
+
 class GiteaBase(GitBase):
 
     argument_spec = {}
     module_kwargs = {}
     _bp_templates = {}
+    repository_updatable_attributes = REPOSITORY_UPDATABLE_ATTRIBUTES
 
     def __init__(self):
         self.ansible = AnsibleModule(
@@ -58,16 +153,15 @@ class GiteaBase(GitBase):
         self.params = self.ansible.params
         self.module_name = self.ansible._name
         self.results = {'changed': False}
-        self.exit = self.exit_json = self.ansible.exit_json
-        self.fail = self.fail_json = self.ansible.fail_json
+        self.exit = self.exit_json = self._exit_json
+        self.fail = self.fail_json = self._fail_json
+        self._setup_transport()
 
         self.api_url = self.params['api_url']
         self.errors = []
         self._users_cache = dict()
-
-    def save_error(self, msg):
-        self.ansible.log(msg)
-        self.errors.append(msg)
+        self._lock = threading.RLock()
+        self._local = threading.local()
 
     def _request(self, method, url, headers=None, **kwargs):
         if not headers:
@@ -122,35 +216,44 @@ class GiteaBase(GitBase):
         elif body and status < 400:
             return json.loads(body)
 
-    def paginated_request(self, url, headers=None, timeout=15, params=None):
+    def paginated_request(
+        self, url, headers=None, timeout=15, params=None, error_msg=None
+    ):
+        """Yield items of the listing
+
+        Pages of the maximal size are requested. Once the first page is
+        fetched remaining pages (calculated from `X-Total-Count`) are fetched
+        concurrently.
+        """
         if not url.startswith('http'):
             url = f"{self.api_url}/{url}"
 
-        if not params:
-            params = dict()
-        total_count = 0
-        fetched = 0
-        page = 1
+        params = dict(params or {})
+        params.setdefault('limit', PAGE_SIZE)
+        headers = dict(headers or {})
         headers['Accept'] = 'application/json'
-        while True:
-            content, response, info = self._request(
-                method='GET',
-                url=url,
-                headers=headers,
-                timeout=timeout,
-                params=params
-            )
-            total_count = int(response.headers.get('X-Total-Count', 0))
-            data = json.loads(content)
-            if isinstance(data, list):
-                for rec in data:
-                    yield rec
-                    fetched += 1
-                if fetched == total_count:
-                    return
-                else:
-                    page += 1
-                    params['page'] = page
+
+        page = self._get_page(
+            update_query(url, page=1, **params), headers, timeout, error_msg)
+        if page is None:
+            return
+        (items, response) = page
+        yield from items
+
+        total_count = int(response.headers.get('X-Total-Count', 0))
+        # Server may limit page size lower then requested
+        if not items or total_count <= len(items):
+            return
+        tasks = [
+            (update_query(url, page=x, **params), headers, timeout, error_msg)
+            for x in range(2, math.ceil(total_count / len(items)) + 1)
+        ]
+        for page in self._iter_concurrently(
+            self._get_page, tasks, self.page_concurrency
+        ):
+            if page is None:
+                break
+            yield from page[0]
 
     def get_repo(self, owner, repo, ignore_missing=False):
         """Get repository information"""
@@ -161,6 +264,13 @@ class GiteaBase(GitBase):
             ignore_missing=ignore_missing
         )
 
+    def get_org_repos(self, owner):
+        """List repositories of the organization"""
+        return self.paginated_request(
+            url=f"orgs/{owner}/repos",
+            error_msg=f"Cannot list repositories of {owner}"
+        )
+
     def create_repo(self, owner, repo, **args):
         if not args:
             args = dict()
@@ -236,6 +346,7 @@ class GiteaBase(GitBase):
         changed = False
         owner = kwargs.pop('owner')
         repo_name = kwargs.pop('name')
+        verify_teams = kwargs.pop('verify_teams', False)
         current_repo = current if current else self.get_repo(owner, repo_name, ignore_missing=True)
         if not current_repo:
             changed = True
@@ -265,7 +376,8 @@ class GiteaBase(GitBase):
             current_repo and target_teams is not None
         ):
             (changed, teams) = self._manage_repo_teams(
-                owner, repo_name, target_teams, check_mode)
+                owner, repo_name, target_teams, check_mode,
+                verify=verify_teams)
             current_repo['teams'] = teams
 
         # Repository collaborators
@@ -315,11 +427,6 @@ class GiteaBase(GitBase):
 
         return (changed, current_repo)
 
-    def _is_repo_update_needed(self, current, target):
-        for attr in REPOSITORY_UPDATABLE_ATTRIBUTES:
-            if attr in target and target[attr] != current.get(attr):
-                return True
-
     def _is_branch_protection_update_needed(
         self,
         owner,
@@ -367,51 +474,95 @@ class GiteaBase(GitBase):
         return rsp
 
     def delete_repo_team_access(self, owner, repo, team):
-        """Delete team from repo collaborators"""
-        self.request(
+        """Delete team from repo collaborators
+
+        Returns whether the team access was deleted.
+        """
+        rsp = self.request(
             method='DELETE',
             url=f"repos/{owner}/{repo}/teams/{team}",
             error_msg=f"Cannot delete team {team}@{owner}/{repo} access"
         )
+        return rsp is not None
 
     def add_repo_team_access(self, owner, repo, team):
-        """Add team as repo collaborators"""
-        self.request(
+        """Add team as repo collaborators
+
+        Returns whether the team access was added.
+        """
+        rsp = self.request(
             method='PUT',
             url=f"repos/{owner}/{repo}/teams/{team}",
             error_msg=f"Cannot add team {team}@{owner}/{repo} access"
         )
+        return rsp is not None
+
+    def _set_repo_team_access(self, owner, repo, team, present):
+        """Add or delete team access and return whether it succeeded"""
+        if present:
+            return self.add_repo_team_access(owner, repo, team)
+        return self.delete_repo_team_access(owner, repo, team)
 
     def _manage_repo_teams(
-        self, owner, repo_name, target, check_mode=False
+        self, owner, repo_name, target, check_mode=False, verify=False
     ):
-        """Manage repository teams"""
-        changed = False
-        teams = None
+        """Manage repository teams
+
+        Teams of the repository after the change are derived from the
+        successfully applied additions and removals. With `verify` they are
+        fetched from the server again instead.
+        """
         current_teams = set([x['name'] for x in
                             self.get_repo_teams(owner, repo_name) or []])
         target_teams = set(target + ['Owners'])
-        for old_team in current_teams.difference(target_teams):
-            changed = True
-            if not check_mode:
-                self.delete_repo_team_access(owner, repo_name, old_team)
-        for new_team in target_teams.difference(current_teams):
-            changed = True
-            if not check_mode:
-                self.add_repo_team_access(owner, repo_name, new_team)
-        teams = set([x['name'] for x in
-                    self.get_repo_teams(owner, repo_name) or []])
-        return (changed, teams)
+        removed = sorted(current_teams.difference(target_teams))
+        added = sorted(target_teams.difference(current_teams))
+        changed = bool(removed or added)
+        if check_mode or not changed:
+            return (changed, sorted(current_teams))
+        operations = (
+            [(owner, repo_name, x, False) for x in removed]
+            + [(owner, repo_name, x, True) for x in added]
+        )
+        teams = set(current_teams)
+        for (args, succeeded) in zip(operations, self._iter_concurrently(
+            self._set_repo_team_access, operations, self.page_concurrency
+        )):
+            (team, present) = args[2:]
+            if not succeeded:
+                continue
+            if present:
+                teams.add(team)
+            else:
+                teams.discard(team)
+        if verify:
+            teams = set([x['name'] for x in
+                         self.get_repo_teams(owner, repo_name) or []])
+        return (changed, sorted(teams))
 
     def get_repo_collaborators(self, owner, repo):
         """Get repo collaborators"""
-        rsp = self.request(
-            method='GET',
-            url=(f"repos/{owner}/{repo}/collaborators"),
+        return list(self.paginated_request(
+            url=f"repos/{owner}/{repo}/collaborators",
             error_msg=f"Cannot fetch team {owner}/{repo} collaborators"
-        )
-
-        return rsp
+        ))
+
+    def get_repo_collaborators_permissions(self, owner, repo):
+        """Return permissions of the repository collaborators by login
+
+        The collaborators listing does not include permissions, so that they
+        are fetched for every collaborator (concurrently).
+        """
+        logins = [
+            x['login'] for x in self.get_repo_collaborators(owner, repo)]
+        lookups = self._iter_concurrently(
+            self.get_repo_collaborator_permission,
+            [(owner, repo, login) for login in logins],
+            self.page_concurrency)
+        return {
+            login: (rsp or {}).get('permission')
+            for (login, rsp) in zip(logins, lookups)
+        }
 
     def add_repo_collaborator(self, owner, repo, login, permission):
         """Add repo collaborator"""
@@ -449,33 +600,27 @@ class GiteaBase(GitBase):
     ):
         """Manage repository collaborators"""
         changed = False
-        current_collaborators = {x['login']: 1 for x in
-                                 self.get_repo_collaborators(owner, repo_name) or []}
+        current_collaborators = self.get_repo_collaborators_permissions(
+            owner, repo_name)
         target_collaborators = {x['username']: x['permission'] for x in
                                 target}
         for login, permission in target_collaborators.items():
-            if login not in current_collaborators:
+            if (
+                login not in current_collaborators
+                or current_collaborators[login] != PERMISSION_ALIASES.get(
+                    permission, permission)
+            ):
                 changed = True
                 if not check_mode:
                     self.add_repo_collaborator(
                         owner, repo_name, login, permission
                     )
-            else:
-                current = self.get_repo_collaborator_permission(
-                    owner, repo_name, login
-                )
-                if current["permission"] != permission:
-                    changed = True
-                    if not check_mode:
-                        self.add_repo_collaborator(
-                            owner, repo_name, login, permission
-                        )
 
         for login in current_collaborators.keys():
             if login not in target_collaborators:
                 changed = True
                 if not check_mode:
-                    self.delete_repo_collaborator(
+                    self.remove_repo_collaborator(
                         owner, repo_name, login
                     )
 
@@ -4,18 +4,52 @@ from __future__ import (absolute_import, division, print_function)
 __metaclass__ = type
 
 
-import os
+import copy
+import fnmatch
 import json
-
-try:
-    import yaml
-    HAS_YAML = True
-except ImportError:
-    HAS_YAML = False
+import re
+import threading
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.basic import missing_required_lib
-from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.git import (GitBase, get_links)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.git import (
+    GitBase,
+    get_links,
+    get_query_param,
+    update_query
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.config import (
+    ConfigChanges,
+    ConfigIndex,
+    ConfigLoader,
+    HAS_YAML
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.http_cache import HTTPCache
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.journal import (
+    config_hash,
+    Journal
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.models import (
+    BranchProtection,
+    Invitation,
+    Repository,
+    Team,
+    User
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.plan import (
+    ChangePlan,
+    PlanError
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.protection import (
+    updates as protection_updates
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.rulesets import (
+    covers as ruleset_covers,
+    is_ruleset_update_needed,
+    protection_rules,
+    ruleset_conditions
+)
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.sync import SyncState
 
 
 QUERY_MEMBERS = '''
@@ -40,6 +74,249 @@ query members(
 }
 '''
 
+QUERY_ORG_REPOSITORIES = '''
+query repositories(
+  $owner: String!
+  $repoCursor: String
+) {
+  organization(login: $owner) {
+    repositories(first: 100, after: $repoCursor) {
+      nodes {
+        databaseId
+        name
+        nameWithOwner
+        owner {
+          login
+        }
+        description
+        homepageUrl
+        isPrivate
+        visibility
+        isArchived
+        isTemplate
+        hasIssuesEnabled
+        hasProjectsEnabled
+        hasWikiEnabled
+        forkingAllowed
+        squashMergeAllowed
+        mergeCommitAllowed
+        rebaseMergeAllowed
+        autoMergeAllowed
+        allowUpdateBranch
+        deleteBranchOnMerge
+        updatedAt
+        pushedAt
+        defaultBranchRef {
+          name
+        }
+        repositoryTopics(first: 100) {
+          nodes {
+            topic {
+              name
+            }
+          }
+        }
+        collaborators(affiliation: DIRECT, first: 100) {
+          edges {
+            permission
+            node {
+              login
+            }
+          }
+          pageInfo {
+            hasNextPage
+          }
+        }
+        branchProtectionRules(first: 10) {
+          nodes {
+            pattern
+            isAdminEnforced
+            requiresStatusChecks
+            requiresStrictStatusChecks
+            requiredStatusChecks {
+              context
+              app {
+                databaseId
+              }
+            }
+            requiresApprovingReviews
+            requiredApprovingReviewCount
+            dismissesStaleReviews
+            requiresCodeOwnerReviews
+            restrictsReviewDismissals
+            reviewDismissalAllowances(first: 50) {
+              nodes {
+                actor {
+                  __typename
+                  ... on User { login }
+                  ... on Team { slug }
+                }
+              }
+            }
+            restrictsPushes
+            pushAllowances(first: 50) {
+              nodes {
+                actor {
+                  __typename
+                  ... on User { login }
+                  ... on Team { slug }
+                  ... on App { slug }
+                }
+              }
+            }
+            requiresLinearHistory
+            allowsForcePushes
+            allowsDeletions
+            requiresConversationResolution
+            lockAllowsFetchAndMerge
+          }
+          pageInfo {
+            hasNextPage
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+'''
+
+QUERY_ORG_TEAMS_REPOSITORIES = '''
+query teams(
+  $owner: String!
+  $teamCursor: String
+) {
+  organization(login: $owner) {
+    teams(first: 100, after: $teamCursor) {
+      nodes {
+        slug
+        repositories(first: 100) {
+          edges {
+            permission
+            node {
+              name
+            }
+          }
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+'''
+
+QUERY_TEAM_REPOSITORIES = '''
+query teamRepositories(
+  $owner: String!
+  $slug: String!
+  $repoCursor: String
+) {
+  organization(login: $owner) {
+    team(slug: $slug) {
+      repositories(first: 100, after: $repoCursor) {
+        edges {
+          permission
+          node {
+            name
+          }
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+  }
+}
+'''
+
+QUERY_ORG_TEAMS_MEMBERS = '''
+query teamsMembers(
+  $owner: String!
+  $teamCursor: String
+) {
+  organization(login: $owner) {
+    teams(first: 100, after: $teamCursor) {
+      nodes {
+        slug
+        members(first: 100) {
+          edges {
+            role
+            node {
+              login
+            }
+          }
+          pageInfo {
+            hasNextPage
+            endCursor
+          }
+        }
+      }
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+    }
+  }
+}
+'''
+
+QUERY_TEAM_MEMBERS = '''
+query teamMembers(
+  $owner: String!
+  $slug: String!
+  $memberCursor: String
+) {
+  organization(login: $owner) {
+    team(slug: $slug) {
+      members(first: 100, after: $memberCursor) {
+        edges {
+          role
+          node {
+            login
+          }
+        }
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+      }
+    }
+  }
+}
+'''
+
+# GraphQL RepositoryPermission to REST permission name
+GRAPHQL_PERMISSIONS = {
+    'ADMIN': 'admin',
+    'MAINTAIN': 'maintain',
+    'WRITE': 'push',
+    'TRIAGE': 'triage',
+    'READ': 'pull',
+}
+
+# Permissions implied by the permission level (as returned by REST API)
+PERMISSION_FLAGS = {
+    'admin': ['admin', 'maintain', 'push', 'triage', 'pull'],
+    'maintain': ['maintain', 'push', 'triage', 'pull'],
+    'push': ['push', 'triage', 'pull'],
+    'triage': ['triage', 'pull'],
+    'pull': ['pull'],
+}
+
+# Maximal page size of the REST API listings
+PAGE_SIZE = 100
+
 REPOSITORY_UPDATABLE_ATTRIBUTES = [
     'allow_auto_merge',
     'allow_forking',
@@ -64,55 +341,318 @@ REPOSITORY_UPDATABLE_ATTRIBUTES = [
 def base_argument_spec(**kwargs):
     spec = dict(
         token=dict(type='str', required=True, no_log=True),
-        github_url=dict(type='str', default='https://api.github.com')
+        github_url=dict(type='str', default='https://api.github.com'),
+        connection_pool=dict(type='bool', default=True),
+        collect_metrics=dict(type='bool', default=False),
+        trace_file=dict(type='path', required=False),
+        cache_dir=dict(type='path', required=False),
+        max_retries=dict(type='int', default=5),
+        write_interval=dict(type='float', default=0.0),
+        max_rate_limit_wait=dict(type='float', default=300.0),
     )
     spec.update(kwargs)
     return spec
 
 
+def repository_argument_spec():
+    """Return argument spec of the organization repository"""
+    return dict(
+        owner=dict(type='str', required=True),
+        name=dict(type='str', required=True),
+        state=dict(type='str', default='present',
+                   choices=['present', 'absent']),
+        description=dict(type='str', required=False),
+        homepage=dict(type='str', required=False),
+        private=dict(type='bool', default=False),
+        visibility=dict(type='str', default='public',
+                        choices=['public', 'private', 'internal']),
+        has_issues=dict(type='bool', default=True),
+        has_projects=dict(type='bool', default=True),
+        has_wiki=dict(type='bool', default=True),
+        is_template=dict(type='bool', default=False),
+        auto_init=dict(type='bool', default=False),
+        gitignore_template=dict(type='str'),
+        license_template=dict(type='str'),
+        allow_forking=dict(type='bool'),
+        allow_squash_merge=dict(type='bool', default=True),
+        allow_merge_commit=dict(type='bool', default=True),
+        allow_rebase_merge=dict(type='bool', default=True),
+        allow_auto_merge=dict(type='bool', default=False),
+        allow_update_branch=dict(type='bool', default=False),
+        delete_branch_on_merge=dict(type='bool', default=False),
+        default_branch=dict(type='str'),
+        archived=dict(type='bool', default=False),
+        topics=dict(type='list', elements='str', default=[]),
+        branch_protections=dict(
+            type='list', required=False, elements='dict', options=dict(
+                allow_deletions=dict(type='bool', default=False),
+                allow_fork_syncing=dict(type='bool', default=False),
+                allow_force_pushes=dict(type='bool', default=False),
+                branch=dict(type='str', required=True),
+                enforce_admins=dict(type='bool', default=False),
+                required_conversation_resolution=dict(type='bool',
+                                                      default=False),
+                required_status_checks=dict(
+                    type='dict', required=True,
+                    required_one_of=[('contexts', 'checks')],
+                    options=dict(
+                        strict=dict(type='bool', default=False),
+                        contexts=dict(type='list', elements='str', default=[]),
+                        checks=dict(
+                            type='list', elements='dict', options=dict(
+                                context=dict(type='str'),
+                                app_id=dict(type='int')
+                            )
+                        )
+                    )
+                ),
+                required_linear_history=dict(type='bool', default=False),
+                required_pull_request_reviews=dict(
+                    type='dict', options=dict(
+                        dismissal_restrictions=dict(
+                            type='dict', options=dict(
+                                users=dict(type='list', elements='str', default=[]),
+                                teams=dict(type='list', elements='str', default=[])
+                            )
+                        ),
+                        dismiss_stale_reviews=dict(type='bool', default=True),
+                        require_code_owner_reviews=dict(
+                            type='bool', default=True),
+                        required_approving_review_count=dict(type='int',
+                                                             choices=[
+                                                                 1, 2, 3,
+                                                                 4, 5])
+                    )
+                ),
+                restrictions=dict(
+                    type='dict',
+                    options=dict(
+                        users=dict(type='list', elements='str', default=[]),
+                        teams=dict(type='list', elements='str', default=[]),
+                        apps=dict(type='list', elements='str')
+                    )
+                )
+            )
+        ),
+        teams=dict(
+            type='list', elements='dict', options=dict(
+                slug=dict(type='str', required=True),
+                permission=dict(
+                    type='str', default='pull',
+                    choices=['pull', 'push', 'admin', 'maintain', 'triage']
+                )
+            )
+        ),
+        collaborators=dict(
+            type='list', elements='dict', options=dict(
+                username=dict(type='str', required=True),
+                permission=dict(
+                    type='str', default='pull',
+                    choices=['pull', 'push', 'admin', 'maintain', 'triage']
+                )
+            )
+        ),
+    )
+
+
+def permission_flags(permission):
+    """Return REST style permissions dict for the permission level"""
+    flags = PERMISSION_FLAGS.get(permission, [])
+    return {
+        x: x in flags
+        for x in ['admin', 'maintain', 'push', 'triage', 'pull']
+    }
+
+
+def _actors(allowances, typename, key):
+    """Return REST style list of actors of the given type"""
+    return [
+        {key: x['actor'][key]} for x in allowances['nodes']
+        if (x.get('actor') or {}).get('__typename') == typename
+    ]
+
+
+def _graphql_branch_protection(rule):
+    """Convert GraphQL BranchProtectionRule into the REST representation"""
+    bp = dict()
+    for attr, prop in [
+        ('enforce_admins', 'isAdminEnforced'),
+        ('required_linear_history', 'requiresLinearHistory'),
+        ('allow_force_pushes', 'allowsForcePushes'),
+        ('allow_deletions', 'allowsDeletions'),
+        ('required_conversation_resolution', 'requiresConversationResolution'),
+        ('allow_fork_syncing', 'lockAllowsFetchAndMerge'),
+    ]:
+        bp[attr] = {'enabled': rule[prop]}
+    if rule['requiresStatusChecks']:
+        checks = rule.get('requiredStatusChecks') or []
+        bp['required_status_checks'] = {
+            'strict': rule['requiresStrictStatusChecks'],
+            'contexts': [x['context'] for x in checks],
+            'checks': [
+                {'context': x['context'],
+                 'app_id': (x.get('app') or {}).get('databaseId')}
+                for x in checks
+            ]
+        }
+    if rule['requiresApprovingReviews']:
+        reviews = {
+            'dismiss_stale_reviews': rule['dismissesStaleReviews'],
+            'require_code_owner_reviews': rule['requiresCodeOwnerReviews'],
+            'required_approving_review_count':
+                rule['requiredApprovingReviewCount'],
+        }
+        if rule['restrictsReviewDismissals']:
+            allowances = rule['reviewDismissalAllowances']
+            reviews['dismissal_restrictions'] = {
+                'users': _actors(allowances, 'User', 'login'),
+                'teams': _actors(allowances, 'Team', 'slug'),
+            }
+        bp['required_pull_request_reviews'] = reviews
+    if rule['restrictsPushes']:
+        allowances = rule['pushAllowances']
+        bp['restrictions'] = {
+            'users': _actors(allowances, 'User', 'login'),
+            'teams': _actors(allowances, 'Team', 'slug'),
+            'apps': _actors(allowances, 'App', 'slug'),
+        }
+    return bp
+
+
+def _graphql_repository(node):
+    """Convert GraphQL Repository into the snapshot record
+
+    Record consists of REST representation of the repository and its
+    sub-resources (topics, collaborators, branch protections).
+    """
+    owner = node['owner']['login']
+    topics = [x['topic']['name'] for x in node['repositoryTopics']['nodes']]
+    repo = {
+        'id': node['databaseId'],
+        'name': node['name'],
+        'full_name': node['nameWithOwner'],
+        'owner': {'login': owner},
+        'organization': {'login': owner},
+        'description': node['description'],
+        'homepage': node['homepageUrl'],
+        'private': node['isPrivate'],
+        'visibility': node['visibility'].lower(),
+        'archived': node['isArchived'],
+        'is_template': node['isTemplate'],
+        'has_issues': node['hasIssuesEnabled'],
+        'has_projects': node['hasProjectsEnabled'],
+        'has_wiki': node['hasWikiEnabled'],
+        'allow_forking': node['forkingAllowed'],
+        'allow_squash_merge': node['squashMergeAllowed'],
+        'allow_merge_commit': node['mergeCommitAllowed'],
+        'allow_rebase_merge': node['rebaseMergeAllowed'],
+        'allow_auto_merge': node['autoMergeAllowed'],
+        'allow_update_branch': node['allowUpdateBranch'],
+        'delete_branch_on_merge': node['deleteBranchOnMerge'],
+        'default_branch': (node.get('defaultBranchRef') or {}).get('name'),
+        'updated_at': node['updatedAt'],
+        'pushed_at': node['pushedAt'],
+        'topics': topics,
+    }
+    record = {'repo': Repository.from_api(repo), 'topics': topics}
+
+    collaborators = node.get('collaborators')
+    if collaborators and not collaborators['pageInfo']['hasNextPage']:
+        record['collaborators'] = [
+            User.from_api({
+                'login': x['node']['login'],
+                'permissions': permission_flags(
+                    GRAPHQL_PERMISSIONS.get(x['permission']))})
+            for x in collaborators['edges']
+        ]
+
+    rules = node['branchProtectionRules']
+    # Rules are matched by pattern, incomplete list can not be used
+    if not rules['pageInfo']['hasNextPage']:
+        record['branch_protections'] = {
+            x['pattern']: BranchProtection.from_api(
+                _graphql_branch_protection(x))
+            for x in rules['nodes']
+        }
+    return record
+
+
 class GitHubBase(GitBase):
 
     argument_spec = {}
     module_kwargs = {}
     _bp_templates = {}
+    repository_updatable_attributes = REPOSITORY_UPDATABLE_ATTRIBUTES
 
-    def __init__(self):
-        self.ansible = AnsibleModule(
-            base_argument_spec(**self.argument_spec),
-            **self.module_kwargs)
+    def __init__(self, ansible=None):
+        # Action plugins pass object mimicking the AnsibleModule to execute
+        # the module on the controller
+        self.ansible = ansible or AnsibleModule(
+            self.get_argument_spec(), **self.module_kwargs)
         self.params = self.ansible.params
         self.module_name = self.ansible._name
         self.results = {'changed': False}
-        self.exit = self.exit_json = self.ansible.exit_json
-        self.fail = self.fail_json = self.ansible.fail_json
+        self.exit = self.exit_json = self._exit_json
+        self.fail = self.fail_json = self._fail_json
+        self._setup_transport()
 
         self.gh_url = self.params['github_url']
         self.errors = []
         self._users_cache = dict()
+        self._repos_snapshot = dict()
+        self._prefetched_orgs = set()
+        self._actor_ids = dict()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._cache = None
+        if self.params['cache_dir']:
+            self._cache = HTTPCache(
+                self.params['cache_dir'], self.params['token'], self.gh_url)
+        self._plan = None
+        self._planning = False
+        self._applied = 0
+        self._journal = None
+        if self.params.get('journal'):
+            self._journal = Journal(
+                self.params['journal'], self.params.get('resume', False))
+        self._sync_state = None
+        if self.params.get('sync_state'):
+            self._sync_state = SyncState(self.params['sync_state'])
 
         if not HAS_YAML:
             self.fail_json(msg=missing_required_lib('yaml'))
-
-    def save_error(self, msg):
-        self.ansible.log(msg)
-        self.errors.append(msg)
-
-    def get_config(self):
-        output = {}
-        for root, dirs, files in os.walk(self.params['root'] + '/orgs'):
-            for file in [x for x in files if x.endswith(('.yml', '.yaml'))]:
-                current_root = os.path.basename(root)
-                a_yaml_file = open(os.path.join(root, file))
-                parsed_yaml_file = yaml.safe_load(a_yaml_file)
-                parent = os.path.basename(os.path.abspath(os.path.join(root, os.pardir)))
-                if parent in output:
-                    if current_root in output[parent]:
-                        output[parent][current_root].update(parsed_yaml_file)
-                    else:
-                        output[parent].update({current_root: parsed_yaml_file})
-                else:
-                    output.update({parent: {current_root: parsed_yaml_file}})
-        return output
+        self._config_loader = ConfigLoader(
+            self.params.get('config_cache_dir'))
+        self.config_index = ConfigIndex(
+            self.params.get('root') or '', self._config_loader,
+            self._tracer)
+
+    @classmethod
+    def get_argument_spec(cls):
+        """Return complete argument spec of the module"""
+        return base_argument_spec(**cls.argument_spec)
+
+    def get_config_changes(self, ref):
+        """Return changes of the configuration since the git reference"""
+        root = self.params.get('root') or '.'
+        with self.trace('config changes', 'config', ref=ref):
+            (rc, out, err) = self.ansible.run_command(
+                ['git', 'diff', '--name-only', '--no-renames', '--relative',
+                 '-z', ref, 'HEAD', '--'],
+                cwd=root)
+            if rc != 0:
+                self.fail_json(
+                    msg=f"Cannot compare configuration with {ref}",
+                    stderr=err)
+            files = dict()
+            for path in out.split('\0'):
+                if not path.endswith(('.yml', '.yaml')):
+                    continue
+                # Files added since the reference do not exist there
+                (rc, content, _) = self.ansible.run_command(
+                    ['git', 'show', f"{ref}:./{path}"], cwd=root)
+                files[path] = content if rc == 0 else None
+        return ConfigChanges(self.config_index, ref, files)
 
     def _prepare_graphql_query(self, query, variables):
         data = {
@@ -121,64 +661,380 @@ class GitHubBase(GitBase):
         }
         return data
 
+    def graphql_request(self, query, variables):
+        """Execute GraphQL query and return `(data, errors)`"""
+        operation = re.search(r'query\s+(\w+)', query)
+        with self.trace(
+            f"graphql {operation.group(1) if operation else 'query'}",
+            'graphql', variables=variables
+        ):
+            body, response, info = self._request(
+                method="POST",
+                url=f"{self.gh_url}/graphql",
+                json=self._prepare_graphql_query(query, variables)
+            )
+        body = body or info.get('body')
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {}
+        errors = data.get('errors')
+        if info['status'] >= 400 and not errors:
+            errors = info.get('msg')
+        return (data.get('data'), errors)
+
+    def _get_run_stats(self):
+        stats = super()._get_run_stats()
+        if self._cache:
+            stats['http_cache'] = self._cache.stats()
+        if self._config_loader.cache_file:
+            stats['config_cache'] = self._config_loader.stats()
+        if self._journal:
+            stats['journal'] = self._journal.stats()
+        if self._sync_state:
+            stats['sync_state'] = self._sync_state.stats()
+        if self._plan:
+            stats['plan'] = dict(
+                file=self.params.get('plan_file'),
+                operations=len(self._plan.operations),
+                applied=self._applied,
+            )
+        return stats
+
+    def _exit_json(self, **kwargs):
+        if self._journal_enabled():
+            # Run completed, nothing to resume
+            self._journal.complete()
+        super()._exit_json(**kwargs)
+
+    def _journal_enabled(self):
+        return (
+            self._journal is not None
+            and not self._planning
+            and not self.ansible.check_mode
+        )
+
+    def _journal_lookup(self, kind, key, digest):
+        """Return journal entry of the item reconciled by the interrupted run
+        against the same configuration or None
+        """
+        if not self._journal_enabled():
+            return None
+        return self._journal.get(kind, key, digest)
+
+    def _journal_record(self, kind, key, digest, errors_count, result):
+        """Record item into the journal unless it produced errors"""
+        if not self._journal_enabled():
+            return
+        if len(self._task_errors()) == errors_count:
+            self._journal.record(kind, key, digest, *result)
+
+    def _journaled(self, kind, key, config, func, *args, **kwargs):
+        """Return `func(*args, **kwargs)` giving `(changed, status)` of the
+        item reconciliation or the result recorded in the journal
+        """
+        if not self._journal_enabled():
+            return func(*args, **kwargs)
+        # Hash the configuration before it is processed
+        digest = config_hash(config)
+        entry = self._journal_lookup(kind, key, digest)
+        if entry:
+            return (entry['changed'], entry['status'])
+        errors_count = len(self._task_errors())
+        result = func(*args, **kwargs)
+        self._journal_record(kind, key, digest, errors_count, result)
+        return result
+
+    def start_plan(self, kind):
+        """Start recording write requests into the change plan"""
+        self._plan = ChangePlan(kind, self.gh_url)
+        self._planning = True
+        # Write requests are recorded instead of being sent, so the state is
+        # to be processed same as in the real run
+        self.ansible.check_mode = False
+
+    def save_plan(self, result):
+        """Save the change plan together with the module result"""
+        self._plan.result = result
+        try:
+            self._plan.save(self.params['plan_file'])
+        except OSError as ex:
+            self.fail_json(msg=f"Cannot save plan: {ex}")
+
+    def _check_precondition(self, precondition):
+        """Return whether resource is in the state observed while planning
+        """
+        headers = dict()
+        if precondition.get('accept'):
+            headers['Accept'] = precondition['accept']
+        if precondition.get('etag'):
+            headers['If-None-Match'] = precondition['etag']
+        # Resource might have been modified by others while being cached
+        (content, response, info) = self._request(
+            method='GET',
+            url=precondition['url'],
+            headers=headers,
+            use_cache=False
+        )
+        status = info['status']
+        if precondition.get('absent'):
+            return status == 404
+        if status == 304:
+            return True
+        if status != 200:
+            return False
+        if precondition.get('etag'):
+            return info.get('etag') == precondition['etag']
+        return (
+            json.loads(content).get('updated_at')
+            == precondition.get('updated_at')
+        )
+
+    def apply_plan(self, kind):
+        """Apply the change plan and return `(changed, result)`
+
+        Only preconditions of the planned operations are verified. When any of
+        the modified resources changed since the plan was created nothing is
+        applied.
+        """
+        try:
+            self._plan = ChangePlan.load(
+                self.params['plan_file'], kind, self.gh_url)
+        except PlanError as ex:
+            self.fail_json(msg=str(ex))
+
+        preconditions = self._plan.preconditions()
+        results = self._run_concurrently(
+            self._check_precondition,
+            [(x,) for x in preconditions],
+            self.page_concurrency)
+        stale = [x['url'] for x, ok in zip(preconditions, results) if not ok]
+        if stale:
+            self.fail_json(
+                msg='Resources were modified since the plan was created',
+                stale=stale,
+                errors=self.errors)
+
+        if not self.ansible.check_mode:
+            for operation in self._plan.operations:
+                self.request(
+                    method=operation['method'],
+                    url=operation['url'],
+                    headers=operation.get('headers'),
+                    json=operation.get('json'),
+                    error_msg=operation.get('error_msg')
+                )
+                self._applied += 1
+        return (len(self._plan.operations) > 0, self._plan.result)
+
+    def _get_org_team_repositories(self, owner):
+        """Fetch repository permissions of all organization teams using
+        GraphQL and return them grouped by the repository name
+        """
+        repos = dict()
+        params = {'owner': owner}
+        while True:
+            (data, errors) = self.graphql_request(
+                QUERY_ORG_TEAMS_REPOSITORIES, params)
+            if errors or not data:
+                self.ansible.log(f"Cannot fetch {owner} teams: {errors}")
+                return None
+            data = data['organization']['teams']
+            for team in data['nodes']:
+                team_params = {'owner': owner, 'slug': team['slug']}
+                connection = team['repositories']
+                while True:
+                    for edge in connection['edges']:
+                        permission = GRAPHQL_PERMISSIONS.get(
+                            edge['permission'])
+                        repos.setdefault(
+                            edge['node']['name'].lower(), []
+                        ).append(Team.from_api({
+                            'slug': team['slug'],
+                            'permission': permission,
+                            'permissions': permission_flags(permission)
+                        }))
+                    if not connection['pageInfo']['hasNextPage']:
+                        break
+                    # Team has access to more then 100 repositories
+                    team_params['repoCursor'] = \
+                        connection['pageInfo']['endCursor']
+                    (team_data, errors) = self.graphql_request(
+                        QUERY_TEAM_REPOSITORIES, team_params)
+                    if errors or not team_data:
+                        self.ansible.log(
+                            f"Cannot fetch {owner}/{team['slug']} team "
+                            f"repositories: {errors}")
+                        return None
+                    connection = \
+                        team_data['organization']['team']['repositories']
+            if not data['pageInfo']['hasNextPage']:
+                break
+            params['teamCursor'] = data['pageInfo']['endCursor']
+        return repos
+
+    def get_org_teams_members(self, owner):
+        """Fetch members of all organization teams with their roles using
+        GraphQL
+
+        Return dictionary indexed by the lowercased team slug with the
+        `member` and `maintainer` lists of members (same as returned by
+        `get_team_members`) or None when the data cannot be fetched.
+        """
+        teams = dict()
+        params = {'owner': owner}
+        while True:
+            (data, errors) = self.graphql_request(
+                QUERY_ORG_TEAMS_MEMBERS, params)
+            if errors or not data:
+                self.ansible.log(
+                    f"Cannot fetch {owner} teams members: {errors}")
+                return None
+            data = data['organization']['teams']
+            for team in data['nodes']:
+                members = teams.setdefault(
+                    team['slug'].lower(), {'member': [], 'maintainer': []})
+                team_params = {'owner': owner, 'slug': team['slug']}
+                connection = team['members']
+                while True:
+                    for edge in connection['edges']:
+                        members[edge['role'].lower()].append(
+                            {'login': edge['node']['login']})
+                    if not connection['pageInfo']['hasNextPage']:
+                        break
+                    # Team has more then 100 members
+                    team_params['memberCursor'] = \
+                        connection['pageInfo']['endCursor']
+                    (team_data, errors) = self.graphql_request(
+                        QUERY_TEAM_MEMBERS, team_params)
+                    if errors or not team_data:
+                        self.ansible.log(
+                            f"Cannot fetch {owner}/{team['slug']} team "
+                            f"members: {errors}")
+                        return None
+                    connection = team_data['organization']['team']['members']
+            if not data['pageInfo']['hasNextPage']:
+                break
+            params['teamCursor'] = data['pageInfo']['endCursor']
+        return teams
+
+    def prefetch_org_repositories(self, owner):
+        """Fetch state of all organization repositories using GraphQL
+
+        Repository settings, topics, direct collaborators and branch protection
+        rules are fetched for 100 repositories per request, team permissions
+        are fetched from the organization teams. Afterwards `get_repo`,
+        `get_repo_topics`, `get_repo_teams`, `get_repo_collaborators` and
+        `get_branch_protection` for repositories of the organization are served
+        from this snapshot until the corresponding resource is modified.
+
+        Returns False when the state can not be prefetched (i.e. on GitHub
+        Enterprise not supporting some of the fields). REST API is used in
+        this case as usual.
+        """
+        snapshot = dict()
+        params = {'owner': owner}
+        while True:
+            (data, errors) = self.graphql_request(
+                QUERY_ORG_REPOSITORIES, params)
+            if errors or not data:
+                self.ansible.log(
+                    f"Cannot prefetch {owner} repositories: {errors}")
+                return False
+            data = data['organization']['repositories']
+            for node in data['nodes']:
+                snapshot[node['name'].lower()] = _graphql_repository(node)
+            if not data['pageInfo']['hasNextPage']:
+                break
+            params['repoCursor'] = data['pageInfo']['endCursor']
+
+        teams = self._get_org_team_repositories(owner)
+        if teams is None:
+            return False
+        for name, record in snapshot.items():
+            record['teams'] = teams.get(name, [])
+
+        with self._lock:
+            for name, record in snapshot.items():
+                self._repos_snapshot[(owner.lower(), name)] = record
+            self._prefetched_orgs.add(owner.lower())
+        return True
+
+    def _from_snapshot(self, owner, repo, key):
+        """Return `(True, value)` when prefetched state of the repository
+        resource is available
+        """
+        if owner.lower() not in self._prefetched_orgs:
+            return (False, None)
+        with self._lock:
+            record = self._repos_snapshot.get((owner.lower(), repo.lower()))
+            if not record or key not in record:
+                # Repositories not found in the snapshot (i.e. renamed ones)
+                # are processed using REST API
+                return (False, None)
+            return (True, copy.deepcopy(record[key]))
+
+    def _drop_snapshot(self, owner, repo, *keys):
+        """Invalidate prefetched state of the modified repository resources
+        """
+        with self._lock:
+            record = self._repos_snapshot.get((owner.lower(), repo.lower()))
+            if record:
+                for key in keys:
+                    record.pop(key, None)
+
     def get_teams(self):
         teams = dict()
-        conf = self.get_config()
-        for owner, val in conf.items():
+        for owner in self.config_index.orgs():
             teams[owner] = dict()
-            teams[owner]['present'] = self.read_yaml_file(
-                path=(f"{self.params['root']}/orgs/{owner}/"
-                      "teams/members.yml")
-            )
-            teams[owner]['dismissed'] = self.read_yaml_file(
-                path=(f"{self.params['root']}/orgs/{owner}/"
-                      "teams/dismissed_members.yml")
-            )
+            teams[owner]['present'] = self.config_index.org_file(
+                owner, 'teams', 'members.yml')
+            teams[owner]['dismissed'] = self.config_index.org_file(
+                owner, 'teams', 'dismissed_members.yml')
+        self._config_loader.save()
 
         return teams
 
     def get_members(self):
         members = dict()
-        conf = self.get_config()
-        for owner, val in conf.items():
+        for owner in self.config_index.orgs():
             members[owner] = dict()
-            members[owner]['present'] = self.read_yaml_file(
-
-                path=(f"{self.params['root']}/orgs/{owner}/"
-                      "people/members.yml")
-            )
-            members[owner]['dismissed'] = self.read_yaml_file(
-                path=(f"{self.params['root']}/orgs/{owner}/"
-                      "people/dismissed_members.yml")
-            )
+            members[owner]['present'] = self.config_index.org_file(
+                owner, 'people', 'members.yml')
+            members[owner]['dismissed'] = self.config_index.org_file(
+                owner, 'people', 'dismissed_members.yml')
+        self._config_loader.save()
 
         return members
 
     def get_branch_protections(self, name):
-        if name not in self._bp_templates:
-            self._bp_templates[name] = self.read_yaml_file(
-                f"{self.params['root']}/templates/{name}.yml")
-        tmpl = self._bp_templates.get(name)
-        if tmpl:
-            if 'who_can_push' in tmpl:
-                tmpl['restrictions'] = tmpl.pop('who_can_push')
-
-        return tmpl
-
-    def read_yaml_file(self, path, org=None, endpoint=None, repo_name=None):
-        if endpoint in ['manage_collaborators', 'branch_protection', 'options', 'topics']:
-            path += f'/{org}/repositories/{repo_name}.yml'
-        if endpoint in ['teams']:
-            path += f'/{org}/teams/members.yml'
-        if endpoint in ['members']:
-            path += f'/{org}/people/members.yml'
-        with open(path, 'r') as file:
-            data = yaml.safe_load(file)
-        return data
+        """Return copy of the branch protection template
 
-    def _request(self, method, url, headers=None, **kwargs):
+        Templates are cached for all repositories (and worker threads), so
+        that every caller gets its own copy to modify.
+        """
+        with self._lock:
+            if name not in self._bp_templates:
+                tmpl = copy.deepcopy(self.config_index.template(name))
+                if tmpl and 'who_can_push' in tmpl:
+                    tmpl['restrictions'] = tmpl.pop('who_can_push')
+                self._bp_templates[name] = tmpl
+            return copy.deepcopy(self._bp_templates[name])
+
+    def _request(self, method, url, headers=None, use_cache=True, **kwargs):
+        """Send the request
+
+        GET requests are served by the HTTP cache (when enabled) unless
+        `use_cache` is False or the caller sends own conditional headers, in
+        which case the response must come from the server.
+        """
         if not headers:
             headers = dict()
+        if any(
+            x.lower() in ('if-none-match', 'if-modified-since')
+            for x in headers
+        ):
+            use_cache = False
 
         headers.update({
             'Authorization': f"token {self.params['token']}",
@@ -190,18 +1046,59 @@ class GitHubBase(GitBase):
         if not url.startswith('http'):
             url = f"{self.gh_url}/{url}"
 
-        return super()._request(
+        if (
+            not self._cache
+            or not use_cache
+            or url == f"{self.gh_url}/graphql"
+        ):
+            return super()._request(
+                method=method,
+                url=url,
+                headers=headers,
+                **kwargs
+            )
+
+        if method != 'GET':
+            result = super()._request(
+                method=method,
+                url=url,
+                headers=headers,
+                **kwargs
+            )
+            self._cache.invalidate(url)
+            return result
+
+        entry = self._cache.lookup(url, headers)
+        if entry:
+            if self._cache.is_fresh(entry):
+                return self._cache.response(url, entry)
+            headers.update(self._cache.conditional_headers(entry))
+        (content, response, info) = super()._request(
             method=method,
             url=url,
             headers=headers,
             **kwargs
         )
+        if entry and info['status'] == 304:
+            # Not modified responses are not counted against the rate limit
+            self._cache.refresh(url, headers, entry, info)
+            return self._cache.response(url, entry, 'revalidated')
+        self._cache.count('misses')
+        if info['status'] == 200:
+            self._cache.store(url, headers, info, content)
+        return (content, response, info)
 
     def request(
         self, method='GET', url=None, headers=None, timeout=15,
-        error_msg=None, ignore_missing=False,
+        error_msg=None, ignore_missing=False, precondition_url=None,
         **kwargs
     ):
+        if self._planning and method != 'GET':
+            # Write requests are only recorded while planning
+            self._plan.record(
+                method, url, json=kwargs.get('json'), headers=headers,
+                error_msg=error_msg, precondition_url=precondition_url)
+            return None
 
         body, response, info = self._request(
             method=method,
@@ -212,6 +1109,8 @@ class GitHubBase(GitBase):
         )
 
         status = info['status']
+        if self._planning and method == 'GET':
+            self._plan.observe(url, info, headers=headers)
 
         if status >= 400 and status != 404:
             if not error_msg:
@@ -233,37 +1132,64 @@ class GitHubBase(GitBase):
         elif body and status < 400:
             return json.loads(body)
 
-    def paginated_request(self, url, headers=None, timeout=15, **kwargs):
+    def paginated_request(
+        self, url, headers=None, timeout=15, error_msg=None, **kwargs
+    ):
+        """Yield items of the listing
+
+        Pages of the maximal size are requested. Once the first page is
+        fetched remaining pages (known from the `rel=last` link) are fetched
+        concurrently.
+        """
         if not url.startswith('http'):
             url = f"{self.gh_url}/{url}"
+        if not get_query_param(url, 'per_page'):
+            url = update_query(url, per_page=PAGE_SIZE)
+
+        page = self._get_page(url, headers, timeout, error_msg)
+        if page is None:
+            return
+        (items, response) = page
+        yield from items
+
+        links = get_links(response.headers)
+        last_page = get_query_param(links.get('last', {}).get('url', ''), 'page')
+        if last_page:
+            tasks = [
+                (update_query(url, page=x), headers, timeout, error_msg)
+                for x in range(2, int(last_page) + 1)
+            ]
+            for page in self._iter_concurrently(
+                self._get_page, tasks, self.page_concurrency
+            ):
+                if page is None:
+                    break
+                yield from page[0]
+            return
 
+        # Cursor based pagination is not giving last page, walk over pages
+        url = links.get('next', {}).get('url')
         while url:
-            content, response, info = self._request(
-                method='GET',
-                url=url,
-                headers=headers,
-                timeout=timeout,
-            )
-            if info["status"] == 404:
+            page = self._get_page(url, headers, timeout, error_msg)
+            if page is None:
                 break
-
+            (items, response) = page
+            yield from items
             url = get_links(response.headers).get("next", {}).get("url")
 
-            yield from json.loads(content)
-
     def get_owner_teams(self, owner):
         """Get Team information"""
-        return self.paginated_request(
+        return Team.from_items(self.paginated_request(
             url=f'orgs/{owner}/teams',
             error_msg=f"Cannot fetch teams for {owner}"
-        )
+        ))
 
     def get_team(self, owner, name, ignore_missing=False):
-        return self.request(
+        return Team.from_api(self.request(
             url=f"orgs/{owner}/teams/{name}",
             error_msg=f"Error fetching {owner}/{name} team",
             ignore_missing=ignore_missing
-        )
+        ))
 
     def create_team(
         self, owner, name, description=None, privacy=None,
@@ -284,7 +1210,7 @@ class GitHubBase(GitBase):
             json=body,
             error_msg=f"Error creating {owner}/{name}"
         )
-        return rsp
+        return Team.from_api(rsp)
 
     def delete_team(self, owner, team_slug):
         """Delete Team"""
@@ -316,12 +1242,12 @@ class GitHubBase(GitBase):
 
     def get_team_members(self, owner, team, role='maintainer'):
         """Get team members"""
-        return self.paginated_request(
+        return User.from_items(self.paginated_request(
             method='GET',
             url=(f"orgs/{owner}/"
                  f"teams/{team}/members?role={role}"),
             error_msg=f"Cannot fetch team {team}@{owner} with role {role}"
-        )
+        ))
 
     def get_team_repo_permissions(self, owner, team, repo):
         """Get team permissions on a repo"""
@@ -334,6 +1260,7 @@ class GitHubBase(GitBase):
 
     def update_team_repo_permissions2(self, org, team, owner, repo, priv):
         """Set team permissions on a repo"""
+        self._drop_snapshot(owner, repo, 'teams')
         self.request(
             method='PUT',
             url=(f"orgs/{org}/"
@@ -345,6 +1272,7 @@ class GitHubBase(GitBase):
 
     def update_team_repo_permissions(self, owner, team, repo, priv):
         """Set team permissions on a repo"""
+        self._drop_snapshot(owner, repo, 'teams')
         self.request(
             method='PUT',
             url=(f"orgs/{owner}/"
@@ -355,6 +1283,7 @@ class GitHubBase(GitBase):
 
     def delete_team_repo_access(self, owner, team, repo):
         """Delete repo access from team"""
+        self._drop_snapshot(owner, repo, 'teams')
         self.request(
             method='DELETE',
             url=(f"orgs/{owner}/"
@@ -383,6 +1312,80 @@ class GitHubBase(GitBase):
             error_msg=f"Membership {login}@{team} not deleted"
         )
 
+    def get_org_repos_updated_since(self, owner, since=None):
+        """Return repositories updated since the given time
+
+        Organization repositories are listed sorted by the update time and
+        listing stops at the first repository not updated since. Returns
+        `(updated, newest)`, where updated maps lower case names of updated
+        repositories to their `(updated_at, pushed_at)` and newest is the
+        update time of the most recently updated repository. Without since
+        only the first page is fetched.
+        """
+        url = update_query(
+            f"{self.gh_url}/orgs/{owner}/repos",
+            sort='updated', direction='desc', per_page=PAGE_SIZE)
+        updated = dict()
+        newest = None
+        while url:
+            page = self._get_page(
+                url, error_msg=f"Cannot list repositories of {owner}")
+            if page is None:
+                break
+            (items, response) = page
+            for item in items:
+                newest = newest or item['updated_at']
+                if since and item['updated_at'] < since:
+                    return (updated, newest)
+                updated[item['name'].lower()] = (
+                    item['updated_at'], item.get('pushed_at'))
+            if not since:
+                break
+            url = get_links(response.headers).get('next', {}).get('url')
+        return (updated, newest)
+
+    def get_org_rulesets(self, owner):
+        """List organization rulesets (without rules)"""
+        return self.paginated_request(
+            url=f"orgs/{owner}/rulesets",
+            error_msg=f"Cannot fetch rulesets of {owner}"
+        )
+
+    def get_org_ruleset(self, owner, ruleset_id):
+        return self.request(
+            url=f"orgs/{owner}/rulesets/{ruleset_id}",
+            error_msg=f"Cannot fetch ruleset {ruleset_id} of {owner}"
+        )
+
+    def create_org_ruleset(self, owner, ruleset):
+        return self.request(
+            method='POST',
+            url=f"orgs/{owner}/rulesets",
+            json=ruleset,
+            error_msg=f"Ruleset {ruleset['name']}@{owner} cannot be created"
+        )
+
+    def update_org_ruleset(self, owner, ruleset_id, ruleset):
+        return self.request(
+            method='PUT',
+            url=f"orgs/{owner}/rulesets/{ruleset_id}",
+            json=ruleset,
+            error_msg=f"Ruleset {ruleset['name']}@{owner} cannot be updated"
+        )
+
+    def delete_org_ruleset(self, owner, ruleset_id):
+        return self.request(
+            method='DELETE',
+            url=f"orgs/{owner}/rulesets/{ruleset_id}",
+            error_msg=f"Ruleset {ruleset_id}@{owner} cannot be deleted"
+        )
+
+    def get_app(self, slug):
+        return self.request(
+            url=f"apps/{slug}",
+            error_msg=f"Cannot fetch app {slug}"
+        )
+
     def get_org_members(self, owner):
         """Get organization members"""
         return self.paginated_request(
@@ -410,10 +1413,10 @@ class GitHubBase(GitBase):
     def get_org_invitations(self, owner):
         """List existing user invitations
         """
-        return self.paginated_request(
+        return Invitation.from_items(self.paginated_request(
             url=f"orgs/{owner}/invitations",
             error_msg=f"Cannot fetch invitations for {owner}"
-        )
+        ))
 
     def create_organization_invitation(self, owner, user, role='direct_member'):
         """Send Invitation to join the org"""
@@ -442,25 +1445,31 @@ class GitHubBase(GitBase):
 
     def get_user(self, login):
         """Get user info"""
-        user = None
-        if login not in self._users_cache:
-            user = self.request(
+        user = self._users_cache.get(login)
+        if user is None:
+            user = User.from_api(self.request(
                 method='GET',
                 url=f"users/{login}",
-            )
+            ))
             if user:
-                self._users_cache[login] = user
-        user = self._users_cache.get(login)
+                with self._lock:
+                    user = self._users_cache.setdefault(login, user)
         return user
 
     def get_repo(self, owner, repo, ignore_missing=False):
         """Get repository information"""
-        return self.request(
+        (found, current) = self._from_snapshot(owner, repo, 'repo')
+        if found:
+            if self._planning:
+                self._plan.observe(
+                    f"repos/{owner}/{repo}", dict(status=200), current)
+            return current
+        return Repository.from_api(self.request(
             method='GET',
             url=f"repos/{owner}/{repo}",
             error_msg=f"Repo {repo}@{owner} cannot be fetched",
             ignore_missing=ignore_missing
-        )
+        ))
 
     def create_repo(self, owner, repo, **args):
         if not args:
@@ -470,12 +1479,14 @@ class GitHubBase(GitBase):
             method='POST',
             url=f"orgs/{owner}/repos",
             json=args,
-            error_msg=f"Repo {repo}@{owner} cannot be created"
+            error_msg=f"Repo {repo}@{owner} cannot be created",
+            precondition_url=f"repos/{owner}/{repo}"
         )
-        return rsp
+        return Repository.from_api(rsp)
 
     def update_repo(self, owner, repo, **kwargs):
         """Update repository options"""
+        self._drop_snapshot(owner, repo, 'repo')
         data = dict()
         for attr in REPOSITORY_UPDATABLE_ATTRIBUTES:
             if attr in kwargs and kwargs[attr] is not None:
@@ -487,10 +1498,12 @@ class GitHubBase(GitBase):
             json=data,
             error_msg=f"Repo {repo}@{owner} cannot be updated"
         )
-        return rsp
+        return Repository.from_api(rsp)
 
     def delete_repo(self, owner, repo):
         """Delete repository"""
+        with self._lock:
+            self._repos_snapshot.pop((owner.lower(), repo.lower()), None)
         rsp = self.request(
             method='DELETE',
             url=f'repos/{owner}/{repo}',
@@ -500,6 +1513,9 @@ class GitHubBase(GitBase):
 
     def get_repo_topics(self, owner, repo):
         """Get repository topics"""
+        (found, current) = self._from_snapshot(owner, repo, 'topics')
+        if found:
+            return current
         headers = dict(
             Accept='application/vnd.github.mercy-preview+json'
         )
@@ -514,6 +1530,7 @@ class GitHubBase(GitBase):
 
     def update_repo_topics(self, owner, repo, topics):
         """Set repository topics"""
+        self._drop_snapshot(owner, repo, 'repo', 'topics')
         rsp = self.request(
             method='PUT',
             url=f'repos/{owner}/{repo}/topics',
@@ -525,6 +1542,14 @@ class GitHubBase(GitBase):
 
     def get_branch_protection(self, owner, repo, branch):
         """Get branch protection rules"""
+        (found, rules) = self._from_snapshot(
+            owner, repo, 'branch_protections')
+        if found:
+            if branch in rules:
+                return rules[branch]
+            if not any(fnmatch.fnmatchcase(branch, x) for x in rules):
+                # Branch is not protected
+                return None
         rsp = self.request(
             method='GET',
             url=(f'repos/{owner}/{repo}/branches/{branch}/protection'),
@@ -532,24 +1557,26 @@ class GitHubBase(GitBase):
                       f"cannot be fetched"
         )
 
-        return rsp
+        return BranchProtection.from_api(rsp)
 
     def update_branch_protection(self, owner, repo, branch, target):
         """Set branch protection rules"""
+        # Request body is built without modifying the target
+        target = dict(target)
         # Checks takes precedence as being more fine granular
         required_status_checks = target.get('required_status_checks', {})
         if required_status_checks:
-            checks = required_status_checks.get('checks', '')
-            contexts = required_status_checks.get('contexts', [])
-            if checks:
-                target['required_status_checks'].pop('contexts', '')
-            elif contexts:
-                target['required_status_checks'].pop('checks', '')
+            required_status_checks = dict(required_status_checks)
+            if required_status_checks.get('checks', ''):
+                required_status_checks.pop('contexts', '')
+            elif required_status_checks.get('contexts', []):
+                required_status_checks.pop('checks', '')
+            target['required_status_checks'] = required_status_checks
         # Restrictions is a mandatory param that supports being "null"
-        restrictions = target.setdefault("restrictions", None)
-        if restrictions == {}:
+        if target.get("restrictions") in ({}, None):
             target["restrictions"] = None
 
+        self._drop_snapshot(owner, repo, 'branch_protections')
         self.request(
             method='PUT',
             url=(f'repos/{owner}/{repo}/branches/{branch}/protection'),
@@ -559,26 +1586,55 @@ class GitHubBase(GitBase):
 
         return True
 
+    def apply_branch_protection_updates(
+        self, owner, repo, branch, target, updates
+    ):
+        """Apply updates of the branch protection using its sub-resources"""
+        url = f'repos/{owner}/{repo}/branches/{branch}/protection'
+        for (method, resource, body) in updates:
+            if resource is None:
+                self.update_branch_protection(owner, repo, branch, target)
+                continue
+            self._drop_snapshot(owner, repo, 'branch_protections')
+            self.request(
+                method=method,
+                url=f"{url}/{resource}",
+                json=body,
+                error_msg=f"Repo {repo}@{owner} branch protection "
+                          f"{resource} cannot be updated",
+                precondition_url=url
+            )
+        return True
+
     def get_repo_teams(self, owner, repo):
         """Get repo teams"""
+        (found, current) = self._from_snapshot(owner, repo, 'teams')
+        if found:
+            return current
         rsp = self.paginated_request(
             method='GET',
             url=(f"repos/{owner}/{repo}/teams"),
             error_msg=f"Cannot fetch team {owner}/{repo} teams"
         )
 
-        return rsp
+        return Team.from_items(rsp)
 
     def get_repo_collaborators(self, owner, repo, affiliation='direct'):
         """Get repo collaborators"""
-        return self.paginated_request(
+        if affiliation == 'direct':
+            (found, current) = self._from_snapshot(
+                owner, repo, 'collaborators')
+            if found:
+                return current
+        return User.from_items(self.paginated_request(
             method='GET',
             url=(f"repos/{owner}/{repo}/collaborators?affiliation={affiliation}"),
             error_msg=f"Cannot fetch repo {owner}/{repo} collaborators"
-        )
+        ))
 
     def delete_repo_collaborator(self, owner, repo, username):
         """Delete repo collaborator"""
+        self._drop_snapshot(owner, repo, 'collaborators')
         self.request(
             method='DELETE',
             url=(f"repos/{owner}/{repo}/collaborators/{username}"),
@@ -587,6 +1643,7 @@ class GitHubBase(GitBase):
 
     def update_repo_collaborator(self, owner, repo, username, permission='pull'):
         """Add/Update repo collaborator"""
+        self._drop_snapshot(owner, repo, 'collaborators')
         return self.request(
             method='PUT',
             url=(f"repos/{owner}/{repo}/collaborators/{username}"),
@@ -620,10 +1677,10 @@ class GitHubBase(GitBase):
                 break
             data = data["data"]["organization"]["membersWithRole"]
             for item in data["edges"]:
-                members.append({
+                members.append(User.from_api({
                     "login": item["node"]["login"].lower(),
                     "role": 'Member' if item["role"] == 'MEMBER' else 'Owner'
-                })
+                }))
             if data["pageInfo"]["hasNextPage"]:
                 # Put cursor to next page into params
                 params['memberCursor'] = data["pageInfo"]["endCursor"]
@@ -668,7 +1725,15 @@ class GitHubBase(GitBase):
                 owner, user, target_invite_role)
         return (True, 'Invited')
 
-    def _manage_org_members(self, org, target_members, exclusive=False, check=True):
+    def _manage_org_members(
+        self, org, target_members, exclusive=False, check=True, scope=None
+    ):
+        """Reconcile organization members
+
+        With scope given (lower case logins) only those users are
+        reconciled, invitations and memberships of other users are left
+        untouched.
+        """
         status = dict()
         changed = False
         invites_supported = True
@@ -692,11 +1757,30 @@ class GitHubBase(GitBase):
             invites_supported = False
             current_invites = {}
 
+        if scope is not None:
+            target_members = [
+                x for x in target_members if x['login'].lower() in scope]
+            current_members = {
+                k: v for (k, v) in current_members.items() if k in scope}
+            current_invites = {
+                k: v for (k, v) in current_invites.items() if k in scope}
+
         # Loop through target users
         for member in target_members:
             login = member['login'].lower()
             target_role = member['role'].lower()
             msg = None
+            digest = config_hash(member)
+            entry = self._journal_lookup('member', f"{org}/{login}", digest)
+            if entry:
+                # Member was reconciled by the interrupted run
+                current_members.pop(login, None)
+                current_invites.pop(login, None)
+                status[login] = entry['status']
+                if entry['changed']:
+                    changed = True
+                continue
+            errors_count = len(self.errors)
             try:
                 if login not in current_members:
                     if invites_supported:
@@ -731,6 +1815,9 @@ class GitHubBase(GitBase):
                 self.save_error(f"Error processing member {login}:"
                                 f"{str(ex)}")
                 (is_changed, msg) = (False, str(ex))
+            self._journal_record(
+                'member', f"{org}/{login}", digest, errors_count,
+                (is_changed, msg))
 
             status[login] = msg
             if is_changed:
@@ -776,7 +1863,8 @@ class GitHubBase(GitBase):
         return False
 
     def _manage_org_team(
-        self, owner, slug, current, target, exclusive=False, check_mode=True
+        self, owner, slug, current, target, exclusive=False, check_mode=True,
+        memberships=None
     ):
         changed = False
         status = dict()
@@ -796,12 +1884,13 @@ class GitHubBase(GitBase):
                     parent=target.get('parent'),
                     maintainers=target.get('maintainer', [])
                 )
-                if current is None:
+            if current is not None:
+                slug = current['slug']
+            else:
+                if not check_mode and not self._planning:
                     self.save_error(f"Unable to create team: {slug} / {target} with "
                                     f"maintainers : {', '.join(target.get('maintainer', []))} "
                                     "(all maintainers must be completely onboarded)")
-                slug = current['slug']
-            else:
                 is_existing = False
         else:
             slug = current['slug']
@@ -823,7 +1912,15 @@ class GitHubBase(GitBase):
         for attr in ['name', 'description', 'privacy']:
             status[attr] = target.get(attr)
 
-        if is_existing:
+        if is_existing and memberships is not None:
+            # Memberships were prefetched for all teams of the organization
+            current_members = {
+                x['login']: x for x in memberships.get('member', [])
+            }
+            current_maintainers = {
+                x['login']: x for x in memberships.get('maintainer', [])
+            }
+        elif is_existing:
             current_members = {
                 x['login']: x for x in self.get_team_members(
                     owner, slug, role='member')
@@ -885,41 +1982,61 @@ class GitHubBase(GitBase):
                 status['maintainers'][member] = 'removed'
         return (changed, status)
 
-    def _manage_org_teams(self, owner, teams, exclusive=False, check_mode=True):
+    def _manage_org_teams(
+        self, owner, teams, exclusive=False, check_mode=True, scope=None
+    ):
+        """Reconcile organization teams
+
+        With scope given (lower case team slugs) only those teams are
+        reconciled and deleted when not configured anymore.
+        """
+        if scope is not None:
+            teams = [x for x in teams if x.get('slug').lower() in scope]
         # Get current org teams
         status = dict()
         changed = False
         current_teams = list(self.get_owner_teams(owner))
-        required_team_slugs = []
+        required_team_slugs = set()
         if current_teams is None:
             self.fail_json(
                 msg=f'Cannot fetch current teams for {owner}',
                 errors=self.errors)
+        current_by_slug = {x['slug'].lower(): x for x in current_teams}
+        # Fetch memberships of all teams at once. When not possible every
+        # team members are fetched individually.
+        memberships = None
+        if current_teams:
+            memberships = self.get_org_teams_members(owner)
 
         # Go over teams required to exist
         for team in teams:
             slug = team.get('slug')
-            required_team_slugs.append(slug)
-            current = None
-            # Find current team
-            for t in current_teams:
-                if t['slug'].lower() == slug.lower():
-                    current = t
-                    break
-
-            (is_changed, status[slug]) = self._manage_org_team(
+            required_team_slugs.add(slug)
+            current = current_by_slug.get(slug.lower())
+            team_memberships = None
+            if current and memberships is not None:
+                team_memberships = memberships.get(current['slug'].lower())
+
+            (is_changed, status[slug]) = self._journaled(
+                'team',
+                f"{owner}/{slug}",
+                team,
+                self._manage_org_team,
                 owner,
                 slug,
                 current,
                 team,
                 exclusive,
-                check_mode
+                check_mode,
+                memberships=team_memberships
             )
             if is_changed:
                 changed = True
         if exclusive:
             for team in current_teams:
                 slug = team['slug']
+                if scope is not None and slug.lower() not in scope:
+                    continue
                 if slug not in required_team_slugs:
                     changed = True
                     status[slug] = {'status': 'deleted'}
@@ -931,118 +2048,118 @@ class GitHubBase(GitBase):
 
         return (changed, status)
 
-    def _is_repo_update_needed(self, current, target):
-        for attr in REPOSITORY_UPDATABLE_ATTRIBUTES:
-            if attr in target and target[attr] != current.get(attr):
-                return True
-
-    def _is_branch_protection_update_needed(
-        self, owner, repo, branch, target, current=None
-    ):
-        if not current:
-            current = self.get_branch_protection(owner, repo, branch)
+    def _get_bypass_actor(self, owner, actor_type, name):
+        """Return ruleset bypass actor of the team or app"""
+        if actor_type == 'OrganizationAdmin':
+            return dict(actor_id=1, actor_type=actor_type,
+                        bypass_mode='always')
+        key = (owner.lower(), actor_type, name)
+        if key not in self._actor_ids:
+            if actor_type == 'Team':
+                data = self.get_team(owner, name, ignore_missing=True)
+            else:
+                data = self.get_app(name)
+            self._actor_ids[key] = data['id'] if data else None
+        if self._actor_ids[key] is None:
+            self.save_error(f"{actor_type} {name} of {owner} does not exist")
+            return None
+        return dict(actor_id=self._actor_ids[key], actor_type=actor_type,
+                    bypass_mode='always')
 
-        if not current:
-            return True
-        else:
-            for attr in ['allow_deletions', 'allow_force_pushes',
-                         'allow_fork_syncing', 'enforce_admins',
-                         'required_linear_history',
-                         'required_conversation_resolution']:
-                if (
-                    attr in target
-                    and (
-                        attr not in current
-                        or target[attr] != current[attr]['enabled']
-                    )
-                ):
-                    return True
-
-        current_restrictions = current.get('restrictions')
-        target_restrictions = target.get('restrictions')
-        current_pr_review = current.get('required_pull_request_reviews', {})
-        target_pr_review = target.get('required_pull_request_reviews', {})
-        current_status_checks = current.get('required_status_checks', {})
-        target_status_checks = target.get('required_status_checks', {})
-        if (current_status_checks.get(
-            'strict', False) != target_status_checks.get(
-                'strict', False)):
-            return True
+    def get_ruleset_body(self, owner, name, config):
+        """Return body of the organization ruleset and the list of template
+        settings not supported by rulesets
+        """
+        rules = []
+        bypass = []
+        unsupported = []
+        if config.get('template'):
+            (rules, bypass, unsupported) = protection_rules(
+                self.get_branch_protections(config['template']))
+        bypass_actors = [
+            x for x in (
+                self._get_bypass_actor(owner, actor_type, actor)
+                for (actor_type, actor) in bypass)
+            if x
+        ]
+        body = dict(
+            name=name,
+            target=config.get('target', 'branch'),
+            enforcement=config.get('enforcement', 'active'),
+            conditions=ruleset_conditions(config),
+            rules=rules + list(config.get('rules', [])),
+            bypass_actors=bypass_actors + list(
+                config.get('bypass_actors', [])),
+        )
+        return (body, unsupported)
 
-        # rsc.checks:
-        # Only checks or contexts can be present
-        current_checks = current_status_checks.get('checks', []) or []
-        target_checks = target_status_checks.get('checks', []) or []
-        if current_checks or target_checks:
-            if (
-                set(
-                    [f"{x.get('context')}:{x.get('app_id')}" for x in
-                     current_checks]
-                ) != set(
-                    [f"{x.get('context')}:{x.get('app_id')}" for x in
-                     target_checks]
-                )
-            ):
-                return True
-        else:
-            # checks were not present, process contexts
-            current_contexts = current_status_checks.get('contexts', []) or []
-            target_contexts = target_status_checks.get('contexts', []) or []
+    def get_protection_ruleset(self, owner, repo, template):
+        """Return name of the organization ruleset enforcing the protection
+        template on the default branch of the repository
+        """
+        rulesets = self.config_index.section(owner, 'rulesets')
+        for (name, config) in rulesets.items():
             if (
-                set(
-                    current_contexts
-                ) != set(
-                    target_contexts
-                )
+                config.get('template') == template
+                and ruleset_covers(config, repo)
             ):
-                return True
+                return name
+        return None
 
-        # GH api supports "null" as a way to disable restrictions on the branch
-        if not target_restrictions and current_restrictions or target_restrictions and not current_restrictions:
-            return True
-        if target_restrictions:
-            for case in [
-                ('users', 'login'),
-                ('teams', 'slug'),
-                ('apps', 'slug')
-            ]:
-                if not current_restrictions or case[0] not in current_restrictions:
-                    return True
-                if (
-                    set(
-                        [x[case[1]] for x in current_restrictions[case[0]]]
-                    ) != set(target_restrictions[case[0]])
-                ):
-                    return True
-
-        if target_pr_review:
-            for attr in ['dismiss_stale_reviews',
-                         'require_code_owner_reviews',
-                         'required_approving_review_count']:
-                if (
-                    attr in target_pr_review
-                    and target_pr_review[attr] != current_pr_review.get(
-                        attr, False)
-                ):
-                    return True
-
-            if 'dismissal_restrictions' in target_pr_review:
-                t = target_pr_review['dismissal_restrictions']
-
-                if 'dismissal_restrictions' not in current_pr_review:
-                    return True
-
-                c = current_pr_review['dismissal_restrictions']
-
-                for case in ['users', 'teams']:
-                    if (
-                        set(
-                            [x['login'] for x in c.get(case, [])]
-                        ) != set(t[case])
-                    ):
-                        return True
+    def _manage_org_rulesets(
+        self, owner, rulesets, exclusive=False, check_mode=True
+    ):
+        """Reconcile organization rulesets"""
+        changed = False
+        status = dict()
+        current_rulesets = {
+            x['name']: x for x in self.get_org_rulesets(owner)
+            if x.get('source_type', 'Organization') == 'Organization'
+        }
+        for (name, config) in rulesets.items():
+            (target, unsupported) = self.get_ruleset_body(
+                owner, name, config)
+            status[name] = dict(status='unchanged')
+            if unsupported:
+                status[name]['unsupported'] = unsupported
+                self.ansible.warn(
+                    f"Ruleset {name}@{owner} ignores settings of the template "
+                    f"{config['template']}: {', '.join(unsupported)}")
+            current = current_rulesets.pop(name, None)
+            if not current:
+                changed = True
+                status[name]['status'] = 'created'
+                if not check_mode:
+                    self.create_org_ruleset(owner, target)
+                continue
+            status[name]['id'] = current['id']
+            # Listing does not include rules and conditions
+            current = self.get_org_ruleset(owner, current['id'])
+            if current and is_ruleset_update_needed(target, current):
+                changed = True
+                status[name]['status'] = 'updated'
+                if not check_mode:
+                    self.update_org_ruleset(owner, current['id'], target)
 
-        return False
+        for (name, current) in current_rulesets.items():
+            if not exclusive:
+                status[name] = dict(status='Not Managed', id=current['id'])
+                continue
+            changed = True
+            status[name] = dict(status='deleted', id=current['id'])
+            if not check_mode:
+                self.delete_org_ruleset(owner, current['id'])
+        return (changed, status)
+
+    def get_branch_protection_updates(
+        self, owner, repo, branch, target, current=None
+    ):
+        """Return minimal list of updates of the branch protection (see
+        `protection.updates`)
+        """
+        if not current:
+            current = self.get_branch_protection(owner, repo, branch)
+        return protection_updates(target, current)
 
     def _manage_repo_teams(
         self, owner, repo_name, target, check_mode=False
@@ -1139,7 +2256,7 @@ class GitHubBase(GitBase):
             and archive and current_repo.get('archived')
         ):
             # Do nothing for the archived repo
-            return (changed, current_repo)
+            return (changed, current_repo.to_dict())
 
         if current_repo and self._is_repo_update_needed(current_repo, kwargs):
             changed = True
@@ -1163,14 +2280,13 @@ class GitHubBase(GitBase):
         if current_repo and branch_protections is not None:
             current_repo['branch_protections'] = []
             for bp in branch_protections:
-                if (
-                    self._is_branch_protection_update_needed(
-                        owner, repo_name, bp['branch'], bp)
-                ):
+                updates = self.get_branch_protection_updates(
+                    owner, repo_name, bp['branch'], bp)
+                if updates:
                     changed = True
                     if not check_mode:
-                        self.update_branch_protection(
-                            owner, repo_name, bp['branch'], bp)
+                        self.apply_branch_protection_updates(
+                            owner, repo_name, bp['branch'], bp, updates)
                 current_repo['branch_protections'].append(bp)
 
         # Teams
@@ -1200,18 +2316,7 @@ class GitHubBase(GitBase):
                     owner, repo_name, archived=True)
 
         if current_repo:
-            # Get rid of all those XXX_url properties
-            for k in list(current_repo.keys()):
-                if k.endswith('_url'):
-                    current_repo.pop(k)
-            org = current_repo.pop('organization', None)
-            current_repo['organization'] = dict(
-                login=org.get('login')
-            )
-            owner = current_repo.pop('owner', None)
-            if owner:
-                current_repo['owner'] = dict(
-                    login=owner.get('login')
-                )
+            # Record holds only the relevant properties
+            current_repo = current_repo.to_dict()
 
         return (changed, current_repo)
@@ -0,0 +1,202 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import hashlib
+import http.client
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from urllib.parse import quote, unquote, urlsplit
+
+
+# Response headers required to reproduce the response from the cache
+CACHED_HEADERS = [
+    'cache-control',
+    'content-type',
+    'etag',
+    'last-modified',
+    'link',
+    'x-total-count',
+]
+
+
+def _max_age(cache_control):
+    """Return (max_age, storable) parsed out of the Cache-Control header"""
+    directives = [x.strip().lower() for x in (cache_control or '').split(',')]
+    if 'no-store' in directives:
+        return (0, False)
+    if 'no-cache' in directives:
+        return (0, True)
+    for directive in directives:
+        match = re.match(r'max-age=(\d+)$', directive)
+        if match:
+            return (int(match.group(1)), True)
+    return (0, True)
+
+
+def invalidation_scope(path):
+    """Return path prefix of cached resources affected by a write to path
+
+    Writes to repository sub-resources affect the whole repository, writes to
+    team sub-resources affect the team and writes to other organization
+    resources (memberships, invitations, teams list) affect the organization.
+    Team repository permissions additionally affect the repository itself.
+    """
+    parts = [x for x in path.split('/') if x]
+    scopes = []
+    if len(parts) >= 3 and parts[0] == 'repos':
+        scopes.append(parts[:3])
+    elif len(parts) >= 4 and parts[0] == 'orgs' and parts[2] == 'teams':
+        scopes.append(parts[:4])
+        if len(parts) >= 7 and parts[4] == 'repos':
+            scopes.append(['repos'] + parts[5:7])
+    elif len(parts) >= 2:
+        scopes.append(parts[:2])
+    else:
+        scopes.append(parts)
+    return ['/'.join(x) for x in scopes]
+
+
+class CachedResponse:
+    """Response served out of the cache"""
+
+    def __init__(self, url, headers, content):
+        self.url = url
+        self.status = self.code = 200
+        self.reason = 'OK'
+        self.headers = http.client.HTTPMessage()
+        for k, v in headers.items():
+            self.headers[k] = v
+        self._content = content
+
+    def read(self):
+        content, self._content = self._content, b''
+        return content
+
+
+class HTTPCache:
+    """On-disk HTTP cache for GET requests honoring ETag and Cache-Control
+
+    Entries are stored in a directory tree reflecting the URL path so that a
+    write to a resource can drop all cached representations of the resource
+    and its sub-resources. Entries are keyed by the URL (including query) and
+    the Accept header and are separated per token.
+    """
+
+    def __init__(self, path, token, base_url=''):
+        self.base_path = urlsplit(base_url).path.strip('/')
+        self.root = os.path.join(
+            os.path.expanduser(path),
+            hashlib.sha256(token.encode('utf-8')).hexdigest()[:16])
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _dir(self, url):
+        parts = urlsplit(url)
+        segments = [quote(unquote(x), safe='') for x in parts.path.split('/')
+                    if x and x not in ('.', '..')]
+        return os.path.join(self.root, quote(parts.netloc, safe=''), *segments)
+
+    def _file(self, url, headers):
+        key = f"{urlsplit(url).query}|{(headers or {}).get('Accept', '')}"
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return os.path.join(self._dir(url), f"{name}.json")
+
+    def count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def lookup(self, url, headers):
+        """Return cached entry for the request or None"""
+        try:
+            with open(self._file(url, headers), 'r') as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry):
+        return entry.get('expires', 0) > time.time()
+
+    def conditional_headers(self, entry):
+        """Return headers making the request conditional"""
+        headers = dict()
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last-modified'):
+            headers['If-Modified-Since'] = entry['last-modified']
+        return headers
+
+    def response(self, url, entry, counter='hits'):
+        """Build `(content, response, info)` out of the cached entry"""
+        self.count(counter)
+        content = entry['body'].encode('utf-8')
+        info = dict(entry['headers'])
+        info.update(url=url, status=200, msg=f"OK ({len(content)} bytes)")
+        return (content, CachedResponse(url, entry['headers'], content), info)
+
+    def store(self, url, headers, info, content):
+        """Store successful response in the cache"""
+        (max_age, storable) = _max_age(info.get('cache-control'))
+        if not storable or not (
+            info.get('etag') or info.get('last-modified') or max_age
+        ):
+            return
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        entry = dict(
+            expires=time.time() + max_age,
+            etag=info.get('etag'),
+            headers={k: info[k] for k in CACHED_HEADERS if k in info},
+            body=content,
+        )
+        entry['last-modified'] = info.get('last-modified')
+        self._write(self._file(url, headers), entry)
+
+    def refresh(self, url, headers, entry, info):
+        """Extend entry lifetime after the 304 response"""
+        (max_age, _) = _max_age(
+            info.get('cache-control', entry['headers'].get('cache-control')))
+        entry['expires'] = time.time() + max_age
+        self._write(self._file(url, headers), entry)
+
+    def _write(self, path, entry):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            (fd, tmp) = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(entry, fp)
+            os.replace(tmp, path)
+        except OSError:
+            # Cache is best effort only
+            pass
+
+    def invalidate(self, url):
+        """Drop cached entries affected by the write request to url"""
+        parts = urlsplit(url)
+        path = parts.path.strip('/')
+        prefix = ''
+        # Strip API base path (i.e. /api/v3 of the GitHub Enterprise)
+        if self.base_path and path.startswith(f"{self.base_path}/"):
+            prefix = f"{self.base_path}/"
+            path = path[len(prefix):]
+        for scope in invalidation_scope(path):
+            shutil.rmtree(
+                self._dir(f"{parts.scheme}://{parts.netloc}/{prefix}{scope}"),
+                ignore_errors=True)
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            revalidated=self.revalidated,
+            misses=self.misses,
+        )
@@ -0,0 +1,111 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def config_hash(data):
+    """Return stable hash of the configuration data"""
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+class Journal:
+    """Append-only journal of reconciled items
+
+    Every item (repository, team, member) reconciled without errors is
+    appended to the journal together with the hash of the configuration it
+    was reconciled against and its result. Entries are flushed to disk
+    immediately, so that after an interrupted run the following run with
+    `resume` skips items which are done and whose configuration did not
+    change. Journal is removed once the run completes successfully.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.resume = resume
+        self.resumed = 0
+        self.recorded = 0
+        self._entries = None
+        self._fp = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = dict()
+        if not self.resume:
+            return
+        try:
+            with open(self.path, 'r') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[(entry['kind'], entry['key'])] = entry
+                    except (ValueError, KeyError):
+                        # Last line may be incomplete after the crash
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def get(self, kind, key, digest):
+        """Return journal entry of the item when it is done for the
+        configuration with the digest
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get((kind, key))
+            if entry and entry['hash'] == digest:
+                self.resumed += 1
+                return entry
+        return None
+
+    def record(self, kind, key, digest, changed, status):
+        """Append reconciled item to the journal"""
+        entry = dict(
+            kind=kind,
+            key=key,
+            hash=digest,
+            changed=changed,
+            status=status,
+            time=int(time.time()),
+        )
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            self._load()
+            if self._fp is None:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                # Previous journal is continued only when resuming
+                self._fp = open(self.path, 'a' if self.resume else 'w')
+            self._fp.write(line)
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+            self._entries[(kind, key)] = entry
+            self.recorded += 1
+
+    def complete(self):
+        """Drop the journal after the successful run"""
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return dict(
+            file=self.path,
+            resumed=self.resumed,
+            recorded=self.recorded,
+        )
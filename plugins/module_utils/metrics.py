@@ -0,0 +1,110 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import math
+import re
+import threading
+
+from urllib.parse import urlsplit
+
+
+# Path parameters following the static path segment
+PATH_PARAMETERS = {
+    'apps': ['app_slug'],
+    'branch_protections': ['branch'],
+    'branches': ['branch'],
+    'collaborators': ['username'],
+    'hooks': ['hook_id'],
+    'invitations': ['invitation_id'],
+    'members': ['username'],
+    'memberships': ['username'],
+    'orgs': ['org'],
+    'projects': ['owner', 'repo'],
+    'repos': ['owner', 'repo'],
+    'teams': ['team'],
+    'topics': ['topic'],
+    'users': ['username'],
+}
+
+
+def endpoint_template(url):
+    """Return endpoint template of the url
+
+    i.e. `https://api.github.com/repos/o/r/branches/main/protection` is
+    turned into `repos/{owner}/{repo}/branches/{branch}/protection`.
+    """
+    parts = [x for x in urlsplit(url).path.split('/') if x]
+    # Strip API base path (/api/v3 of the GitHub Enterprise, /api/v1 of Gitea)
+    if len(parts) >= 2 and parts[0] == 'api' and re.match(r'v\d+$', parts[1]):
+        parts = parts[2:]
+    template = []
+    i = 0
+    while i < len(parts):
+        segment = parts[i]
+        if segment.isdigit():
+            segment = '{id}'
+        template.append(segment)
+        i += 1
+        for name in PATH_PARAMETERS.get(segment, []):
+            if i >= len(parts):
+                break
+            template.append(f"{{{name}}}")
+            i += 1
+    return '/'.join(template)
+
+
+def percentile(values, pct):
+    """Return percentile of the sorted values (nearest rank)"""
+    if not values:
+        return None
+    return values[max(math.ceil(pct / 100.0 * len(values)) - 1, 0)]
+
+
+class Metrics:
+    """Per endpoint statistics of the API requests"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = dict()
+
+    def record(self, method, url, status, bytes_out, bytes_in, elapsed):
+        key = f"{method} {endpoint_template(url)}"
+        with self._lock:
+            endpoint = self._endpoints.setdefault(key, dict(
+                count=0, status=dict(), bytes_in=0, bytes_out=0,
+                latencies=[]))
+            endpoint['count'] += 1
+            endpoint['status'][str(status)] = \
+                endpoint['status'].get(str(status), 0) + 1
+            endpoint['bytes_in'] += bytes_in
+            endpoint['bytes_out'] += bytes_out
+            endpoint['latencies'].append(elapsed)
+
+    def stats(self):
+        endpoints = dict()
+        total = dict(count=0, bytes_in=0, bytes_out=0, time=0.0)
+        with self._lock:
+            for key, endpoint in sorted(self._endpoints.items()):
+                latencies = sorted(endpoint['latencies'])
+                endpoints[key] = dict(
+                    count=endpoint['count'],
+                    status=dict(endpoint['status']),
+                    bytes_in=endpoint['bytes_in'],
+                    bytes_out=endpoint['bytes_out'],
+                    latency_ms={
+                        name: round(value * 1000, 1) for name, value in [
+                            ('min', latencies[0]),
+                            ('p50', percentile(latencies, 50)),
+                            ('p95', percentile(latencies, 95)),
+                            ('max', latencies[-1]),
+                        ]
+                    },
+                )
+                for attr in ['count', 'bytes_in', 'bytes_out']:
+                    total[attr] += endpoint[attr]
+                total['time'] += sum(latencies)
+        total['time'] = round(total['time'], 3)
+        return dict(total=total, endpoints=endpoints)
@@ -0,0 +1,176 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+def project(value, schema):
+    """Return value reduced to the fields of the schema
+
+    Schema maps field names of the object to the schema of their values
+    (None for values taken as is). Lists are projected item by item.
+    """
+    if schema is None or value is None:
+        return value
+    if isinstance(value, list):
+        return [project(x, schema) for x in value]
+    if not isinstance(value, dict):
+        return value
+    return {
+        key: project(value[key], sub)
+        for key, sub in schema.items() if key in value
+    }
+
+
+class Record:
+    """Compact projection of the API object
+
+    Only fields listed in `__slots__` are kept when the API response is
+    parsed, nested objects are reduced according to `schema`. Records
+    support read access of the dict (`record['name']`, `record.get('name')`,
+    `'name' in record`) so that they can be used in place of the parsed
+    JSON. Fields missing in the response stay unset.
+    """
+
+    __slots__ = ()
+    # Schema of the nested objects
+    schema = {}
+
+    @classmethod
+    def from_api(cls, data):
+        """Return record of the parsed API object"""
+        if data is None or isinstance(data, cls):
+            return data
+        record = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(record, name, project(
+                    data[name], cls.schema.get(name)))
+        return record
+
+    @classmethod
+    def from_items(cls, items):
+        """Yield records of the listing"""
+        for item in items:
+            yield cls.from_api(item)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key, default)
+
+    def keys(self):
+        return [x for x in self.__slots__ if hasattr(self, x)]
+
+    def to_dict(self):
+        result = dict()
+        for key in self.keys():
+            value = getattr(self, key)
+            if isinstance(value, Record):
+                value = value.to_dict()
+            result[key] = value
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        # Records are copied and pickled through their dict representation
+        return (self.__class__.from_api, (self.to_dict(),))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+
+class Repository(Record):
+    __slots__ = (
+        'id', 'name', 'full_name', 'owner', 'organization', 'description',
+        'homepage', 'private', 'visibility', 'fork', 'archived', 'disabled',
+        'is_template', 'has_issues', 'has_projects', 'has_wiki',
+        'allow_forking', 'allow_squash_merge', 'allow_merge_commit',
+        'allow_rebase_merge', 'allow_auto_merge', 'allow_update_branch',
+        'delete_branch_on_merge', 'default_branch', 'topics', 'created_at',
+        'updated_at', 'pushed_at', 'branch_protections',
+    )
+    schema = {
+        'owner': {'login': None},
+        'organization': {'login': None},
+    }
+
+
+class Team(Record):
+    __slots__ = (
+        'id', 'slug', 'name', 'description', 'privacy', 'parent',
+        'permission', 'permissions',
+    )
+    schema = {
+        'parent': {'slug': None},
+    }
+
+
+class User(Record):
+    __slots__ = ('id', 'login', 'type', 'role', 'permissions')
+
+
+class Invitation(Record):
+    __slots__ = ('id', 'login', 'role')
+
+
+class BranchProtection(Record):
+    __slots__ = (
+        'enforce_admins', 'required_linear_history', 'allow_force_pushes',
+        'allow_deletions', 'required_conversation_resolution',
+        'allow_fork_syncing', 'required_signatures', 'lock_branch',
+        'required_status_checks', 'required_pull_request_reviews',
+        'restrictions',
+    )
+    _enabled = {'enabled': None}
+    _actors = {
+        'users': {'login': None},
+        'teams': {'slug': None},
+        'apps': {'slug': None},
+    }
+    schema = {
+        'enforce_admins': _enabled,
+        'required_linear_history': _enabled,
+        'allow_force_pushes': _enabled,
+        'allow_deletions': _enabled,
+        'required_conversation_resolution': _enabled,
+        'allow_fork_syncing': _enabled,
+        'required_signatures': _enabled,
+        'lock_branch': _enabled,
+        'required_status_checks': {
+            'strict': None,
+            'contexts': None,
+            'checks': None,
+        },
+        'required_pull_request_reviews': {
+            'dismiss_stale_reviews': None,
+            'require_code_owner_reviews': None,
+            'required_approving_review_count': None,
+            'require_last_push_approval': None,
+            'dismissal_restrictions': _actors,
+            'bypass_pull_request_allowances': _actors,
+        },
+        'restrictions': _actors,
+    }
@@ -0,0 +1,128 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.models import Record
+
+
+PLAN_VERSION = 1
+
+
+class PlanError(Exception):
+    pass
+
+
+class ChangePlan:
+    """Serializable plan of changes
+
+    While planning, write requests are recorded as ordered operations instead
+    of being sent. Every operation carries a precondition describing the state
+    of the modified resource observed while planning (ETag, `updated_at` or
+    resource absence), so that applying the plan only verifies resources were
+    not modified in the meanwhile instead of reading the whole state again.
+    """
+
+    def __init__(self, kind, base_url, operations=None, result=None):
+        self.kind = kind
+        self.base_url = base_url.rstrip('/')
+        self.operations = operations or []
+        self.result = result or dict()
+        self._observed = dict()
+        self._lock = threading.Lock()
+
+    def resource(self, url):
+        """Return resource path of the url relative to the API base url"""
+        if url.startswith(self.base_url):
+            url = url[len(self.base_url):]
+        return urlsplit(url).path.strip('/')
+
+    def observe(self, url, info, data=None, headers=None):
+        """Remember state of the resource read while planning"""
+        key = self.resource(url)
+        state = None
+        if info.get('status') == 404:
+            state = dict(absent=True)
+        elif info.get('etag'):
+            state = dict(etag=info['etag'])
+            # ETag depends on the representation
+            if headers and headers.get('Accept'):
+                state['accept'] = headers['Accept']
+        elif isinstance(data, (dict, Record)) and data.get('updated_at'):
+            state = dict(updated_at=data['updated_at'])
+        if state:
+            with self._lock:
+                # First observation is what the decision was based on
+                self._observed.setdefault(key, state)
+
+    def record(
+        self, method, url, json=None, headers=None, error_msg=None,
+        precondition_url=None
+    ):
+        """Record write operation"""
+        key = self.resource(precondition_url or url)
+        operation = dict(
+            method=method,
+            url=self.resource(url),
+            json=json,
+            headers=headers,
+            error_msg=error_msg,
+        )
+        with self._lock:
+            state = self._observed.get(key)
+            if state:
+                operation['precondition'] = dict(url=key, **state)
+            self.operations.append(operation)
+
+    def preconditions(self):
+        """Return distinct preconditions in the order of operations"""
+        result = dict()
+        for operation in self.operations:
+            precondition = operation.get('precondition')
+            if precondition:
+                result.setdefault(precondition['url'], precondition)
+        return list(result.values())
+
+    def save(self, path):
+        data = dict(
+            version=PLAN_VERSION,
+            kind=self.kind,
+            base_url=self.base_url,
+            created_at=int(time.time()),
+            operations=self.operations,
+            result=self.result,
+        )
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        (fd, tmp) = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(data, fp, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, kind, base_url):
+        try:
+            with open(path, 'r') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError) as ex:
+            raise PlanError(f"Cannot read plan {path}: {ex}")
+        if data.get('version') != PLAN_VERSION:
+            raise PlanError(
+                f"Plan version {data.get('version')} is not supported")
+        if data.get('kind') != kind:
+            raise PlanError(
+                f"Plan was created by the {data.get('kind')} module")
+        if data.get('base_url') != base_url.rstrip('/'):
+            raise PlanError(
+                f"Plan was created for {data.get('base_url')}")
+        return cls(
+            kind, base_url, data.get('operations'), data.get('result'))
@@ -0,0 +1,205 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.journal import config_hash
+
+
+# Boolean settings of the protection
+SWITCHES = [
+    'allow_deletions', 'allow_fork_syncing', 'allow_force_pushes',
+    'enforce_admins', 'lock_branch', 'required_conversation_resolution',
+    'required_linear_history', 'required_signatures',
+]
+# Switches having dedicated sub-resource (enabled with POST, disabled with
+# DELETE)
+SWITCH_RESOURCES = ['enforce_admins', 'required_signatures']
+REVIEW_SETTINGS = [
+    'dismiss_stale_reviews', 'require_code_owner_reviews',
+    'required_approving_review_count', 'require_last_push_approval',
+]
+# Actor kinds and the attribute identifying the actor object
+ACTORS = [('users', 'login'), ('teams', 'slug'), ('apps', 'slug')]
+
+
+def _enabled(value):
+    if isinstance(value, dict):
+        return bool(value.get('enabled'))
+    return bool(value)
+
+
+def _names(items, key):
+    """Return sorted names of the actors given as names or objects"""
+    return sorted(set(
+        x.get(key) if isinstance(x, dict) else x for x in items or []))
+
+
+def _status_checks(value):
+    if not value:
+        return None
+    result = dict(strict=bool(value.get('strict', False)))
+    if value.get('contexts') is not None:
+        result['contexts'] = sorted(set(value['contexts']))
+    if value.get('checks') is not None:
+        result['checks'] = sorted(
+            [x.get('context'), x.get('app_id')] for x in value['checks'])
+    if not (
+        result['strict'] or result.get('contexts') or result.get('checks')
+    ):
+        # Not strict without checks is not requiring anything
+        return None
+    return result
+
+
+def _actors(value, kinds):
+    if not value:
+        return None
+    return {kind: _names(value.get(kind), key) for (kind, key) in kinds}
+
+
+def _reviews(value):
+    if not value:
+        return None
+    result = {
+        attr: value[attr] for attr in REVIEW_SETTINGS
+        if value.get(attr) is not None
+    }
+    if 'dismissal_restrictions' in value:
+        result['dismissal_restrictions'] = _actors(
+            value['dismissal_restrictions'], ACTORS[:2])
+    return result
+
+
+def canonical(protection):
+    """Return canonical form of the branch protection
+
+    Both the API representation (switches wrapped into `{enabled: ...}`,
+    actors as user, team and app objects) and the configuration (plain
+    values, actors as names) are turned into the same form with sorted
+    actor names and status checks. Switches and review settings are only
+    present when set in the protection, status checks and push restrictions
+    are always present (None when disabled).
+    """
+    protection = protection or {}
+    result = {
+        attr: _enabled(protection[attr]) for attr in SWITCHES
+        if protection.get(attr) is not None
+    }
+    result['required_status_checks'] = _status_checks(
+        protection.get('required_status_checks'))
+    result['restrictions'] = _actors(protection.get('restrictions'), ACTORS)
+    reviews = _reviews(protection.get('required_pull_request_reviews'))
+    if reviews:
+        result['required_pull_request_reviews'] = reviews
+    return result
+
+
+def _canonical_target(protection):
+    """Return canonical form of the target protection
+
+    Only one of the status checks and contexts is sent when updating the
+    protection (checks take precedence when given), so that the other one
+    (i.e. `contexts: []` defaulted by the module options) is not compared.
+    """
+    result = canonical(protection)
+    status_checks = result.get('required_status_checks')
+    if status_checks:
+        if status_checks.get('checks'):
+            status_checks.pop('contexts', None)
+        else:
+            status_checks.pop('checks', None)
+    return result
+
+
+def _restrict(current, target):
+    """Return section of the current protection reduced to the settings
+    present in the target one
+    """
+    if not isinstance(current, dict) or not isinstance(target, dict):
+        return current
+    if 'checks' in target:
+        # Checks take precedence over the contexts
+        return dict(strict=current.get('strict'),
+                    checks=current.get('checks', []))
+    defaults = dict(dismissal_restrictions=None, contexts=[])
+    return {
+        key: current.get(key, defaults.get(key, False)) for key in target
+    }
+
+
+def diff(target, current):
+    """Return names of the protection sections (switches, status checks,
+    reviews, restrictions) in which the current protection differs from
+    the target one
+
+    Sections are compared by the hash of their canonical form.
+    """
+    target = _canonical_target(target)
+    current = canonical(current)
+    return [
+        section for (section, value) in target.items()
+        if config_hash(value) != config_hash(
+            _restrict(current.get(section), value))
+    ]
+
+
+def updates(target, current):
+    """Return minimal list of updates bringing current protection to the
+    target one
+
+    Every update is `(method, resource, body)`, where resource is the path
+    relative to the branch protection. Resource None stands for replacing
+    the whole protection, which is necessary when the branch is not
+    protected yet, a setting without dedicated sub-resource changes or a
+    sub-resource being enabled can not be created separately.
+    """
+    if not current:
+        return [('PUT', None, None)]
+    sections = diff(target, current)
+    if not sections:
+        return []
+    target = _canonical_target(target)
+    current = canonical(current)
+    result = []
+    for section in sections:
+        value = target[section]
+        if section in SWITCH_RESOURCES:
+            result.append(('POST' if value else 'DELETE', section, None))
+        elif section == 'required_status_checks':
+            if value is None:
+                result.append(('DELETE', section, None))
+            elif current.get(section) is None:
+                return [('PUT', None, None)]
+            else:
+                body = dict(strict=value['strict'])
+                if 'checks' in value:
+                    body['checks'] = [
+                        dict(context=context, app_id=app_id)
+                        for (context, app_id) in value['checks']]
+                else:
+                    body['contexts'] = value.get('contexts', [])
+                result.append(('PATCH', section, body))
+        elif section == 'required_pull_request_reviews':
+            if current.get(section) is None:
+                return [('PUT', None, None)]
+            body = dict(value)
+            if body.get('dismissal_restrictions') is None:
+                body.pop('dismissal_restrictions', None)
+            result.append(('PATCH', section, body))
+        elif section == 'restrictions':
+            if value is None:
+                result.append(('DELETE', section, None))
+            elif current.get(section) is None:
+                return [('PUT', None, None)]
+            else:
+                for (kind, _) in ACTORS:
+                    if value[kind] != current[section][kind]:
+                        result.append(
+                            ('PUT', f"restrictions/{kind}",
+                             {kind: value[kind]}))
+        else:
+            # Remaining switches can only be set replacing the protection
+            return [('PUT', None, None)]
+    return result
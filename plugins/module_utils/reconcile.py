@@ -0,0 +1,429 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.git import RequestError
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.github import GitHubBase
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.journal import config_hash
+
+
+class GitHubReconciler(GitHubBase):
+    """Reconciliation of the organizations with the configuration
+
+    Phases (members, teams, repositories) are usable individually by the
+    dedicated modules and together by the C(gitcontrol) module sharing the
+    parsed configuration, HTTP session and caches between them.
+    """
+
+    # Bulk prefetch is not worth it for few out of sync repositories
+    prefetch_threshold = 100
+
+    def reconcile_members(self, changes=None):
+        """Reconcile members of all configured organizations"""
+        status = dict()
+        changed = False
+        with self.trace('load configuration', 'config'):
+            config = self.get_members()
+        for owner, owner_dict in config.items():
+            scope = None
+            if changes:
+                scope = set(changes.changes(owner, 'people', 'users'))
+                if not scope:
+                    status[owner] = dict()
+                    continue
+            with self.trace(owner, 'organization'):
+                (org_changed, status[owner]) = self._manage_org_members(
+                    owner,
+                    owner_dict['present'].get('users', []),
+                    False,
+                    self.ansible.check_mode,
+                    scope=scope
+                )
+            if org_changed:
+                changed = True
+        return (changed, status)
+
+    def reconcile_teams(self, changes=None):
+        """Reconcile teams of all configured organizations"""
+        status = dict()
+        changed = False
+        with self.trace('load configuration', 'config'):
+            config = self.get_teams()
+        for owner, owner_dict in config.items():
+            scope = None
+            if changes:
+                scope = set(
+                    x.lower()
+                    for x in changes.changes(owner, 'teams', 'teams'))
+                if not scope:
+                    status[owner] = dict()
+                    continue
+            teams = []
+            for slug, team in owner_dict['present']['teams'].items():
+                team['slug'] = slug
+                team['name'] = slug
+                teams.append(team)
+
+            with self.trace(owner, 'organization'):
+                (is_changed, status[owner]) = self._manage_org_teams(
+                    owner,
+                    teams,
+                    check_mode=self.ansible.check_mode,
+                    scope=scope)
+            if is_changed:
+                changed = True
+        return (changed, status)
+
+    def _is_repo_update_needed(self, current, target):
+        for attr in [
+            'description', 'homepage', 'private', 'visibility',
+            'has_issues', 'has_projects', 'has_wiki', 'is_template',
+            'default_branch', 'allow_squash_merge',
+            'allow_merge_commit', 'allow_rebase_merge',
+            'delete_branch_on_merge', 'archived'
+        ]:
+            if attr in target and target[attr] != current.get(attr):
+                return True
+
+    def _get_privs(self, mapping):
+        """Convert teams/collaborators mapping into entity/priv mapping"""
+        privs = dict()
+        for k, v in mapping.items():
+            for priv in ['maintain', 'pull', 'push', 'admin', 'triage']:
+                if isinstance(v, list):
+                    for team in v:
+                        if team not in privs:
+                            privs[team] = dict(
+                                admin=False, pull=False,
+                                push=False, maintain=False, triage=False)
+                        if (
+                            priv in mapping
+                            and isinstance(mapping[priv], list)
+                            and team in mapping[priv]
+                        ):
+                            privs[team][priv] = True
+        return privs
+
+    def _pick_priv_from_dict(self, privs_dict):
+        """Knowing hash of individual privileges return the one (first match)
+        which is true.
+
+        dict(admin=False, pull=False, push=True, maintain=False) will return
+        "push"
+        """
+        if privs_dict.get("push") and privs_dict.get("pull"):
+            return "push"
+        for k, v in privs_dict.items():
+            # permission setting is not getting hash, but
+            # single value
+            if v:
+                return k
+
+    def _manage_repo(self, owner, repo, repo_dict):
+        """Reconcile single repository and return (changed, status)"""
+        changed = False
+        status = dict()
+        with self.trace('settings', 'phase'):
+            current_repo = self.get_repo(owner, repo, ignore_missing=True)
+            self._remember_remote(current_repo)
+
+            if not current_repo:
+                if not self.ansible.check_mode:
+                    repo_args = dict(
+                        description=repo_dict.get('description'),
+                        homepage=repo_dict.get('homepage'),
+                        private=repo_dict.get('private', False),
+                        visibility=repo_dict.get('visibility', 'public'),
+                        has_issues=repo_dict.get('has_issues', True),
+                        has_projects=repo_dict.get('has_projects', True),
+                        has_wiki=repo_dict.get('has_wiki', True),
+                        # is_template=repo_dict.get('is_template', False),
+                        auto_init=repo_dict.get('auto_init', False),
+                        allow_squash_merge=repo_dict.get(
+                            'allow_squash_merge', True),
+                        allow_merge_commit=repo_dict.get(
+                            'allow_merge_commit', True),
+                        allow_rebase_merge=repo_dict.get(
+                            'allow_rebase_merge', True),
+                        allow_auto_merge=repo_dict.get(
+                            'allow_auto_merge', False),
+                        delete_branch_on_merge=repo_dict.get(
+                            'delete_branch_on_merge', False)
+                    )
+                    for k in ['gitignore_template', 'license_template']:
+                        if k in repo_dict:
+                            repo_args[k] = repo_dict[k]
+                    current_repo = self.create_repo(
+                        owner, repo, **repo_args)
+                    self._remember_remote(current_repo)
+
+            if current_repo and current_repo.get('archived', False):
+                # Not doing anything on archived repos
+                return (changed, status)
+
+            if current_repo and self._is_repo_update_needed(current_repo, repo_dict):
+                changed = True
+                if not self.ansible.check_mode:
+                    self._remember_remote(
+                        self.update_repo(owner, repo, **repo_dict))
+        # Current state is too huge to return it
+        status['description'] = repo_dict
+
+        if current_repo and 'topics' in repo_dict:
+            with self.trace('topics', 'phase'):
+                current_topics = self.get_repo_topics(owner, repo)
+                if set(repo_dict['topics']) != set(current_topics):
+                    changed = True
+                    if not self.ansible.check_mode:
+                        self.update_repo_topics(
+                            owner, repo, repo_dict['topics'])
+                status['topics'] = repo_dict['topics']
+
+        # TODO(gtema): collaborator management need to be done,
+        # but we have not proper data structure (team, collaborator,
+        # outside collaborator)
+        if current_repo and 'teams' in repo_dict:
+            with self.trace('teams', 'phase'):
+                status['teams'] = dict()
+                privs = self._get_privs(repo_dict['teams'])
+
+                for team in self.get_repo_teams(owner, repo):
+                    # TODO: need to differentiate between org teams and
+                    # project teams
+                    # pop privs for the team to track which team is new
+                    target_privs = privs.pop(team['slug'], {})
+                    if not target_privs:
+                        # Delete project access from team
+                        changed = True
+                        if not self.ansible.check_mode:
+                            self.delete_team_repo_access(
+                                owner, team['slug'], repo)
+                    target_priv = self._pick_priv_from_dict(target_privs)
+                    if (
+                        target_priv
+                        and self._pick_priv_from_dict(
+                            team['permissions']) != target_priv
+                    ):
+                        changed = True
+                        if not self.ansible.check_mode:
+                            self.update_team_repo_permissions(
+                                owner, team=team['slug'], repo=repo,
+                                priv=target_priv)
+
+                    status['teams'][team['slug']] = target_priv
+                # privs dict now contains remaining privileges
+                for team, target_privs in privs.items():
+                    target_priv = self._pick_priv_from_dict(target_privs)
+
+                    changed = True
+                    if not self.ansible.check_mode:
+                        self.update_team_repo_permissions(
+                            owner, team=team, repo=repo,
+                            priv=target_priv)
+                    status['teams'][team] = target_priv
+
+        ruleset = None
+        if current_repo and 'protection_rules' in repo_dict:
+            # Template enforced by the organization ruleset is not applied
+            # to the repository individually
+            ruleset = self.get_protection_ruleset(
+                owner, repo, repo_dict['protection_rules'])
+            if ruleset:
+                status['branch_protection'] = dict(ruleset=ruleset)
+
+        if current_repo and 'protection_rules' in repo_dict and not ruleset:
+            with self.trace('branch_protection', 'phase'):
+                tmpl = self.get_branch_protections(
+                    repo_dict['protection_rules'])
+
+                updates = self.get_branch_protection_updates(
+                    owner, repo, repo_dict['default_branch'], tmpl)
+                if updates:
+                    changed = True
+                    if not self.ansible.check_mode:
+                        self.apply_branch_protection_updates(
+                            owner, repo, repo_dict['default_branch'],
+                            tmpl, updates)
+
+                status['branch_protection'] = tmpl
+
+        return (changed, status)
+
+    def _repo_config(self, owner, repo, repo_dict):
+        """Return configuration affecting the repository reconciliation"""
+        config = dict(repo_dict)
+        if 'protection_rules' in repo_dict:
+            # Template changes affect the repository as well
+            config['protection_rules'] = self.config_index.template(
+                repo_dict['protection_rules'])
+            config['ruleset'] = self.get_protection_ruleset(
+                owner, repo, repo_dict['protection_rules'])
+        return config
+
+    def _remember_remote(self, current_repo):
+        """Remember remote state the repository is reconciled against"""
+        if current_repo:
+            self._local.remote = (
+                current_repo.get('updated_at'),
+                current_repo.get('pushed_at'))
+
+    def _sync_enabled(self):
+        return (
+            self._sync_state is not None
+            and not self._planning
+            and not self.ansible.check_mode
+        )
+
+    def _manage_repo_journaled(self, owner, repo, repo_dict):
+        config = self._repo_config(owner, repo, repo_dict)
+        errors_count = len(self._task_errors())
+        with self.trace(f"{owner}/{repo}", 'repository'):
+            result = self._journaled(
+                'repository', f"{owner}/{repo}", config,
+                self._manage_repo, owner, repo, repo_dict)
+        if self._sync_enabled():
+            remote = self._local.__dict__.pop('remote', None)
+            if remote and len(self._task_errors()) == errors_count:
+                self._sync_state.record(
+                    owner, repo, config_hash(config), *remote)
+            else:
+                self._sync_state.forget(owner, repo)
+        return result
+
+    def _changed_since(self, owner, tasks, changes, status):
+        """Return tasks of repositories affected by the configuration
+        changes and report the remaining ones in the status
+        """
+        templates = changes.templates()
+        for (old, new) in changes.changes(owner, 'rulesets').values():
+            # Rulesets take over (or give back) protection of repositories
+            # using their templates
+            templates.update(x.get('template') for x in (old, new) if x)
+        names = set(changes.changes(owner, 'repositories'))
+        result = []
+        for (owner, repo, repo_dict) in tasks:
+            if (
+                repo in names
+                or repo_dict.get('protection_rules') in templates
+            ):
+                result.append((owner, repo, repo_dict))
+            else:
+                status[owner][repo] = dict(config='unchanged')
+        return result
+
+    def _out_of_sync(self, owner, tasks, status):
+        """Return tasks of repositories to be reconciled and report the
+        remaining ones in the status
+        """
+        since = None
+        if not self.params.get('full_sync'):
+            since = self._sync_state.last_sync(owner)
+        try:
+            (updated, newest) = self.get_org_repos_updated_since(
+                owner, since)
+        except RequestError as ex:
+            self.ansible.log(f"Cannot list updated repositories: {ex}")
+            return tasks
+        if self._sync_enabled() and newest:
+            self._sync_state.set_last_sync(owner, newest)
+        if not since:
+            return tasks
+        result = []
+        for (owner, repo, repo_dict) in tasks:
+            digest = config_hash(self._repo_config(owner, repo, repo_dict))
+            if self._sync_state.is_current(owner, repo, digest, updated):
+                status[owner][repo] = dict(sync='unchanged')
+            else:
+                result.append((owner, repo, repo_dict))
+        return result
+
+    def reconcile_rulesets(self, changes=None):
+        """Reconcile rulesets of all configured organizations
+
+        With changes of the configuration given only organizations with
+        changed rulesets or with rulesets built from changed templates are
+        reconciled.
+        """
+        status = dict()
+        changed = False
+        for owner in self.config_index.orgs():
+            rulesets = self.config_index.section(owner, 'rulesets')
+            if not rulesets:
+                continue
+            if changes and not changes.changes(owner, 'rulesets') and not (
+                changes.templates().intersection(
+                    x.get('template') for x in rulesets.values())
+            ):
+                status[owner] = dict()
+                continue
+            with self.trace(owner, 'organization'):
+                (org_changed, status[owner]) = self._manage_org_rulesets(
+                    owner,
+                    rulesets,
+                    check_mode=self.ansible.check_mode
+                )
+            if org_changed:
+                changed = True
+        return (changed, status)
+
+    def reconcile_repositories(self, changes=None):
+        """Reconcile all configured repositories
+
+        With changes of the configuration given only affected repositories
+        are reconciled.
+        """
+        # Only repositories configuration is required
+        owners = self.config_index.orgs()
+        changed = False
+        status = {owner: dict() for owner in owners}
+
+        with self.trace('load configuration', 'config'):
+            tasks = {
+                owner: [
+                    (owner, repo, repo_dict)
+                    for repo, repo_dict in self.config_index.section(
+                        owner, 'repositories').items()
+                ]
+                for owner in owners
+            }
+            for owner in owners:
+                # Rulesets replace protection templates of the repositories
+                self.config_index.section(owner, 'rulesets')
+            self._config_loader.save()
+
+        for owner in owners:
+            with self.trace(owner, 'organization'):
+                selected = tasks[owner]
+                if changes:
+                    selected = self._changed_since(
+                        owner, selected, changes, status)
+                if self._sync_state:
+                    with self.trace('sync state', 'phase'):
+                        selected = self._out_of_sync(owner, selected, status)
+                if self.params.get('prefetch', True) and (
+                    len(selected) == len(tasks[owner])
+                    or len(selected) > self.prefetch_threshold
+                ):
+                    with self.trace('prefetch', 'phase'):
+                        self.prefetch_org_repositories(owner)
+                results = self._run_concurrently(
+                    self._manage_repo_journaled, selected,
+                    self.params.get('concurrency') or 1)
+            if self._sync_enabled():
+                self._sync_state.prune(
+                    owner, [repo for (_, repo, _) in tasks[owner]])
+
+            # Aggregate in the configuration order to keep output stable
+            for (owner, repo, repo_dict), (repo_changed, repo_status) in zip(
+                selected, results
+            ):
+                status[owner][repo] = repo_status
+                if repo_changed:
+                    changed = True
+            # Keep the configuration order of skipped repositories as well
+            status[owner] = {
+                repo: status[owner][repo] for (_, repo, _) in tasks[owner]
+            }
+        return (changed, status)
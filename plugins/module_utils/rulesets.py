@@ -0,0 +1,199 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import fnmatch
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.journal import config_hash
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.protection import canonical
+
+
+DEFAULT_BRANCH = '~DEFAULT_BRANCH'
+ALL = '~ALL'
+
+
+def _refs(branches):
+    """Return ref name patterns of the branches"""
+    return [
+        x if x.startswith(('~', 'refs/')) else f"refs/heads/{x}"
+        for x in branches or []
+    ]
+
+
+def protection_rules(protection):
+    """Convert branch protection (template) into ruleset rules
+
+    Returns `(rules, bypass, unsupported)`. Bypass is a list of
+    `(actor_type, name)` of actors allowed to bypass the rules (teams and
+    apps with push access, organization admins unless admins are enforced).
+    Users with push access and review dismissal restrictions have no ruleset
+    equivalent, names of such settings are returned as unsupported.
+    """
+    bp = canonical(protection)
+    rules = []
+    bypass = []
+    unsupported = []
+    if bp.get('allow_deletions') is False:
+        rules.append(dict(type='deletion'))
+    if bp.get('allow_force_pushes') is False:
+        rules.append(dict(type='non_fast_forward'))
+    if bp.get('required_linear_history'):
+        rules.append(dict(type='required_linear_history'))
+    if bp.get('required_signatures'):
+        rules.append(dict(type='required_signatures'))
+
+    reviews = bp.get('required_pull_request_reviews')
+    if reviews or bp.get('required_conversation_resolution'):
+        reviews = reviews or {}
+        rules.append(dict(type='pull_request', parameters=dict(
+            dismiss_stale_reviews_on_push=reviews.get(
+                'dismiss_stale_reviews', False),
+            require_code_owner_review=reviews.get(
+                'require_code_owner_reviews', False),
+            require_last_push_approval=reviews.get(
+                'require_last_push_approval', False),
+            required_approving_review_count=reviews.get(
+                'required_approving_review_count', 0),
+            required_review_thread_resolution=bp.get(
+                'required_conversation_resolution', False),
+        )))
+        dismissal = reviews.get('dismissal_restrictions')
+        if dismissal and (dismissal['users'] or dismissal['teams']):
+            unsupported.append('dismissal_restrictions')
+
+    checks = bp.get('required_status_checks')
+    if checks:
+        if 'checks' in checks:
+            required = [
+                dict(context=context, integration_id=app_id)
+                if app_id is not None else dict(context=context)
+                for (context, app_id) in checks['checks']]
+        else:
+            required = [dict(context=x) for x in checks.get('contexts', [])]
+        rules.append(dict(type='required_status_checks', parameters=dict(
+            strict_required_status_checks_policy=checks['strict'],
+            required_status_checks=required,
+        )))
+
+    restrictions = bp.get('restrictions')
+    if restrictions is not None:
+        # Only bypass actors may push into the branch
+        rules.append(dict(type='update', parameters=dict(
+            update_allows_fetch_and_merge=False)))
+        bypass.extend(('Team', x) for x in restrictions['teams'])
+        bypass.extend(('Integration', x) for x in restrictions['apps'])
+        if restrictions['users']:
+            unsupported.append('restrictions.users')
+    if bp.get('enforce_admins') is False:
+        bypass.append(('OrganizationAdmin', None))
+    return (rules, bypass, unsupported)
+
+
+def ruleset_conditions(config):
+    """Return conditions of the ruleset configuration"""
+    conditions = dict(ref_name=dict(
+        include=_refs(config.get('branches', [DEFAULT_BRANCH])),
+        exclude=_refs(config.get('exclude_branches', [])),
+    ))
+    if config.get('properties'):
+        conditions['repository_property'] = dict(
+            include=[
+                dict(name=name, property_values=(
+                    values if isinstance(values, list) else [values]))
+                for (name, values) in sorted(config['properties'].items())
+            ],
+            exclude=[],
+        )
+    else:
+        conditions['repository_name'] = dict(
+            include=config.get('repositories', [ALL]),
+            exclude=config.get('exclude_repositories', []),
+        )
+    return conditions
+
+
+def covers(config, repo, branch=DEFAULT_BRANCH):
+    """Return whether the ruleset configuration applies to the branch of
+    the repository
+
+    Rulesets targeting repositories by properties are not considered to
+    cover any repository since properties are not known locally.
+    """
+    if config.get('enforcement', 'active') != 'active':
+        return False
+    if config.get('target', 'branch') != 'branch' or config.get('properties'):
+        return False
+    conditions = ruleset_conditions(config)
+    refs = conditions['ref_name']
+    if branch in refs['exclude'] or (
+        branch not in refs['include'] and ALL not in refs['include']
+    ):
+        return False
+    names = conditions['repository_name']
+
+    def match(patterns):
+        return any(
+            x == ALL or fnmatch.fnmatch(repo.lower(), x.lower())
+            for x in patterns)
+    return match(names['include']) and not match(names['exclude'])
+
+
+def _restrict(current, target):
+    """Return current value reduced to the structure of the target one"""
+    if isinstance(target, dict):
+        current = current if isinstance(current, dict) else {}
+        return {k: _restrict(current.get(k), v) for (k, v) in target.items()}
+    if isinstance(target, list) and isinstance(current, list):
+        # Items are reduced to the fields of any of the target items
+        schema = None
+        for item in target:
+            if isinstance(item, dict):
+                schema = dict(schema or {}, **item)
+        return sorted(
+            (_restrict(x, schema) for x in current), key=config_hash)
+    return current
+
+
+def _canonical(ruleset, target=None):
+    rules = dict()
+    for rule in ruleset.get('rules') or []:
+        rules[rule['type']] = rule.get('parameters') or {}
+    bypass = sorted(
+        (x.get('actor_type'), x.get('actor_id'), x.get('bypass_mode'))
+        for x in ruleset.get('bypass_actors') or [])
+    result = dict(
+        name=ruleset.get('name'),
+        target=ruleset.get('target'),
+        enforcement=ruleset.get('enforcement'),
+        conditions=ruleset.get('conditions') or {},
+        rules=rules,
+        bypass_actors=bypass,
+    )
+    if target is not None:
+        result['conditions'] = _restrict(
+            result['conditions'], target['conditions'])
+        result['rules'] = {
+            name: _restrict(params, target['rules'][name])
+            if name in target['rules'] else params
+            for (name, params) in rules.items()
+        }
+    else:
+        result['conditions'] = _restrict(
+            result['conditions'], result['conditions'])
+        result['rules'] = {
+            name: _restrict(params, params) for (name, params) in rules.items()
+        }
+    return result
+
+
+def is_ruleset_update_needed(target, current):
+    """Compare ruleset body with the current ruleset
+
+    Settings returned by the API but not given in the target (i.e. default
+    parameters of the rules) are ignored, rules and bypass actors are
+    compared as sets.
+    """
+    target = _canonical(target)
+    return config_hash(target) != config_hash(_canonical(current, target))
@@ -0,0 +1,112 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import json
+import os
+import tempfile
+import threading
+
+
+SYNC_STATE_VERSION = 1
+
+
+class SyncState:
+    """State of the last successful reconciliation of repositories
+
+    For every organization the time of the newest repository update seen by
+    the last run is stored, for every repository the `updated_at` and
+    `pushed_at` observed when it was reconciled together with the hash of its
+    configuration. Repositories not updated remotely since the last run and
+    with unchanged configuration need not to be reconciled again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.skipped = 0
+        self.recorded = 0
+        self._orgs = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._orgs is not None:
+            return
+        self._orgs = dict()
+        try:
+            with open(self.path, 'r') as fp:
+                data = json.load(fp)
+            if data.get('version') == SYNC_STATE_VERSION:
+                self._orgs = data.get('orgs', dict())
+        except (OSError, ValueError):
+            pass
+
+    def _org(self, owner):
+        self._load()
+        return self._orgs.setdefault(
+            owner.lower(), dict(last_sync=None, repos=dict()))
+
+    def last_sync(self, owner):
+        """Return newest repository update time seen by the last run"""
+        with self._lock:
+            return self._org(owner)['last_sync']
+
+    def set_last_sync(self, owner, timestamp):
+        with self._lock:
+            self._org(owner)['last_sync'] = timestamp
+
+    def is_current(self, owner, repo, digest, updated):
+        """Return whether the repository need not to be reconciled
+
+        `updated` maps names of repositories updated since the last sync to
+        their `(updated_at, pushed_at)`.
+        """
+        with self._lock:
+            entry = self._org(owner)['repos'].get(repo.lower())
+            if not entry or entry['hash'] != digest:
+                return False
+            remote = updated.get(repo.lower())
+            if remote and list(remote) != [
+                entry['updated_at'], entry['pushed_at']
+            ]:
+                return False
+            self.skipped += 1
+            return True
+
+    def record(self, owner, repo, digest, updated_at, pushed_at):
+        with self._lock:
+            self._org(owner)['repos'][repo.lower()] = dict(
+                hash=digest, updated_at=updated_at, pushed_at=pushed_at)
+            self.recorded += 1
+
+    def forget(self, owner, repo):
+        """Drop the repository so that it is reconciled by the next run"""
+        with self._lock:
+            self._org(owner)['repos'].pop(repo.lower(), None)
+
+    def prune(self, owner, repos):
+        """Drop repositories not present in the configuration anymore"""
+        names = set(x.lower() for x in repos)
+        with self._lock:
+            state = self._org(owner)['repos']
+            for name in [x for x in state if x not in names]:
+                state.pop(name)
+
+    def save(self):
+        with self._lock:
+            self._load()
+            data = dict(version=SYNC_STATE_VERSION, orgs=self._orgs)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            (fd, tmp) = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(data, fp)
+            os.replace(tmp, self.path)
+
+    def stats(self):
+        return dict(
+            file=self.path,
+            skipped=self.skipped,
+            recorded=self.recorded,
+        )
@@ -0,0 +1,142 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class Span:
+    """Timed section of the run
+
+    Arguments set on the span (i.e. response status or request id) are
+    stored with the event once the span ends.
+    """
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = None
+
+    def set(self, **kwargs):
+        self.args.update(kwargs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and exc_type is not SystemExit:
+            self.args['error'] = f"{exc_type.__name__}: {exc}"
+        self.tracer.add(
+            self.name, self.cat, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class NullSpan:
+    """Span of the disabled tracing"""
+
+    def set(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(tracer, name, cat, **args):
+    """Return span of the tracer or no-op span when tracing is disabled"""
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, cat, **args)
+
+
+class Tracer:
+    """Collector of spans in the Chrome trace event format
+
+    Every span is stored as a complete (`X`) event of the thread it was
+    executed in, so that the resulting file opened in Perfetto or
+    chrome://tracing shows nesting of the spans per worker thread, the
+    critical path of the run and the time spent waiting on serialization
+    points (i.e. pacing of the content modifying requests).
+    """
+
+    def __init__(self, path, name='module'):
+        self.path = path
+        self.name = name
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._events = []
+        main = threading.main_thread()
+        self._threads = {main.ident: main.name}
+        self._lock = threading.Lock()
+
+    def _ts(self, value):
+        # Trace event timestamps are in microseconds
+        return round((value - self._origin) * 1000000, 1)
+
+    def span(self, name, cat, **args):
+        return Span(self, name, cat, args)
+
+    def add(self, name, cat, start, end, args=None):
+        """Add complete event for the current thread"""
+        thread = threading.current_thread()
+        event = dict(
+            name=name,
+            cat=cat,
+            ph='X',
+            ts=self._ts(start),
+            dur=round((end - start) * 1000000, 1),
+            pid=self.pid,
+            tid=thread.ident,
+        )
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def save(self):
+        """Write trace file
+
+        Span of the whole run ends at the time of saving since the module
+        exits without unwinding the run.
+        """
+        with self._lock:
+            events = [
+                dict(name='process_name', ph='M', pid=self.pid,
+                     args=dict(name=self.name)),
+            ]
+            for (tid, name) in self._threads.items():
+                events.append(dict(
+                    name='thread_name', ph='M', pid=self.pid, tid=tid,
+                    args=dict(name=name)))
+            events.append(dict(
+                name=self.name, cat='run', ph='X', ts=0,
+                dur=self._ts(time.perf_counter()), pid=self.pid,
+                tid=threading.main_thread().ident))
+            events.extend(sorted(self._events, key=lambda x: x['ts']))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        (fd, tmp) = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(
+                dict(traceEvents=events, displayTimeUnit='ms'), fp)
+        os.replace(tmp, self.path)
+        return len(events)
+
+    def stats(self):
+        with self._lock:
+            return dict(file=self.path, spans=len(self._events))
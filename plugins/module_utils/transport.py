@@ -0,0 +1,401 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import gzip
+import http.client
+import random
+import socket
+import ssl
+import threading
+import time
+
+from urllib.parse import urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+
+# Errors signalling that a kept-alive connection was closed by the server
+# while being idle in the pool. Request is retried once on a new connection.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class RateLimitExceeded(Exception):
+    """Rate limit budget is exhausted for longer than allowed to wait"""
+
+
+class _HTTPConnection(http.client.HTTPConnection):
+    """HTTP connection with disabled Nagle algorithm"""
+
+    def connect(self):
+        super().connect()
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection resuming TLS sessions of previous connections
+    to the same host.
+    """
+
+    def __init__(self, host, port=None, tls_sessions=None, **kwargs):
+        super().__init__(host, port=port, **kwargs)
+        self._tls_sessions = tls_sessions if tls_sessions is not None else {}
+
+    def connect(self):
+        sock = socket.create_connection(
+            (self.host, self.port), self.timeout, self.source_address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = self._tls_sessions.get((self.host, self.port))
+        self.sock = self._context.wrap_socket(
+            sock, server_hostname=self.host, session=session)
+        if self.sock.session is not None:
+            self._tls_sessions[(self.host, self.port)] = self.sock.session
+
+
+class PooledResponse:
+    """Minimal file-like response compatible with what `fetch_url` returns
+    """
+
+    def __init__(self, url, status, reason, headers, content):
+        self.url = url
+        self.status = self.code = status
+        self.reason = reason
+        self.headers = headers
+        self._content = content
+
+    def read(self):
+        content, self._content = self._content, b''
+        return content
+
+    def geturl(self):
+        return self.url
+
+    def info(self):
+        return self.headers
+
+
+class ConnectionPool:
+    """Pool of persistent HTTP/1.1 connections per (scheme, host, port).
+
+    Connections are kept open between requests and TLS sessions are resumed
+    when a new connection to an already known host is required. The pool is
+    thread safe: every request checks out a connection exclusively and returns
+    it afterwards.
+    """
+
+    def __init__(self, validate_certs=True, ca_path=None, maxsize=16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+        self._idle = dict()
+        self._tls_sessions = dict()
+        if validate_certs:
+            self._ssl_context = ssl.create_default_context(cafile=ca_path)
+        else:
+            self._ssl_context = ssl._create_unverified_context()
+
+    def is_usable(self, url):
+        """Whether url can be served by the pool (no proxy is involved)"""
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            return False
+        proxies = getproxies()
+        if parts.scheme in proxies and not proxy_bypass(parts.hostname):
+            return False
+        return True
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.hits += 1
+                return (idle.pop(), True)
+            self.misses += 1
+        (scheme, host, port) = key
+        if scheme == 'https':
+            conn = _HTTPSConnection(
+                host, port, tls_sessions=self._tls_sessions,
+                context=self._ssl_context)
+        else:
+            conn = _HTTPConnection(host, port)
+        return (conn, False)
+
+    def _checkin(self, key, conn):
+        # TLS 1.3 session tickets arrive after the handshake, refresh them
+        session = getattr(conn.sock, 'session', None)
+        if session is not None:
+            self._tls_sessions[(conn.host, conn.port)] = session
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, dict()
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def count_fallback(self):
+        with self._lock:
+            self.fallbacks += 1
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            fallbacks=self.fallbacks,
+        )
+
+    def _send(self, method, url, body, headers, timeout):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += f"?{parts.query}"
+
+        (conn, reused) = self._checkout(key)
+        conn.timeout = timeout
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                rsp = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # Server dropped the idle connection, open new one
+                conn.close()
+                conn.request(method, path, body=body, headers=headers)
+                rsp = conn.getresponse()
+            content = rsp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if rsp.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+        if rsp.headers.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return PooledResponse(
+            url, rsp.status, rsp.reason, rsp.headers, content)
+
+    def request(self, method, url, data=None, headers=None, timeout=15):
+        """Perform request and return `(response, info)` same as `fetch_url`
+        """
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip')
+        headers.setdefault('Connection', 'keep-alive')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        info = dict(url=url)
+        try:
+            rsp = self._send(method, url, data, headers, timeout)
+            # Follow redirects for reading requests as urllib does
+            redirects = 0
+            while (
+                rsp.status in REDIRECT_STATUSES
+                and method in ('GET', 'HEAD')
+                and redirects < 10
+                and rsp.headers.get('Location')
+            ):
+                redirects += 1
+                url = urljoin(url, rsp.headers['Location'])
+                rsp = self._send(method, url, None, headers, timeout)
+        except (OSError, http.client.HTTPException) as ex:
+            info.update(msg=f"Connection failure: {ex}", status=-1)
+            return (None, info)
+
+        info.update({k.lower(): v for k, v in rsp.headers.items()})
+        info.update(url=url, status=rsp.status)
+        if rsp.status >= 400:
+            # fetch_url consumes the error body into `info['body']`, reading
+            # the response returns nothing
+            info.update(
+                msg=f"HTTP Error {rsp.status}: {rsp.reason}",
+                body=rsp.read())
+        else:
+            info['msg'] = f"OK ({len(rsp._content)} bytes)"
+        return (rsp, info)
+
+
+class RequestScheduler:
+    """Rate limit aware scheduler of API requests.
+
+    Tracks rate limit budget reported by the `X-RateLimit-*` response headers
+    per resource (core, graphql, search, ...), delays requests of the resource
+    (graphql for the GraphQL endpoint, core otherwise) while its budget is
+    exhausted, paces content modifying requests and calculates delays for
+    retrying throttled (honoring `Retry-After`) and failed requests using
+    exponential backoff with jitter. Requests which would need to wait longer
+    than `max_wait` (or at all without retries) fail with
+    `RateLimitExceeded` instead.
+    """
+
+    def __init__(
+        self, max_retries=0, write_interval=0.0, backoff_base=1.0,
+        backoff_max=60.0, max_wait=300.0, sleep=time.sleep
+    ):
+        self.max_retries = max_retries
+        self.write_interval = write_interval
+        self.max_wait = max_wait
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.throttled = 0
+        self.waited = 0.0
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._budget = dict()
+        self._blocked_until = dict()
+        self._next_write = 0.0
+
+    def wait(self, delay):
+        if delay > 0:
+            with self._lock:
+                self.waited += delay
+            self._sleep(delay)
+
+    def _is_write(self, method, url):
+        # GraphQL queries are sent with POST while only reading the data
+        return (
+            method not in ('GET', 'HEAD')
+            and not (url or '').endswith('/graphql')
+        )
+
+    def _resource(self, url):
+        """Return rate limit resource the request counts against"""
+        path = urlsplit(url or '').path.rstrip('/')
+        return 'graphql' if path.endswith('/graphql') else 'core'
+
+    def _allowed_wait(self):
+        return self.max_wait if self.max_retries else 0.0
+
+    def _block(self, resource, until):
+        # Must be called with the lock held
+        self._blocked_until[resource] = max(
+            self._blocked_until.get(resource, 0.0), until)
+
+    def before_request(self, method, url=None):
+        """Block until the request is allowed to be sent
+
+        Raises `RateLimitExceeded` when the rate limit of the resource is
+        exhausted for longer than allowed to wait.
+        """
+        now = time.time()
+        resource = self._resource(url)
+        with self._lock:
+            delay = self._blocked_until.get(resource, 0.0) - now
+            if delay > self._allowed_wait():
+                raise RateLimitExceeded(
+                    f"Rate limit of the {resource} API is exhausted for "
+                    f"another {delay:.0f}s, which is longer than allowed to "
+                    f"wait ({self._allowed_wait():.0f}s)")
+            if self._is_write(method, url) and self.write_interval:
+                # Content modifying requests must be sent sequentially with a
+                # pause between them to avoid secondary rate limits
+                start = max(now + max(delay, 0), self._next_write)
+                self._next_write = start + self.write_interval
+                delay = start - now
+        self.wait(delay)
+
+    def _update_budget(self, url, info):
+        if 'x-ratelimit-remaining' not in info:
+            return
+        resource = info.get('x-ratelimit-resource', 'core')
+        try:
+            budget = dict(
+                limit=int(info.get('x-ratelimit-limit', 0)),
+                remaining=int(info['x-ratelimit-remaining']),
+                reset=int(info.get('x-ratelimit-reset', 0)),
+            )
+        except ValueError:
+            return
+        with self._lock:
+            self._budget[resource] = budget
+            if budget['remaining'] == 0:
+                # Nothing can be sent until the budget is reset
+                self._block(self._resource(url), budget['reset'])
+
+    def _is_throttled(self, info, body):
+        status = info['status']
+        if status == 429:
+            return True
+        if status != 403:
+            return False
+        if 'retry-after' in info or info.get('x-ratelimit-remaining') == '0':
+            return True
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', errors='replace')
+        return 'rate limit' in (body or '').lower()
+
+    def _backoff(self, attempt):
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def after_response(self, method, url, info, body, attempt):
+        """Process the response and return delay before the next attempt or
+        None when the request must not be retried
+        """
+        self._update_budget(url, info)
+        status = info['status']
+        if self._is_throttled(info, body):
+            with self._lock:
+                self.throttled += 1
+            now = time.time()
+            if 'retry-after' in info:
+                try:
+                    delay = float(info['retry-after'])
+                except ValueError:
+                    delay = self._backoff(attempt)
+            elif info.get('x-ratelimit-remaining') == '0':
+                delay = int(info.get('x-ratelimit-reset', now)) - now + 1
+            else:
+                # Secondary rate limit without hint: wait at least a minute
+                delay = 60 + self._backoff(attempt)
+            with self._lock:
+                self._block(self._resource(url), now + delay)
+            if attempt >= self.max_retries or delay > self.max_wait:
+                return None
+        elif status >= 500 or status < 0:
+            # Only idempotent requests are safe to be repeated after a
+            # failure (GraphQL queries are sent with POST)
+            if (
+                attempt >= self.max_retries
+                or (
+                    method in ('POST', 'PATCH')
+                    and self._is_write(method, url))
+            ):
+                return None
+            delay = self._backoff(attempt)
+        else:
+            return None
+        with self._lock:
+            self.retries += 1
+        return max(delay, 0)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                resources={k: dict(v) for k, v in self._budget.items()},
+                retries=self.retries,
+                throttled=self.throttled,
+                waited=round(self.waited, 3),
+            )
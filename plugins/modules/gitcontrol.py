@@ -0,0 +1,186 @@
+#!/usr/bin/python
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+module: gitcontrol
+short_description: Manage GitHub Organizations
+extends_documentation_fragment: opentelekomcloud.gitcontrol.github
+version_added: "0.0.1"
+author: "Artem Goncharov (@gtema)"
+description:
+  - Reconciles organization members, teams, rulesets and repositories
+    described in the organization repository in a single run. Phases are
+    executed in this order sharing the parsed configuration, HTTP session and
+    caches, what is considerably faster than invoking the C(members),
+    C(teams), C(rulesets) and C(repositories) modules one after another.
+    Rulesets are applied after teams which they may refer to as bypass actors
+    and before repositories protected by them.
+options:
+  root:
+    description: Checkout directory
+    type: str
+    required: False
+  token:
+    description: GitHub token
+    type: str
+    required: True
+  config_cache_dir:
+    description: |
+      Directory for caching parsed configuration files. Files are parsed
+      again only when their content changes.
+    type: path
+    required: False
+  members:
+    description: Reconcile organization members.
+    type: bool
+    default: True
+  teams:
+    description: Reconcile organization teams.
+    type: bool
+    default: True
+  rulesets:
+    description: Reconcile organization rulesets.
+    type: bool
+    default: True
+  repositories:
+    description: Reconcile organization repositories.
+    type: bool
+    default: True
+  journal:
+    description: |
+      Path of the journal file. Every item reconciled without errors is
+      appended to the journal together with the hash of its configuration.
+      Journal is removed once the run completes successfully.
+    type: path
+    required: False
+  resume:
+    description: |
+      Skip items recorded in the I(journal) by the interrupted run when their
+      configuration did not change since.
+    type: bool
+    default: False
+  since_ref:
+    description: |
+      Git reference of the configuration checkout. Only members, teams and
+      repositories changed between the reference and C(HEAD) are reconciled
+      together with repositories using protection templates (or rulesets)
+      changed since.
+    type: str
+    required: False
+  concurrency:
+    description: Number of repositories reconciled in parallel.
+    type: int
+    default: 1
+  prefetch:
+    description: |
+      Fetch current state of all organization repositories using GraphQL in
+      bulk instead of separate REST requests for every repository.
+    type: bool
+    default: True
+  sync_state:
+    description: |
+      Path of the file with the state of the last repositories
+      reconciliation. See the C(repositories) module.
+    type: path
+    required: False
+  full_sync:
+    description: Reconcile all repositories ignoring the I(sync_state).
+    type: bool
+    default: False
+'''
+
+RETURN = '''
+members:
+  description: Status of the organization members by organization.
+  returned: when members are reconciled
+  type: dict
+teams:
+  description: Status of the organization teams by organization.
+  returned: when teams are reconciled
+  type: dict
+rulesets:
+  description: Status of the organization rulesets by organization.
+  returned: when rulesets are reconciled
+  type: dict
+repositories:
+  description: Status of the organization repositories by organization.
+  returned: when repositories are reconciled
+  type: dict
+'''
+
+EXAMPLES = '''
+- name: Reconcile organizations changed by the last commit
+  opentelekomcloud.gitcontrol.gitcontrol:
+    root: "{{ gitstyring_root_dir }}"
+    token: "{{ github_token }}"
+    since_ref: HEAD~1
+'''
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.reconcile import GitHubReconciler
+
+
+PHASES = ['members', 'teams', 'rulesets', 'repositories']
+
+
+class GitControlModule(GitHubReconciler):
+    argument_spec = dict(
+        root=dict(type='str', required=False),
+        config_cache_dir=dict(type='path', required=False),
+        members=dict(type='bool', default=True),
+        teams=dict(type='bool', default=True),
+        rulesets=dict(type='bool', default=True),
+        repositories=dict(type='bool', default=True),
+        journal=dict(type='path', required=False),
+        resume=dict(type='bool', default=False),
+        since_ref=dict(type='str', required=False),
+        concurrency=dict(type='int', default=1),
+        prefetch=dict(type='bool', default=True),
+        sync_state=dict(type='path', required=False),
+        full_sync=dict(type='bool', default=False),
+    )
+    module_kwargs = dict(
+        supports_check_mode=True
+    )
+
+    def run(self):
+        status = dict()
+        changed = False
+
+        changes = None
+        if self.params['since_ref']:
+            changes = self.get_config_changes(self.params['since_ref'])
+        for phase in PHASES:
+            if not self.params[phase]:
+                continue
+            with self.trace(phase, 'module'):
+                (phase_changed, status[phase]) = getattr(
+                    self, f"reconcile_{phase}")(changes)
+            if phase_changed:
+                changed = True
+        if self._sync_enabled():
+            self._sync_state.save()
+
+        if len(self.errors) == 0:
+            self.exit_json(
+                changed=changed,
+                **status
+            )
+        else:
+            self.fail_json(
+                msg='Failures occured',
+                errors=self.errors,
+                **status
+            )
+
+
+def main():
+    module = GitControlModule()
+    module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/python
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+module: gitea_org_repositories
+short_description: Manage Gitea Organization Repositories settings
+extends_documentation_fragment: opentelekomcloud.gitcontrol.gitea
+version_added: "0.2.0"
+author: "Artem Goncharov (@gtema)"
+description:
+  - Manages many repositories of the organization in a single run. All
+    organization repositories are listed once (pages of the maximal size
+    fetched in parallel) instead of being fetched individually.
+options:
+  organization:
+    description: Name of the Gitea organization
+    type: str
+    required: True
+  repositories:
+    description: |
+      List of the repositories. Every item accepts options of the
+      M(opentelekomcloud.gitcontrol.gitea_org_repository) module except of
+      the I(owner).
+    type: list
+    required: True
+    elements: dict
+  concurrency:
+    description: Number of repositories reconciled in parallel.
+    type: int
+    default: 4
+'''
+
+RETURN = '''
+repositories:
+  description: Repositories state by name
+  returned: always
+  type: dict
+'''
+
+EXAMPLES = '''
+- name: Apply organization repositories
+  opentelekomcloud.gitcontrol.gitea_org_repositories:
+    api_url: "https://gitea.example.com/api/v1"
+    token: "{{ secret }}"
+    organization: "test_org"
+    repositories:
+      - name: repo1
+        description: First repository
+        teams: [developers]
+      - name: repo2
+        state: absent
+'''
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.gitea import (
+    GiteaBase,
+    repository_argument_spec
+)
+
+
+class GTOrgRepositoriesModule(GiteaBase):
+    argument_spec = dict(
+        organization=dict(type='str', required=True),
+        repositories=dict(type='list', required=True, elements='dict'),
+        concurrency=dict(type='int', default=4),
+    )
+    module_kwargs = dict(
+        supports_check_mode=True
+    )
+
+    def _reconcile(self, owner, target_attrs, current_state):
+        """Reconcile single repository and return (changed, state)"""
+        target_attrs = dict(target_attrs, owner=owner)
+        state = target_attrs.pop('state')
+        try:
+            if state == 'absent':
+                if not current_state:
+                    return (False, {})
+                if not self.ansible.check_mode:
+                    self.delete_repo(owner, target_attrs['name'])
+                return (True, {})
+            return self._manage_repository(
+                state=state,
+                current=current_state,
+                check_mode=self.ansible.check_mode,
+                **target_attrs
+            )
+        except Exception as ex:
+            self.save_error(
+                f"Error processing repository {target_attrs['name']}: "
+                f"{str(ex)}")
+            return (False, {})
+
+    def run(self):
+        status = dict()
+        changed = False
+        owner = self.params['organization']
+
+        repositories = self._validate_repositories(
+            repository_argument_spec())
+        current = {
+            x['name'].lower(): x for x in self.get_org_repos(owner)
+        }
+        results = self._run_concurrently(
+            self._reconcile,
+            [(owner, x, current.get(x['name'].lower()))
+             for x in repositories],
+            self.params['concurrency'])
+        for target, (repo_changed, repo) in zip(repositories, results):
+            status[target['name']] = repo
+            if repo_changed:
+                changed = True
+
+        if len(self.errors) == 0:
+            self.exit_json(
+                changed=changed,
+                repositories=status
+            )
+        else:
+            self.fail_json(
+                msg='Failures occured',
+                errors=self.errors,
+                repositories=status
+            )
+
+
+def main():
+    module = GTOrgRepositoriesModule()
+    module()
+
+
+if __name__ == "__main__":
+    main()
@@ -251,7 +251,10 @@ options:
         elements: str
   collaborators:
     description: |
-      Repository collaborators with their permissions
+      Repository collaborators with their permissions. Gitea does not list
+      permissions together with the collaborators, so that reconciling them
+      costs the collaborators listing and one (concurrent) permission lookup
+      per existing collaborator.
     type: list
     elements: dict
     suboptions:
@@ -275,6 +278,12 @@ options:
     description: Repository collaborator teams. Permissions are managed on the team level
     type: list
     elements: str
+  verify_teams:
+    description: |
+      Fetch repository teams again after changing them instead of deriving
+      the returned teams from the applied changes.
+    type: bool
+    default: False
 
 '''
 
@@ -288,85 +297,13 @@ EXAMPLES = '''
 
 
 from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.gitea import (
-    GiteaBase
+    GiteaBase,
+    repository_argument_spec
 )
 
 
 class GTOrgRepositoryModule(GiteaBase):
-    argument_spec = dict(
-        owner=dict(type='str', required=True),
-        name=dict(type='str', required=True),
-        state=dict(type='str', default='present',
-                   choices=['present', 'absent']),
-        allow_manual_merge=dict(type='bool'),
-        allow_merge_commits=dict(type='bool'),
-        allow_rebase=dict(type='bool'),
-        allow_rebase_explicit=dict(type='bool'),
-        allow_rebase_update=dict(type='bool'),
-        allow_squash_merge=dict(type='bool'),
-        auto_init=dict(type='bool'),
-        archived=dict(type='bool', default=False),
-        autodetect_manual_merge=dict(type='bool'),
-        default_branch=dict(type='str'),
-        default_delete_branch_after_merge=dict(type='bool'),
-        default_merge_style=dict(
-            type='str',
-            choices=['merge', 'rebase', 'rebase-merge', 'squash']),
-        description=dict(type='str', required=False),
-        enable_prune=dict(type='bool'),
-        gitignores=dict(type='str'),
-        has_issues=dict(type='bool'),
-        has_projects=dict(type='bool'),
-        has_pull_requests=dict(type='bool'),
-        has_wiki=dict(type='bool'),
-        ignore_whitespace_conflicts=dict(type='bool'),
-        issue_labels=dict(type='str'),
-        license=dict(type='str'),
-        private=dict(type='bool'),
-        readme=dict(type='str'),
-        template=dict(type='bool'),
-        trust_model=dict(
-            type='str',
-            choices=['default', 'collaborator', 'commiter', 'collaboratorcommiter']
-        ),
-        website=dict(type='str'),
-        branch_protections=dict(
-            type='list', elements='dict', options=dict(
-                approvals_whitelist_teams=dict(type='list', elements='str'),
-                approvals_whitelist_username=dict(type='list', elements='str'),
-                block_on_official_review_requests=dict(type='bool'),
-                block_on_outdated_branch=dict(type='bool'),
-                block_on_rejected_reviews=dict(type='bool'),
-                branch_name=dict(type='str', required=True),
-                dismiss_stale_approvals=dict(type='bool'),
-                enable_approvals_whitelist=dict(type='bool'),
-                enable_merge_whitelist=dict(type='bool'),
-                enable_push=dict(type='bool'),
-                enable_push_whitelist=dict(type='bool'),
-                enable_status_check=dict(type='bool'),
-                merge_whitelist_teams=dict(type='list', elements='str'),
-                merge_whitelist_usernames=dict(type='list', elements='str'),
-                protected_file_patterns=dict(type='str'),
-                push_whitelist_deploy_keys=dict(type='bool'),
-                push_whitelist_teams=dict(type='list', elements='str'),
-                push_whitelist_usernames=dict(type='list', elements='str'),
-                require_signed_commits=dict(type='bool'),
-                required_approvals=dict(type='int'),
-                status_check_contexts=dict(type='list', elements='str'),
-                unprotected_file_patterns=dict(type='str')
-            )
-        ),
-        collaborators=dict(
-            type='list', elements='dict', options=dict(
-                username=dict(type='str', required=True),
-                permission=dict(
-                    type='str', default='read',
-                    choices=['administrator', 'write', 'read']
-                )
-            )
-        ),
-        teams=dict(type='list', elements='str'),
-    )
+    argument_spec = repository_argument_spec()
     module_kwargs = dict(
         supports_check_mode=True
     )
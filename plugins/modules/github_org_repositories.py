@@ -0,0 +1,146 @@
+#!/usr/bin/python
+#
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+DOCUMENTATION = '''
+module: github_org_repositories
+short_description: Manage GitHub Organization Repositories settings
+extends_documentation_fragment: opentelekomcloud.gitcontrol.github
+version_added: "0.0.2"
+author: "Artem Goncharov (@gtema)"
+description:
+  - Manages many repositories of the organization in a single run. State of
+    all organization repositories is prefetched at once instead of being
+    fetched for every repository individually.
+options:
+  organization:
+    description: Name of the GitHub organization
+    type: str
+    required: True
+  repositories:
+    description: |
+      List of the repositories. Every item accepts options of the
+      M(opentelekomcloud.gitcontrol.github_org_repository) module except of
+      the I(owner).
+    type: list
+    required: True
+    elements: dict
+  concurrency:
+    description: Number of repositories reconciled in parallel.
+    type: int
+    default: 4
+  prefetch:
+    description: |
+      Fetch current state of all organization repositories using GraphQL in
+      bulk instead of separate REST requests for every repository.
+    type: bool
+    default: True
+'''
+
+
+RETURN = '''
+repositories:
+  description: Repositories state by name
+  returned: always
+  type: dict
+'''
+
+
+EXAMPLES = '''
+- name: Apply organization repositories
+  opentelekomcloud.gitcontrol.github_org_repositories:
+    token: "{{ secret }}"
+    organization: "test_org"
+    repositories:
+      - name: repo1
+        description: First repository
+      - name: repo2
+        state: absent
+'''
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.github import (
+    GitHubBase,
+    repository_argument_spec
+)
+
+
+class GHOrgRepositoriesModule(GitHubBase):
+    argument_spec = dict(
+        organization=dict(type='str', required=True),
+        repositories=dict(type='list', required=True, elements='dict'),
+        concurrency=dict(type='int', default=4),
+        prefetch=dict(type='bool', default=True),
+    )
+    module_kwargs = dict(
+        supports_check_mode=True
+    )
+
+    def _reconcile(self, owner, target_attrs):
+        """Reconcile single repository and return (changed, state)"""
+        target_attrs = dict(target_attrs, owner=owner)
+        state = target_attrs.pop('state')
+        try:
+            current_state = self.get_repo(
+                owner, target_attrs['name'], ignore_missing=True)
+            if state == 'absent':
+                if not current_state:
+                    return (False, {})
+                if not self.ansible.check_mode:
+                    self.delete_repo(owner, target_attrs['name'])
+                return (True, {})
+            return self._manage_repository(
+                state=state,
+                current=current_state,
+                check_mode=self.ansible.check_mode,
+                **target_attrs
+            )
+        except Exception as ex:
+            self.save_error(
+                f"Error processing repository {target_attrs['name']}: "
+                f"{str(ex)}")
+            return (False, {})
+
+    def run(self):
+        status = dict()
+        changed = False
+        owner = self.params['organization']
+
+        repositories = self._validate_repositories(
+            repository_argument_spec())
+        if self.params['prefetch'] and repositories:
+            # Repositories not found in the snapshot are fetched individually
+            self.prefetch_org_repositories(owner)
+        results = self._run_concurrently(
+            self._reconcile,
+            [(owner, x) for x in repositories],
+            self.params['concurrency'])
+        for target, (repo_changed, repo) in zip(repositories, results):
+            status[target['name']] = repo
+            if repo_changed:
+                changed = True
+
+        if len(self.errors) == 0:
+            self.exit_json(
+                changed=changed,
+                repositories=status
+            )
+        else:
+            self.fail_json(
+                msg='Failures occured',
+                errors=self.errors,
+                repositories=status
+            )
+
+
+def main():
+    module = GHOrgRepositoriesModule()
+    module()
+
+
+if __name__ == "__main__":
+    main()
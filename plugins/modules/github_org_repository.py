@@ -352,108 +352,13 @@ EXAMPLES = '''
 
 
 from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.github import (
-    GitHubBase
+    GitHubBase,
+    repository_argument_spec
 )
 
 
 class GHOrgRepositoryModule(GitHubBase):
-    argument_spec = dict(
-        owner=dict(type='str', required=True),
-        name=dict(type='str', required=True),
-        state=dict(type='str', default='present',
-                   choices=['present', 'absent']),
-        description=dict(type='str', required=False),
-        homepage=dict(type='str', required=False),
-        private=dict(type='bool', default=False),
-        visibility=dict(type='str', default='public',
-                        choices=['public', 'private', 'internal']),
-        has_issues=dict(type='bool', default=True),
-        has_projects=dict(type='bool', default=True),
-        has_wiki=dict(type='bool', default=True),
-        is_template=dict(type='bool', default=False),
-        auto_init=dict(type='bool', default=False),
-        gitignore_template=dict(type='str'),
-        license_template=dict(type='str'),
-        allow_forking=dict(type='bool'),
-        allow_squash_merge=dict(type='bool', default=True),
-        allow_merge_commit=dict(type='bool', default=True),
-        allow_rebase_merge=dict(type='bool', default=True),
-        allow_auto_merge=dict(type='bool', default=False),
-        allow_update_branch=dict(type='bool', default=False),
-        delete_branch_on_merge=dict(type='bool', default=False),
-        default_branch=dict(type='str'),
-        archived=dict(type='bool', default=False),
-        topics=dict(type='list', elements='str', default=[]),
-        branch_protections=dict(
-            type='list', required=False, elements='dict', options=dict(
-                allow_deletions=dict(type='bool', default=False),
-                allow_fork_syncing=dict(type='bool', default=False),
-                allow_force_pushes=dict(type='bool', default=False),
-                branch=dict(type='str', required=True),
-                enforce_admins=dict(type='bool', default=False),
-                required_conversation_resolution=dict(type='bool',
-                                                      default=False),
-                required_status_checks=dict(
-                    type='dict', required=True,
-                    required_one_of=[('contexts', 'checks')],
-                    options=dict(
-                        strict=dict(type='bool', default=False),
-                        contexts=dict(type='list', elements='str', default=[]),
-                        checks=dict(
-                            type='list', elements='dict', options=dict(
-                                context=dict(type='str'),
-                                app_id=dict(type='int')
-                            )
-                        )
-                    )
-                ),
-                required_linear_history=dict(type='bool', default=False),
-                required_pull_request_reviews=dict(
-                    type='dict', options=dict(
-                        dismissal_restrictions=dict(
-                            type='dict', options=dict(
-                                users=dict(type='list', elements='str', default=[]),
-                                teams=dict(type='list', elements='str', default=[])
-                            )
-                        ),
-                        dismiss_stale_reviews=dict(type='bool', default=True),
-                        require_code_owner_reviews=dict(
-                            type='bool', default=True),
-                        required_approving_review_count=dict(type='int',
-                                                             choices=[
-                                                                 1, 2, 3,
-                                                                 4, 5])
-                    )
-                ),
-                restrictions=dict(
-                    type='dict',
-                    options=dict(
-                        users=dict(type='list', elements='str', default=[]),
-                        teams=dict(type='list', elements='str', default=[]),
-                        apps=dict(type='list', elements='str')
-                    )
-                )
-            )
-        ),
-        teams=dict(
-            type='list', elements='dict', options=dict(
-                slug=dict(type='str', required=True),
-                permission=dict(
-                    type='str', default='pull',
-                    choices=['pull', 'push', 'admin', 'maintain', 'triage']
-                )
-            )
-        ),
-        collaborators=dict(
-            type='list', elements='dict', options=dict(
-                username=dict(type='str', required=True),
-                permission=dict(
-                    type='str', default='pull',
-                    choices=['pull', 'push', 'admin', 'maintain', 'triage']
-                )
-            )
-        ),
-    )
+    argument_spec = repository_argument_spec()
     module_kwargs = dict(
         supports_check_mode=True
     )
@@ -22,6 +22,45 @@ options:
     description: GitHub token
     type: str
     required: True
+  config_cache_dir:
+    description: |
+      Directory for caching parsed configuration files. Files are parsed
+      again only when their content changes.
+    type: path
+    required: False
+  mode:
+    description: |
+      Mode of the run. C(run) reconciles the state directly. C(plan) only
+      records required changes together with the observed state of the
+      modified resources into the I(plan_file). C(apply) executes the plan
+      only verifying that modified resources were not changed since the plan
+      was created.
+    type: str
+    choices: [run, plan, apply]
+    default: run
+  plan_file:
+    description: Path of the change plan file used by plan and apply modes.
+    type: path
+    required: False
+  journal:
+    description: |
+      Path of the journal file. Every item reconciled without errors is
+      appended to the journal together with the hash of its configuration.
+      Journal is removed once the run completes successfully.
+    type: path
+    required: False
+  resume:
+    description: |
+      Skip items recorded in the I(journal) by the interrupted run when their
+      configuration did not change since.
+    type: bool
+    default: False
+  since_ref:
+    description: |
+      Git reference of the configuration checkout. Only members changed
+      between the reference and C(HEAD) are reconciled.
+    type: str
+    required: False
 '''
 
 
@@ -33,32 +72,45 @@ EXAMPLES = '''
 '''
 
 
-from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.github import (
-    GitHubBase
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.reconcile import (
+    GitHubReconciler
 )
 
 
-class MembersModule(GitHubBase):
+class MembersModule(GitHubReconciler):
     argument_spec = dict(
         root=dict(type='str', required=False),
+        config_cache_dir=dict(type='path', required=False),
+        mode=dict(type='str', choices=['run', 'plan', 'apply'],
+                  default='run'),
+        plan_file=dict(type='path', required=False),
+        journal=dict(type='path', required=False),
+        resume=dict(type='bool', default=False),
+        since_ref=dict(type='str', required=False),
     )
     module_kwargs = dict(
-        supports_check_mode=True
+        supports_check_mode=True,
+        required_if=[
+            ('mode', 'plan', ['plan_file']),
+            ('mode', 'apply', ['plan_file']),
+        ]
     )
 
     def run(self):
         status = dict()
         changed = False
 
-        for owner, owner_dict in self.get_members().items():
-            (org_changed, status[owner]) = self._manage_org_members(
-                owner,
-                owner_dict['present'].get('users', []),
-                False,
-                self.ansible.check_mode
-            )
-            if org_changed:
-                changed = True
+        if self.params['mode'] == 'apply':
+            (changed, status) = self.apply_plan('members')
+        else:
+            if self.params['mode'] == 'plan':
+                self.start_plan('members')
+            changes = None
+            if self.params['since_ref']:
+                changes = self.get_config_changes(self.params['since_ref'])
+            (changed, status) = self.reconcile_members(changes)
+            if self.params['mode'] == 'plan':
+                self.save_plan(status)
 
         if len(self.errors) == 0:
             self.exit_json(
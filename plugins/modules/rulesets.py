@@ -0,0 +1,124 @@
+#!/usr/bin/python
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+module: rulesets
+short_description: Manage GitHub Organization Rulesets
+extends_documentation_fragment: opentelekomcloud.gitcontrol.git
+version_added: "0.0.1"
+author: "Artem Goncharov (@gtema)"
+description:
+  - Manages repository rulesets of the organization described in the
+    C(rulesets) directory of the organization configuration. Rules of the
+    ruleset are built from the branch protection template, so that a single
+    ruleset enforces the template on all targeted repositories.
+options:
+  root:
+    description: Checkout directory
+    type: str
+    required: False
+  token:
+    description: GitHub token
+    type: str
+    required: True
+  config_cache_dir:
+    description: |
+      Directory for caching parsed configuration files. Files are parsed
+      again only when their content changes.
+    type: path
+    required: False
+  exclusive:
+    description: Delete organization rulesets not present in the configuration.
+    type: bool
+    default: False
+  mode:
+    description: |
+      Mode of the run. C(run) reconciles the state directly. C(plan) only
+      records required changes together with the observed state of the
+      modified resources into the I(plan_file). C(apply) executes the plan
+      only verifying that modified resources were not changed since the plan
+      was created.
+    type: str
+    choices: [run, plan, apply]
+    default: run
+  plan_file:
+    description: Path of the change plan file used by plan and apply modes.
+    type: path
+    required: False
+'''
+
+RETURN = '''
+'''
+
+EXAMPLES = '''
+'''
+
+
+from ansible_collections.opentelekomcloud.gitcontrol.plugins.module_utils.github import GitHubBase
+
+
+class RulesetsModule(GitHubBase):
+    argument_spec = dict(
+        root=dict(type='str', required=False),
+        config_cache_dir=dict(type='path', required=False),
+        exclusive=dict(type='bool', default=False),
+        mode=dict(type='str', choices=['run', 'plan', 'apply'],
+                  default='run'),
+        plan_file=dict(type='path', required=False),
+    )
+    module_kwargs = dict(
+        supports_check_mode=True,
+        required_if=[
+            ('mode', 'plan', ['plan_file']),
+            ('mode', 'apply', ['plan_file']),
+        ]
+    )
+
+    def run(self):
+        status = dict()
+        changed = False
+
+        if self.params['mode'] == 'apply':
+            (changed, status) = self.apply_plan('rulesets')
+        else:
+            if self.params['mode'] == 'plan':
+                self.start_plan('rulesets')
+            for owner in self.config_index.orgs():
+                rulesets = self.config_index.section(owner, 'rulesets')
+                if not rulesets and not self.params['exclusive']:
+                    continue
+                with self.trace(owner, 'organization'):
+                    (org_changed, status[owner]) = self._manage_org_rulesets(
+                        owner,
+                        rulesets,
+                        self.params['exclusive'],
+                        self.ansible.check_mode
+                    )
+                if org_changed:
+                    changed = True
+            if self.params['mode'] == 'plan':
+                self.save_plan(status)
+
+        if len(self.errors) == 0:
+            self.exit_json(
+                changed=changed,
+                rulesets=status
+            )
+        else:
+            self.fail_json(
+                msg='Failures occured',
+                errors=self.errors,
+                rulesets=status
+            )
+
+
+def main():
+    module = RulesetsModule()
+    module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import threading
+
+from ansible.errors import AnsibleError
+from ansible.module_utils.common.arg_spec import ModuleArgumentSpecValidator
+from ansible.module_utils.common.parameters import remove_values
+from ansible.module_utils.errors import UnsupportedError
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+from ansible.utils.display import Display
+from ansible.utils.vars import merge_hash
+
+display = Display()
+
+# Validation related keyword arguments of the AnsibleModule
+VALIDATION_KWARGS = [
+    'mutually_exclusive', 'required_together', 'required_one_of',
+    'required_if', 'required_by',
+]
+
+# Variable enabling execution of the modules on the controller
+IN_PROCESS_VAR = 'gitcontrol_run_on_controller'
+
+# Connection pools and users caches shared by all module executions of the
+# worker process (i.e. all iterations of the task loop)
+_shared = dict()
+_shared_lock = threading.Lock()
+
+
+class ModuleExit(BaseException):
+    """Module execution finished with the result
+
+    Same as the `SystemExit` raised by the AnsibleModule it must not be
+    caught by the generic exception handling of the module.
+    """
+
+    def __init__(self, result):
+        super().__init__(result.get('msg'))
+        self.result = result
+
+
+class ControllerModule:
+    """Replacement of the AnsibleModule for running module on the controller
+
+    Arguments are validated with the module argument spec same as by the
+    AnsibleModule (failing with the same messages), `exit_json` and
+    `fail_json` raise `ModuleExit` with the result with values of the
+    `no_log` arguments removed. Only the part of the AnsibleModule interface
+    used by the collection is provided, using anything else fails with an
+    error naming the missing attribute.
+    """
+
+    def __init__(self, name, argument_spec, module_kwargs, args,
+                 check_mode=False):
+        self._name = name
+        self.check_mode = check_mode
+        self.tmpdir = tempfile.gettempdir()
+        self._warnings = []
+        self._no_log_values = set()
+        validator = ModuleArgumentSpecValidator(
+            argument_spec,
+            **{k: v for (k, v) in module_kwargs.items()
+               if k in VALIDATION_KWARGS})
+        validation = validator.validate(args)
+        self.params = validation.validated_parameters
+        self._no_log_values = validation._no_log_values
+        if validation.error_messages:
+            msg = validation.errors.msg
+            if isinstance(validation.errors[0], UnsupportedError):
+                msg = f"Unsupported parameters for ({name}) module: {msg}"
+            self.fail_json(msg=msg)
+        if check_mode and not module_kwargs.get('supports_check_mode'):
+            self.exit_json(
+                skipped=True,
+                msg=f"remote module ({name}) does not support check mode")
+
+    def __getattr__(self, name):
+        raise AttributeError(
+            f"AnsibleModule.{name} is not available when "
+            f"{self.__dict__.get('_name')} runs on the controller")
+
+    def warn(self, warning):
+        self._warnings.append(warning)
+
+    def log(self, msg):
+        display.vvvv(f"{self._name}: {msg}")
+
+    def jsonify(self, data):
+        return json.dumps(data)
+
+    def run_command(self, args, check_rc=False, cwd=None, data=None,
+                    binary_data=False, environ_update=None, **kwargs):
+        """Execute the command and return `(rc, stdout, stderr)`
+
+        Subset of the `AnsibleModule.run_command` (commands given as a
+        string are split, never executed by the shell).
+        """
+        unsupported = set(k for (k, v) in kwargs.items() if v)
+        unsupported.discard('close_fds')
+        if unsupported:
+            raise AttributeError(
+                f"run_command arguments {sorted(unsupported)} are not "
+                f"available when {self._name} runs on the controller")
+        if isinstance(args, str):
+            args = shlex.split(args)
+        env = None
+        if environ_update:
+            env = dict(os.environ, **environ_update)
+        if data is not None and not binary_data:
+            data += '\n'
+        try:
+            proc = subprocess.run(
+                args, cwd=cwd, env=env, capture_output=True,
+                input=data.encode('utf-8') if data is not None else None)
+        except OSError as ex:
+            self.fail_json(msg=str(ex), cmd=args, rc=-1)
+        stdout = proc.stdout.decode('utf-8', errors='surrogateescape')
+        stderr = proc.stderr.decode('utf-8', errors='surrogateescape')
+        if check_rc and proc.returncode != 0:
+            self.fail_json(
+                msg=stderr.rstrip() or stdout.rstrip(), cmd=args,
+                rc=proc.returncode, stdout=stdout, stderr=stderr)
+        return (proc.returncode, stdout, stderr)
+
+    def _result(self, **kwargs):
+        if self._warnings:
+            kwargs['warnings'] = self._warnings
+        return remove_values(kwargs, self._no_log_values)
+
+    def exit_json(self, **kwargs):
+        kwargs.setdefault('changed', False)
+        raise ModuleExit(self._result(**kwargs))
+
+    def fail_json(self, msg, **kwargs):
+        if 'exception' in kwargs:
+            kwargs['exception'] = str(kwargs['exception'])
+        raise ModuleExit(self._result(failed=True, msg=msg, **kwargs))
+
+
+def share_transport(module):
+    """Replace connection pool and users cache of the module instance with
+    ones shared by the worker process
+    """
+    params = module.params
+    key = (
+        module.gh_url, params.get('token'), params.get('validate_certs', True),
+        params.get('ca_path'))
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = dict(pool=module._pool, users=module._users_cache)
+        state = _shared[key]
+    if module._pool:
+        if state['pool'] is None:
+            state['pool'] = module._pool
+        module._pool = state['pool']
+    module._users_cache = state['users']
+
+
+class GitHubActionBase(ActionBase):
+    """Action executing the GitHub module on the controller
+
+    With the `gitcontrol_run_on_controller` variable enabled the module is
+    imported and executed within the worker process instead of being
+    packaged and executed on the target, so that loops over many items do
+    not pay the module startup and reuse connections and caches between
+    iterations. Argument spec and result are the same as of the module.
+
+    Module is executed the regular way when not enabled and whenever running
+    in the worker process would not be equivalent: the task is executed (or
+    delegated) over a non local connection, sets environment, becomes
+    another user or runs asynchronously.
+    """
+
+    TRANSFERS_FILES = False
+    _supports_check_mode = True
+    _supports_async = True
+
+    # Class of the module to be executed
+    module_class = None
+
+    def _runs_in_process(self, task_vars):
+        try:
+            enabled = boolean(
+                self._templar.template(
+                    (task_vars or {}).get(IN_PROCESS_VAR, False)),
+                strict=True)
+        except TypeError as ex:
+            raise AnsibleError(f"{IN_PROCESS_VAR}: {ex}")
+        return (
+            enabled
+            and getattr(self._connection, 'transport', None) == 'local'
+            and not any(self._task.environment or [])
+            and not self._play_context.become
+            and not self._task.async_val
+        )
+
+    def run(self, tmp=None, task_vars=None):
+        result = super().run(tmp, task_vars)
+        del tmp
+
+        if not self._runs_in_process(task_vars):
+            wrap_async = (
+                self._task.async_val
+                and not self._connection.has_native_async)
+            result = merge_hash(result, self._execute_module(
+                task_vars=task_vars, wrap_async=wrap_async))
+            if not wrap_async:
+                self._remove_tmp_path(self._connection._shell.tmpdir)
+            return result
+
+        module_class = self.module_class
+        name = self._task.action
+        try:
+            ansible = ControllerModule(
+                name,
+                module_class.get_argument_spec(),
+                module_class.module_kwargs,
+                self._task.args,
+                check_mode=self._task.check_mode)
+            module = module_class(ansible=ansible)
+            share_transport(module)
+            module()
+        except ModuleExit as ex:
+            result.update(ex.result)
+        else:
+            result.update(failed=True, msg=f"{name} did not return result")
+        return result
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Benchmark members, teams and repositories modules offline
+
+Every module is executed as a separate process (same as Ansible does)
+against the fake GitHub server (see `fake_github.py`) populated with an
+organization of the requested size and configuration matching its state.
+Wall time and API calls issued by the module are reported::
+
+    python tools/benchmark.py --sizes 100 1000 10000 --latency 0.02
+
+Organization of N repositories has N/20 teams and N/10 members. With
+`--drift` part of the configuration differs from the server state, so that
+modules have changes to apply (or to report in the check mode).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+from fake_github import FakeGitHub
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['members', 'teams', 'repositories']
+ORG = 'bench'
+
+
+def write_yaml(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as fp:
+        yaml.safe_dump(data, fp, default_flow_style=False)
+
+
+def write_config(fake, root, owner, drift=0.0):
+    """Write configuration describing the current state of the organization
+
+    Every `1/drift`-th item is modified in the configuration.
+    """
+    org = fake.orgs[owner.lower()]
+    step = int(1 / drift) if drift else 0
+    base = os.path.join(root, 'orgs', owner)
+
+    users = []
+    for i, (login, role) in enumerate(sorted(org['members'].items())):
+        if step and i % step == 0:
+            role = 'admin' if role == 'member' else 'member'
+        users.append(dict(
+            login=fake.users[login]['login'],
+            role='Owner' if role == 'admin' else 'Member'))
+    write_yaml(os.path.join(base, 'people', 'members.yml'),
+               dict(users=users))
+    write_yaml(os.path.join(base, 'people', 'dismissed_members.yml'),
+               dict(users=[]))
+
+    teams = dict()
+    for i, (slug, team) in enumerate(sorted(org['teams'].items())):
+        members = sorted(team['members'].items())
+        config = dict(
+            description=team['team']['description'],
+            privacy=team['team']['privacy'],
+            maintainer=[fake.users[x]['login']
+                        for (x, role) in members if role == 'maintainer'],
+            member=[fake.users[x]['login']
+                    for (x, role) in members if role == 'member'],
+        )
+        if step and i % step == 0:
+            config['description'] = f"{config['description']} (changed)"
+        teams[slug] = config
+    write_yaml(os.path.join(base, 'teams', 'members.yml'),
+               dict(teams=teams))
+    write_yaml(os.path.join(base, 'teams', 'dismissed_members.yml'),
+               dict(teams={}))
+
+    repo_teams = dict()
+    for (slug, team) in org['teams'].items():
+        for (name, permission) in team['repos'].items():
+            repo_teams.setdefault(name, dict()).setdefault(
+                permission, []).append(slug)
+    for i, (name, record) in enumerate(sorted(org['repos'].items())):
+        repo = record['repo']
+        config = dict(
+            description=repo['description'],
+            default_branch=repo['default_branch'],
+            topics=list(record['topics']),
+        )
+        if name in repo_teams:
+            config['teams'] = repo_teams[name]
+        if step and i % step == 0:
+            config['description'] = f"{repo['description']} (changed)"
+        write_yaml(
+            os.path.join(base, 'repositories', f"{repo['name']}.yml"),
+            {repo['name']: config})
+
+
+def run_module(module, args, env):
+    with tempfile.NamedTemporaryFile('w', suffix='.json') as fp:
+        json.dump(dict(ANSIBLE_MODULE_ARGS=args), fp)
+        fp.flush()
+        start = time.time()
+        proc = subprocess.run(
+            [sys.executable,
+             os.path.join(ROOT, 'plugins', 'modules', f"{module}.py"),
+             fp.name],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        elapsed = time.time() - start
+    try:
+        result = json.loads(proc.stdout)
+    except ValueError:
+        result = dict(failed=True, msg=proc.stderr.decode()[-500:])
+    return (elapsed, result)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+        help='Amounts of organization repositories')
+    parser.add_argument(
+        '--modules', nargs='+', choices=MODULES, default=MODULES)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=1000000)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--drift', type=float, default=0.0,
+                        help='Part of the configuration to differ')
+    parser.add_argument('--apply', action='store_true',
+                        help='Apply changes instead of the check mode')
+    parser.add_argument(
+        '--arg', action='append', default=[], metavar='KEY=VALUE',
+        help='Additional module argument (value is parsed as JSON)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    extra = dict()
+    for item in args.arg:
+        (key, value) = item.split('=', 1)
+        try:
+            extra[key] = json.loads(value)
+        except ValueError:
+            extra[key] = value
+
+    workdir = tempfile.mkdtemp(prefix='gitcontrol-bench-')
+    # Modules import collection code as ansible_collections package
+    collection = os.path.join(
+        workdir, 'ansible_collections', 'opentelekomcloud')
+    os.makedirs(collection)
+    os.symlink(ROOT, os.path.join(collection, 'gitcontrol'))
+    env = dict(os.environ, PYTHONPATH=workdir)
+
+    results = []
+    for size in args.sizes:
+        fake = FakeGitHub(
+            latency=args.latency, jitter=args.jitter,
+            rate_limit=args.rate_limit, error_rate=args.error_rate, seed=0)
+        fake.populate(ORG, repos=size, teams=max(size // 20, 1),
+                      members=max(size // 10, 1))
+        root = os.path.join(workdir, f"config-{size}")
+        write_config(fake, root, ORG, args.drift)
+        fake.start()
+        try:
+            for module in args.modules:
+                fake.reset_stats()
+                module_args = dict(
+                    token='fake', github_url=fake.url, root=root,
+                    _ansible_check_mode=not args.apply)
+                module_args.update(extra)
+                (elapsed, result) = run_module(module, module_args, env)
+                stats = fake.stats()
+                results.append(dict(
+                    module=module, repos=size, wall=round(elapsed, 2),
+                    rest=stats['rest'], graphql=stats['graphql'],
+                    failed_requests=stats['failed'],
+                    changed=result.get('changed'),
+                    failed=bool(result.get('failed')),
+                    msg=result.get('msg'),
+                    calls=stats['calls']))
+        finally:
+            fake.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'module':<14}{'repos':>7}{'wall[s]':>10}{'REST':>8}"
+          f"{'GraphQL':>9}  result")
+    for x in results:
+        outcome = 'failed: %s' % x['msg'] if x['failed'] else (
+            'changed' if x['changed'] else 'ok')
+        print(f"{x['module']:<14}{x['repos']:>7}{x['wall']:>10.2f}"
+              f"{x['rest']:>8}{x['graphql']:>9}  {outcome}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1087 @@
+#!/usr/bin/env python
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+"""Offline stand-in of the GitHub REST and GraphQL API
+
+Implements endpoints used by `plugins/module_utils/github.py` on top of an
+in-memory state, so that modules can be measured and regression tested
+without a GitHub token. Per-request latency, rate limiting and error
+injection are configurable.
+
+The server can be used as a library::
+
+    from fake_github import FakeGitHub
+
+    with FakeGitHub(latency=0.02) as gh:
+        gh.populate('org', repos=100, teams=10, members=50)
+        ... # run modules against gh.url
+        print(gh.stats())
+
+or started as a subprocess::
+
+    python tools/fake_github.py --port 8080 --repos 1000 --latency 0.05
+
+Statistics are available on `GET /_fake/stats` and are reset with
+`POST /_fake/reset`.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+PERMISSIONS = ['pull', 'triage', 'push', 'maintain', 'admin']
+
+# REST permission name to GraphQL RepositoryPermission
+GRAPHQL_PERMISSIONS = {
+    'admin': 'ADMIN',
+    'maintain': 'MAINTAIN',
+    'push': 'WRITE',
+    'triage': 'TRIAGE',
+    'pull': 'READ',
+}
+
+REPOSITORY_DEFAULTS = {
+    'description': None,
+    'homepage': None,
+    'private': False,
+    'visibility': 'public',
+    'archived': False,
+    'is_template': False,
+    'has_issues': True,
+    'has_projects': True,
+    'has_wiki': True,
+    'allow_forking': True,
+    'allow_squash_merge': True,
+    'allow_merge_commit': True,
+    'allow_rebase_merge': True,
+    'allow_auto_merge': False,
+    'allow_update_branch': False,
+    'delete_branch_on_merge': False,
+    'default_branch': 'main',
+}
+
+BRANCH_PROTECTION_FLAGS = [
+    'enforce_admins',
+    'required_linear_history',
+    'allow_force_pushes',
+    'allow_deletions',
+    'required_conversation_resolution',
+    'allow_fork_syncing',
+]
+
+
+class APIError(Exception):
+
+    def __init__(self, status, message='Not Found'):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+
+def _flags(permission):
+    level = PERMISSIONS.index(permission)
+    return {x: PERMISSIONS.index(x) <= level for x in PERMISSIONS}
+
+
+def _page_info(items, cursor, size=100):
+    start = int(cursor or 0)
+    return (
+        items[start:start + size],
+        {'hasNextPage': start + size < len(items),
+         'endCursor': str(start + size)}
+    )
+
+
+class FakeGitHub:
+    """In-memory GitHub organizations served over HTTP
+
+    :param latency: Seconds every request is delayed by.
+    :param jitter: Maximal random addition to the latency.
+    :param rate_limit: Requests allowed per resource (core, graphql) within
+        the `rate_window`. Exhausted budget is reported with 403 responses.
+    :param rate_window: Length of the rate limit window in seconds.
+    :param error_rate: Probability of a request failing with `error_status`.
+    :param error_status: Status of the randomly failing requests.
+    :param seed: Seed of the random generator.
+    """
+
+    def __init__(
+        self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+        rate_limit=5000, rate_window=3600, error_rate=0.0, error_status=502,
+        seed=None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.orgs = dict()
+        self.users = dict()
+        self.faults = []
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._next_id = 1000
+        self._budget = dict()
+        self.reset_stats()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        (host, port) = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # Statistics and fault injection
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = dict()
+            self.not_modified = 0
+
+    def stats(self):
+        with self._lock:
+            calls = dict(sorted(self.calls.items()))
+
+        def total(condition):
+            return sum(v for (k, v) in calls.items() if condition(k))
+
+        return dict(
+            total=total(lambda x: True),
+            rest=total(lambda x: not x.startswith('graphql')),
+            graphql=total(lambda x: x.startswith('graphql')),
+            not_modified=self.not_modified,
+            failed=total(lambda x: x.endswith(' (failed)')),
+            throttled=total(lambda x: x.endswith(' (throttled)')),
+            calls=calls,
+        )
+
+    def add_fault(self, path, status=500, method=None, count=1):
+        """Fail next `count` requests matching the path regex with status
+        (count of None fails all of them)
+        """
+        with self._lock:
+            self.faults.append(dict(
+                path=re.compile(path), status=status, method=method,
+                count=count))
+
+    def _fault(self, method, path):
+        with self._lock:
+            for fault in self.faults:
+                if (
+                    fault['path'].search(path)
+                    and fault['method'] in (None, method)
+                    and fault['count'] != 0
+                ):
+                    if fault['count'] is not None:
+                        fault['count'] -= 1
+                    return fault['status']
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def _consume(self, resource):
+        """Consume rate limit budget of the request
+
+        Return rate limit headers and whether the request is allowed.
+        """
+        now = int(time.time())
+        with self._lock:
+            budget = self._budget.get(resource)
+            if not budget or budget['reset'] <= now:
+                budget = dict(used=0, reset=now + self.rate_window)
+                self._budget[resource] = budget
+            budget['used'] += 1
+            remaining = self.rate_limit - budget['used']
+        headers = {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(max(remaining, 0)),
+            'X-RateLimit-Reset': str(budget['reset']),
+            'X-RateLimit-Resource': resource,
+        }
+        return (headers, remaining >= 0)
+
+    def _count(self, key):
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    # State
+
+    def _id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def user(self, login):
+        with self._lock:
+            if login.lower() not in self.users:
+                self.users[login.lower()] = {'login': login, 'id': self._id()}
+            return self.users[login.lower()]
+
+    def org(self, name):
+        with self._lock:
+            if name.lower() not in self.orgs:
+                self.orgs[name.lower()] = dict(
+                    login=name, members=dict(), invitations=dict(),
+                    teams=dict(), repos=dict())
+            return self.orgs[name.lower()]
+
+    def _get_org(self, name):
+        org = self.orgs.get(name.lower())
+        if not org:
+            raise APIError(404)
+        return org
+
+    def _get_repo(self, owner, name):
+        repo = self._get_org(owner)['repos'].get(name.lower())
+        if not repo:
+            raise APIError(404)
+        return repo
+
+    def _get_team(self, owner, slug):
+        team = self._get_org(owner)['teams'].get(slug.lower())
+        if not team:
+            raise APIError(404)
+        return team
+
+    def add_repo(self, owner, name, **attrs):
+        org = self.org(owner)
+        repo = dict(REPOSITORY_DEFAULTS)
+        repo.update({k: v for k, v in attrs.items()
+                     if k in REPOSITORY_DEFAULTS})
+        now = _now()
+        repo.update(
+            id=self._id(), name=name, full_name=f"{org['login']}/{name}",
+            created_at=now, updated_at=now, pushed_at=now)
+        record = dict(
+            repo=repo,
+            topics=list(attrs.get('topics', [])),
+            protections=dict(),
+            collaborators=dict(),
+        )
+        with self._lock:
+            org['repos'][name.lower()] = record
+        return record
+
+    def add_team(self, owner, name, description=None, privacy='closed'):
+        org = self.org(owner)
+        slug = re.sub(r'[^a-z0-9_-]+', '-', name.lower())
+        team = dict(
+            team=dict(id=self._id(), name=name, slug=slug,
+                      description=description, privacy=privacy),
+            members=dict(),
+            repos=dict(),
+        )
+        with self._lock:
+            org['teams'][slug] = team
+        return team
+
+    def populate(self, owner, repos=100, teams=10, members=50):
+        """Create organization with generated repositories, teams and
+        members
+
+        Every team has access to a slice of repositories and consists of
+        a slice of the organization members with a single maintainer.
+        """
+        org = self.org(owner)
+        logins = [f"user{i}" for i in range(members)]
+        for i, login in enumerate(logins):
+            self.user(login)
+            org['members'][login.lower()] = 'admin' if i == 0 else 'member'
+        for i in range(repos):
+            self.add_repo(
+                owner, f"repo{i}", description=f"Repository {i}",
+                topics=['generated'])
+        repo_names = sorted(org['repos'])
+        for i in range(teams):
+            team = self.add_team(owner, f"team{i}", description=f"Team {i}")
+            if logins:
+                team_members = logins[i::max(teams, 1)] or logins[:1]
+                for j, login in enumerate(team_members):
+                    team['members'][login.lower()] = (
+                        'maintainer' if j == 0 else 'member')
+            for name in repo_names[i::max(teams, 1)]:
+                team['repos'][name] = 'push'
+        return org
+
+    # REST rendering
+
+    def _render_repo(self, org, record):
+        repo = dict(record['repo'])
+        owner = {'login': org['login']}
+        repo.update(owner=owner, organization=owner, topics=record['topics'])
+        return repo
+
+    def _render_protection(self, protection):
+        bp = {x: {'enabled': protection.get(x, False)}
+              for x in BRANCH_PROTECTION_FLAGS}
+        checks = protection.get('required_status_checks')
+        if checks:
+            contexts = checks.get('contexts') or [
+                x['context'] for x in checks.get('checks') or []]
+            bp['required_status_checks'] = {
+                'strict': checks.get('strict', False),
+                'contexts': contexts,
+                'checks': checks.get('checks') or [
+                    {'context': x, 'app_id': None} for x in contexts],
+            }
+        reviews = protection.get('required_pull_request_reviews')
+        if reviews:
+            rendered = {
+                k: reviews.get(k, False) for k in [
+                    'dismiss_stale_reviews', 'require_code_owner_reviews']}
+            rendered['required_approving_review_count'] = reviews.get(
+                'required_approving_review_count', 1)
+            restrictions = reviews.get('dismissal_restrictions')
+            if restrictions:
+                rendered['dismissal_restrictions'] = {
+                    'users': [{'login': x}
+                              for x in restrictions.get('users', [])],
+                    'teams': [{'slug': x, 'login': x}
+                              for x in restrictions.get('teams', [])],
+                }
+            bp['required_pull_request_reviews'] = rendered
+        restrictions = protection.get('restrictions')
+        if restrictions:
+            bp['restrictions'] = {
+                'users': [{'login': x} for x in restrictions.get('users', [])],
+                'teams': [{'slug': x} for x in restrictions.get('teams', [])],
+                'apps': [{'slug': x} for x in restrictions.get('apps', [])],
+            }
+        return bp
+
+    # GraphQL rendering
+
+    def _graphql_protection(self, pattern, protection):
+        bp = self._render_protection(protection)
+        checks = bp.get('required_status_checks')
+        reviews = bp.get('required_pull_request_reviews')
+        restrictions = bp.get('restrictions')
+        dismissal = (reviews or {}).get('dismissal_restrictions')
+
+        def actors(data, cases):
+            return {'nodes': [
+                {'actor': {'__typename': typename, key: x[key]}}
+                for (case, typename, key) in cases
+                for x in (data or {}).get(case, [])
+            ]}
+
+        return {
+            'pattern': pattern,
+            'isAdminEnforced': bp['enforce_admins']['enabled'],
+            'requiresStatusChecks': bool(checks),
+            'requiresStrictStatusChecks': (checks or {}).get('strict', False),
+            'requiredStatusChecks': [
+                {'context': x['context'],
+                 'app': {'databaseId': x['app_id']} if x['app_id'] else None}
+                for x in (checks or {}).get('checks', [])],
+            'requiresApprovingReviews': bool(reviews),
+            'requiredApprovingReviewCount': (reviews or {}).get(
+                'required_approving_review_count'),
+            'dismissesStaleReviews': (reviews or {}).get(
+                'dismiss_stale_reviews', False),
+            'requiresCodeOwnerReviews': (reviews or {}).get(
+                'require_code_owner_reviews', False),
+            'restrictsReviewDismissals': bool(dismissal),
+            'reviewDismissalAllowances': actors(dismissal, [
+                ('users', 'User', 'login'), ('teams', 'Team', 'slug')]),
+            'restrictsPushes': bool(restrictions),
+            'pushAllowances': actors(restrictions, [
+                ('users', 'User', 'login'), ('teams', 'Team', 'slug'),
+                ('apps', 'App', 'slug')]),
+            'requiresLinearHistory':
+                bp['required_linear_history']['enabled'],
+            'allowsForcePushes': bp['allow_force_pushes']['enabled'],
+            'allowsDeletions': bp['allow_deletions']['enabled'],
+            'requiresConversationResolution':
+                bp['required_conversation_resolution']['enabled'],
+            'lockAllowsFetchAndMerge': bp['allow_fork_syncing']['enabled'],
+        }
+
+    def _graphql_repository(self, org, record):
+        repo = record['repo']
+        collaborators = sorted(record['collaborators'].items())
+        return {
+            'databaseId': repo['id'],
+            'name': repo['name'],
+            'nameWithOwner': repo['full_name'],
+            'owner': {'login': org['login']},
+            'description': repo['description'],
+            'homepageUrl': repo['homepage'],
+            'isPrivate': repo['private'],
+            'visibility': repo['visibility'].upper(),
+            'isArchived': repo['archived'],
+            'isTemplate': repo['is_template'],
+            'hasIssuesEnabled': repo['has_issues'],
+            'hasProjectsEnabled': repo['has_projects'],
+            'hasWikiEnabled': repo['has_wiki'],
+            'forkingAllowed': repo['allow_forking'],
+            'squashMergeAllowed': repo['allow_squash_merge'],
+            'mergeCommitAllowed': repo['allow_merge_commit'],
+            'rebaseMergeAllowed': repo['allow_rebase_merge'],
+            'autoMergeAllowed': repo['allow_auto_merge'],
+            'allowUpdateBranch': repo['allow_update_branch'],
+            'deleteBranchOnMerge': repo['delete_branch_on_merge'],
+            'updatedAt': repo['updated_at'],
+            'pushedAt': repo['pushed_at'],
+            'defaultBranchRef': {'name': repo['default_branch']},
+            'repositoryTopics': {'nodes': [
+                {'topic': {'name': x}} for x in record['topics']]},
+            'collaborators': {
+                'edges': [
+                    {'permission': GRAPHQL_PERMISSIONS[perm],
+                     'node': {'login': self.users[login]['login']}}
+                    for (login, perm) in collaborators[:100]],
+                'pageInfo': {'hasNextPage': len(collaborators) > 100},
+            },
+            'branchProtectionRules': {
+                'nodes': [
+                    self._graphql_protection(k, v) for (k, v) in
+                    sorted(record['protections'].items())[:10]],
+                'pageInfo': {
+                    'hasNextPage': len(record['protections']) > 10},
+            },
+        }
+
+    def _graphql_team_repositories(self, team, cursor):
+        (page, info) = _page_info(sorted(team['repos'].items()), cursor)
+        return {
+            'edges': [{'permission': GRAPHQL_PERMISSIONS[perm],
+                       'node': {'name': name}} for (name, perm) in page],
+            'pageInfo': info,
+        }
+
+    def _graphql_team_members(self, team, cursor):
+        (page, info) = _page_info(sorted(team['members'].items()), cursor)
+        return {
+            'edges': [{'role': role.upper(),
+                       'node': {'login': self.users[login]['login']}}
+                      for (login, role) in page],
+            'pageInfo': info,
+        }
+
+    def graphql(self, query, variables):
+        """Execute one of the queries issued by the collection"""
+        match = re.search(r'query\s+(\w+)', query)
+        operation = match.group(1) if match else None
+        org = self.orgs.get(variables.get('owner', '').lower())
+        if not org:
+            return (operation, {'data': {'organization': None}, 'errors': [
+                {'type': 'NOT_FOUND', 'message': 'Organization not found'}]})
+        if operation == 'members':
+            (page, info) = _page_info(
+                sorted(org['members'].items()), variables.get('memberCursor'))
+            result = {'membersWithRole': {
+                'edges': [{'role': 'ADMIN' if role == 'admin' else 'MEMBER',
+                           'node': {'login': self.users[login]['login']}}
+                          for (login, role) in page],
+                'pageInfo': info}}
+        elif operation == 'repositories':
+            (page, info) = _page_info(
+                sorted(org['repos'].items()), variables.get('repoCursor'))
+            result = {'repositories': {
+                'nodes': [self._graphql_repository(org, x) for (_, x) in page],
+                'pageInfo': info}}
+        elif operation in ('teams', 'teamsMembers'):
+            (page, info) = _page_info(
+                sorted(org['teams'].items()), variables.get('teamCursor'))
+            nodes = []
+            for (slug, team) in page:
+                node = {'slug': slug}
+                if operation == 'teams':
+                    node['repositories'] = \
+                        self._graphql_team_repositories(team, None)
+                else:
+                    node['members'] = self._graphql_team_members(team, None)
+                nodes.append(node)
+            result = {'teams': {'nodes': nodes, 'pageInfo': info}}
+        elif operation in ('teamRepositories', 'teamMembers'):
+            team = org['teams'].get(variables.get('slug', '').lower())
+            if not team:
+                result = {'team': None}
+            elif operation == 'teamRepositories':
+                result = {'team': {'repositories':
+                          self._graphql_team_repositories(
+                              team, variables.get('repoCursor'))}}
+            else:
+                result = {'team': {'members': self._graphql_team_members(
+                    team, variables.get('memberCursor'))}}
+        else:
+            return (operation, {'errors': [
+                {'message': f"Query {operation} is not supported"}]})
+        return (operation, {'data': {'organization': result}})
+
+
+def route(method, template):
+    """Register handler of the request matching path template"""
+    pattern = re.compile(
+        '^' + re.sub(r'{\w+}', '([^/]+)', template) + '$')
+
+    def decorator(func):
+        func.route = (method, pattern, f"{method} {template}")
+        return func
+    return decorator
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    routes = []
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _send(self, status, data=None, headers=None):
+        body = b''
+        if data is not None:
+            body = json.dumps(data).encode('utf-8')
+        headers = dict(headers or {})
+        request_id = uuid.uuid4().hex.upper()
+        headers['X-GitHub-Request-Id'] = ':'.join(
+            request_id[i:i + 4] for i in range(0, 16, 4))
+        if self.command == 'GET' and status == 200:
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            headers['ETag'] = etag
+            headers.setdefault('Cache-Control', 'private, max-age=60, s-maxage=60')
+            if self.headers.get('If-None-Match') == etag:
+                with self.fake._lock:
+                    self.fake.not_modified += 1
+                (status, body) = (304, b'')
+        self.send_response(status)
+        if body:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for (key, value) in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _paginate(self, items, query, path):
+        per_page = min(int(query.get('per_page', 30)), 100)
+        page = int(query.get('page', 1))
+        last = max((len(items) + per_page - 1) // per_page, 1)
+        links = []
+        if page < last:
+            for (rel, num) in [('next', page + 1), ('last', last)]:
+                params = dict(query, per_page=per_page, page=num)
+                links.append(
+                    f'<{self.fake.url}{path}?{urlencode(params)}>; rel="{rel}"')
+        headers = {'Link': ', '.join(links)} if links else {}
+        return (items[(page - 1) * per_page:page * per_page], headers)
+
+    def _match(self, path):
+        for func in self.routes:
+            (method, pattern, key) = func.route
+            if method != self.command:
+                continue
+            match = pattern.match(path)
+            if match:
+                return (func, match.groups(), key)
+        return (None, (), f"{self.command} {path}")
+
+    def _dispatch(self):
+        fake = self.fake
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip('/')
+        query = {k: v[0] for (k, v) in parse_qs(parts.query).items()}
+        body = None
+        if self.command in ('POST', 'PUT', 'PATCH'):
+            body = self._body()
+
+        if path == '/_fake/stats':
+            return self._send(200, fake.stats(), {'Cache-Control': 'no-store'})
+        if path == '/_fake/reset':
+            fake.reset_stats()
+            return self._send(204)
+
+        delay = fake.latency + fake._random.uniform(0, fake.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if path == '/graphql':
+            (handler, args, key) = (None, (), 'graphql')
+            (rate_headers, allowed) = fake._consume('graphql')
+        else:
+            (handler, args, key) = self._match(path)
+            (rate_headers, allowed) = fake._consume('core')
+        if not allowed:
+            fake._count(f"{key} (throttled)")
+            return self._send(403, {
+                'message': 'API rate limit exceeded',
+                'documentation_url': 'https://docs.github.com/rest'
+            }, rate_headers)
+
+        status = fake._fault(self.command, path)
+        if status:
+            fake._count(f"{key} (failed)")
+            return self._send(
+                status, {'message': 'Injected failure'}, rate_headers)
+
+        try:
+            with fake._lock:
+                if path == '/graphql':
+                    (operation, data) = fake.graphql(
+                        body.get('query', ''), body.get('variables') or {})
+                    (key, result) = (f"graphql {operation}", (200, data, None))
+                elif handler:
+                    result = handler(self, body, query, path, *args)
+                else:
+                    raise APIError(404)
+        except APIError as ex:
+            result = (ex.status, {'message': ex.message}, None)
+        except Exception as ex:
+            result = (500, {'message': f"{type(ex).__name__}: {ex}"}, None)
+        fake._count(key)
+        (status, data, headers) = result
+        rate_headers.update(headers or {})
+        return self._send(status, data, rate_headers)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+    # Repositories
+
+    @route('GET', '/orgs/{owner}/repos')
+    def list_org_repos(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        repos = [self.fake._render_repo(org, x)
+                 for (_, x) in sorted(org['repos'].items())]
+        if query.get('sort') == 'updated':
+            repos.sort(key=lambda x: x['updated_at'],
+                       reverse=query.get('direction', 'desc') == 'desc')
+        (page, headers) = self._paginate(repos, query, path)
+        return (200, page, headers)
+
+    @route('POST', '/orgs/{owner}/repos')
+    def create_repo(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        if body['name'].lower() in org['repos']:
+            raise APIError(422, 'Repository creation failed.')
+        body = dict(body)
+        record = self.fake.add_repo(owner, body.pop('name'), **body)
+        return (201, self.fake._render_repo(org, record), None)
+
+    @route('GET', '/repos/{owner}/{name}')
+    def get_repo(self, body, query, path, owner, name):
+        org = self.fake._get_org(owner)
+        return (200, self.fake._render_repo(
+            org, self.fake._get_repo(owner, name)), None)
+
+    @route('PATCH', '/repos/{owner}/{name}')
+    def update_repo(self, body, query, path, owner, name):
+        org = self.fake._get_org(owner)
+        record = self.fake._get_repo(owner, name)
+        record['repo'].update({k: v for (k, v) in body.items()
+                               if k in REPOSITORY_DEFAULTS})
+        record['repo']['updated_at'] = _now()
+        return (200, self.fake._render_repo(org, record), None)
+
+    @route('DELETE', '/repos/{owner}/{name}')
+    def delete_repo(self, body, query, path, owner, name):
+        org = self.fake._get_org(owner)
+        self.fake._get_repo(owner, name)
+        org['repos'].pop(name.lower())
+        for team in org['teams'].values():
+            team['repos'].pop(name.lower(), None)
+        return (204, None, None)
+
+    @route('GET', '/repos/{owner}/{name}/topics')
+    def get_topics(self, body, query, path, owner, name):
+        return (200, {'names': self.fake._get_repo(owner, name)['topics']},
+                None)
+
+    @route('PUT', '/repos/{owner}/{name}/topics')
+    def update_topics(self, body, query, path, owner, name):
+        record = self.fake._get_repo(owner, name)
+        record['topics'] = list(body.get('names', []))
+        return (200, {'names': record['topics']}, None)
+
+    @route('GET', '/repos/{owner}/{name}/branches/{branch}/protection')
+    def get_protection(self, body, query, path, owner, name, branch):
+        protection = self._get_protection(owner, name, branch)
+        return (200, self.fake._render_protection(protection), None)
+
+    @route('PUT', '/repos/{owner}/{name}/branches/{branch}/protection')
+    def update_protection(self, body, query, path, owner, name, branch):
+        record = self.fake._get_repo(owner, name)
+        protection = dict(body)
+        for flag in BRANCH_PROTECTION_FLAGS:
+            value = protection.get(flag)
+            if isinstance(value, dict):
+                protection[flag] = value.get('enabled', False)
+        record['protections'][branch] = protection
+        return (200, self.fake._render_protection(protection), None)
+
+    def _get_protection(self, owner, name, branch):
+        protection = self.fake._get_repo(owner, name)['protections'].get(
+            branch)
+        if protection is None:
+            raise APIError(404, 'Branch not protected')
+        return protection
+
+    @route('POST', '/repos/{owner}/{name}/branches/{branch}/protection/'
+                   '{flag}')
+    def enable_protection_flag(self, body, query, path, owner, name, branch,
+                               flag):
+        if flag != 'enforce_admins':
+            raise APIError(404)
+        self._get_protection(owner, name, branch)[flag] = True
+        return (200, {'enabled': True}, None)
+
+    @route('DELETE', '/repos/{owner}/{name}/branches/{branch}/protection/'
+                     '{section}')
+    def delete_protection_section(self, body, query, path, owner, name,
+                                  branch, section):
+        protection = self._get_protection(owner, name, branch)
+        if section == 'enforce_admins':
+            protection[section] = False
+        elif section in ('required_status_checks',
+                         'required_pull_request_reviews', 'restrictions'):
+            protection[section] = None
+        else:
+            raise APIError(404)
+        return (204, None, None)
+
+    @route('PATCH', '/repos/{owner}/{name}/branches/{branch}/protection/'
+                    '{section}')
+    def update_protection_section(self, body, query, path, owner, name,
+                                  branch, section):
+        protection = self._get_protection(owner, name, branch)
+        if section not in ('required_status_checks',
+                           'required_pull_request_reviews'):
+            raise APIError(404)
+        if not protection.get(section):
+            raise APIError(404, f"{section} not enabled")
+        protection[section] = dict(protection[section], **body)
+        if section == 'required_status_checks':
+            # Contexts and checks replace each other
+            protection[section].pop(
+                'checks' if 'contexts' in body else 'contexts', None)
+        return (200, self.fake._render_protection(protection)[section], None)
+
+    @route('PUT', '/repos/{owner}/{name}/branches/{branch}/protection/'
+                  'restrictions/{kind}')
+    def set_protection_restrictions(self, body, query, path, owner, name,
+                                    branch, kind):
+        protection = self._get_protection(owner, name, branch)
+        if kind not in ('users', 'teams', 'apps'):
+            raise APIError(404)
+        if not protection.get('restrictions'):
+            raise APIError(404, 'Push restrictions not enabled')
+        protection['restrictions'][kind] = list(body.get(kind, []))
+        return (200, self.fake._render_protection(protection)[
+            'restrictions'][kind], None)
+
+    @route('GET', '/repos/{owner}/{name}/teams')
+    def get_repo_teams(self, body, query, path, owner, name):
+        org = self.fake._get_org(owner)
+        self.fake._get_repo(owner, name)
+        teams = [
+            dict(team['team'], permission=team['repos'][name.lower()],
+                 permissions=_flags(team['repos'][name.lower()]))
+            for (_, team) in sorted(org['teams'].items())
+            if name.lower() in team['repos']
+        ]
+        (page, headers) = self._paginate(teams, query, path)
+        return (200, page, headers)
+
+    @route('GET', '/repos/{owner}/{name}/collaborators')
+    def get_collaborators(self, body, query, path, owner, name):
+        record = self.fake._get_repo(owner, name)
+        collaborators = [
+            dict(self.fake.users[login], permissions=_flags(perm))
+            for (login, perm) in sorted(record['collaborators'].items())
+        ]
+        (page, headers) = self._paginate(collaborators, query, path)
+        return (200, page, headers)
+
+    @route('PUT', '/repos/{owner}/{name}/collaborators/{login}')
+    def update_collaborator(self, body, query, path, owner, name, login):
+        record = self.fake._get_repo(owner, name)
+        self.fake.user(login)
+        record['collaborators'][login.lower()] = (body or {}).get(
+            'permission', 'push')
+        return (204, None, None)
+
+    @route('DELETE', '/repos/{owner}/{name}/collaborators/{login}')
+    def delete_collaborator(self, body, query, path, owner, name, login):
+        self.fake._get_repo(owner, name)['collaborators'].pop(
+            login.lower(), None)
+        return (204, None, None)
+
+    # Rulesets
+
+    def _get_ruleset(self, owner, ruleset_id):
+        rulesets = self.fake._get_org(owner).setdefault('rulesets', dict())
+        ruleset = rulesets.get(int(ruleset_id))
+        if ruleset is None:
+            raise APIError(404)
+        return ruleset
+
+    @route('GET', '/orgs/{owner}/rulesets')
+    def list_rulesets(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        rulesets = [
+            {k: v for (k, v) in x.items()
+             if k not in ('rules', 'conditions', 'bypass_actors')}
+            for (_, x) in sorted(org.setdefault('rulesets', dict()).items())
+        ]
+        (page, headers) = self._paginate(rulesets, query, path)
+        return (200, page, headers)
+
+    @route('POST', '/orgs/{owner}/rulesets')
+    def create_ruleset(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        ruleset = dict(
+            body, id=self.fake._id(), source_type='Organization',
+            source=org['login'], updated_at=_now())
+        org.setdefault('rulesets', dict())[ruleset['id']] = ruleset
+        return (201, ruleset, None)
+
+    @route('GET', '/orgs/{owner}/rulesets/{ruleset_id}')
+    def get_ruleset(self, body, query, path, owner, ruleset_id):
+        return (200, self._get_ruleset(owner, ruleset_id), None)
+
+    @route('PUT', '/orgs/{owner}/rulesets/{ruleset_id}')
+    def update_ruleset(self, body, query, path, owner, ruleset_id):
+        ruleset = self._get_ruleset(owner, ruleset_id)
+        ruleset.update(body, updated_at=_now())
+        return (200, ruleset, None)
+
+    @route('DELETE', '/orgs/{owner}/rulesets/{ruleset_id}')
+    def delete_ruleset(self, body, query, path, owner, ruleset_id):
+        self._get_ruleset(owner, ruleset_id)
+        del self.fake._get_org(owner)['rulesets'][int(ruleset_id)]
+        return (204, None, None)
+
+    # Teams
+
+    @route('GET', '/orgs/{owner}/teams')
+    def list_teams(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        teams = [x['team'] for (_, x) in sorted(org['teams'].items())]
+        (page, headers) = self._paginate(teams, query, path)
+        return (200, page, headers)
+
+    @route('POST', '/orgs/{owner}/teams')
+    def create_team(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        team = self.fake.add_team(
+            owner, body['name'], body.get('description'),
+            body.get('privacy') or 'secret')
+        for login in body.get('maintainers') or []:
+            if login.lower() not in org['members']:
+                raise APIError(422, f"{login} is not an organization member")
+            team['members'][login.lower()] = 'maintainer'
+        return (201, team['team'], None)
+
+    @route('GET', '/orgs/{owner}/teams/{slug}')
+    def get_team(self, body, query, path, owner, slug):
+        return (200, self.fake._get_team(owner, slug)['team'], None)
+
+    @route('PATCH', '/orgs/{owner}/teams/{slug}')
+    def update_team(self, body, query, path, owner, slug):
+        team = self.fake._get_team(owner, slug)
+        team['team'].update({k: v for (k, v) in body.items()
+                             if k in ('name', 'description', 'privacy')})
+        return (200, team['team'], None)
+
+    @route('DELETE', '/orgs/{owner}/teams/{slug}')
+    def delete_team(self, body, query, path, owner, slug):
+        self.fake._get_team(owner, slug)
+        self.fake._get_org(owner)['teams'].pop(slug.lower())
+        return (204, None, None)
+
+    @route('GET', '/orgs/{owner}/teams/{slug}/members')
+    def list_team_members(self, body, query, path, owner, slug):
+        team = self.fake._get_team(owner, slug)
+        role = query.get('role', 'all')
+        members = [self.fake.users[login]
+                   for (login, x) in sorted(team['members'].items())
+                   if role in ('all', x)]
+        (page, headers) = self._paginate(members, query, path)
+        return (200, page, headers)
+
+    @route('PUT', '/orgs/{owner}/teams/{slug}/memberships/{login}')
+    def set_team_membership(self, body, query, path, owner, slug, login):
+        team = self.fake._get_team(owner, slug)
+        if body is None:
+            # Membership removal sent with PUT lacks the role
+            team['members'].pop(login.lower(), None)
+            return (204, None, None)
+        self.fake.user(login)
+        role = body.get('role', 'member')
+        team['members'][login.lower()] = role
+        return (200, {'role': role, 'state': 'active'}, None)
+
+    @route('DELETE', '/orgs/{owner}/teams/{slug}/memberships/{login}')
+    def delete_team_membership(self, body, query, path, owner, slug, login):
+        self.fake._get_team(owner, slug)['members'].pop(login.lower(), None)
+        return (204, None, None)
+
+    @route('PUT', '/orgs/{owner}/teams/{slug}/repos/{repo_owner}/{name}')
+    def set_team_repo(self, body, query, path, owner, slug, repo_owner, name):
+        team = self.fake._get_team(owner, slug)
+        self.fake._get_repo(repo_owner, name)
+        team['repos'][name.lower()] = (body or {}).get('permission', 'push')
+        return (204, None, None)
+
+    @route('DELETE', '/orgs/{owner}/teams/{slug}/repos/{repo_owner}/{name}')
+    def delete_team_repo(self, body, query, path, owner, slug, repo_owner,
+                         name):
+        self.fake._get_team(owner, slug)['repos'].pop(name.lower(), None)
+        return (204, None, None)
+
+    # Members
+
+    @route('GET', '/orgs/{owner}/members')
+    def list_members(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        members = [self.fake.users[x] for x in sorted(org['members'])]
+        (page, headers) = self._paginate(members, query, path)
+        return (200, page, headers)
+
+    @route('PUT', '/orgs/{owner}/memberships/{login}')
+    def set_membership(self, body, query, path, owner, login):
+        org = self.fake._get_org(owner)
+        user = self.fake.user(login)
+        role = (body or {}).get('role', 'member')
+        org['members'][login.lower()] = role
+        return (200, {'role': role, 'state': 'active', 'user': user}, None)
+
+    @route('DELETE', '/orgs/{owner}/memberships/{login}')
+    def delete_membership(self, body, query, path, owner, login):
+        self.fake._get_org(owner)['members'].pop(login.lower(), None)
+        return (204, None, None)
+
+    @route('DELETE', '/orgs/{owner}/members/{login}')
+    def delete_member(self, body, query, path, owner, login):
+        org = self.fake._get_org(owner)
+        org['members'].pop(login.lower(), None)
+        for team in org['teams'].values():
+            team['members'].pop(login.lower(), None)
+        return (204, None, None)
+
+    @route('GET', '/orgs/{owner}/invitations')
+    def list_invitations(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        invitations = [x for (_, x) in sorted(org['invitations'].items())]
+        (page, headers) = self._paginate(invitations, query, path)
+        return (200, page, headers)
+
+    @route('POST', '/orgs/{owner}/invitations')
+    def create_invitation(self, body, query, path, owner):
+        org = self.fake._get_org(owner)
+        user = [x for x in self.fake.users.values()
+                if x['id'] == body.get('invitee_id')]
+        if not user:
+            raise APIError(422, 'Invitee not found')
+        invitation = dict(
+            id=self.fake._id(), login=user[0]['login'],
+            role=body.get('role', 'direct_member'), created_at=_now())
+        org['invitations'][invitation['id']] = invitation
+        return (201, invitation, None)
+
+    @route('DELETE', '/orgs/{owner}/invitations/{id}')
+    def delete_invitation(self, body, query, path, owner, id):
+        org = self.fake._get_org(owner)
+        if not id.isdigit() or not org['invitations'].pop(int(id), None):
+            raise APIError(404)
+        return (204, None, None)
+
+    # Users
+
+    @route('GET', '/users/{login}')
+    def get_user(self, body, query, path, login):
+        user = self.fake.users.get(login.lower())
+        if not user:
+            raise APIError(404)
+        return (200, user, None)
+
+
+_Handler.routes = [
+    x for x in vars(_Handler).values() if hasattr(x, 'route')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--org', default='org')
+    parser.add_argument('--repos', type=int, default=100)
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--members', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=int, default=5000)
+    parser.add_argument('--rate-window', type=int, default=3600)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=502)
+    parser.add_argument(
+        '--fault', action='append', default=[],
+        metavar='[METHOD:]PATH_REGEX:STATUS[:COUNT]',
+        help='Fail requests matching the path')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    fake = FakeGitHub(
+        args.host, args.port, latency=args.latency, jitter=args.jitter,
+        rate_limit=args.rate_limit, rate_window=args.rate_window,
+        error_rate=args.error_rate, error_status=args.error_status,
+        seed=args.seed)
+    fake.populate(args.org, args.repos, args.teams, args.members)
+    for fault in args.fault:
+        parts = fault.split(':')
+        method = parts.pop(0) if parts[0].isupper() else None
+        count = int(parts[2]) if len(parts) > 2 else None
+        fake.add_fault(parts[0], int(parts[1]), method, count)
+    print(f"Serving {args.org} on {fake.url}", flush=True)
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()